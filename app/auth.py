@@ -5,36 +5,41 @@ from app.utils.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select
 from dotenv import load_dotenv
 
 from app import models, schemas
-from app.database import SessionLocal
+from app.database import get_session
+from app.services import password_service, user_service
+from app.services.password_service import PasswordHasherBusyError
+from app.services.user_context_service import get_user_context, user_context_cache
+from app.utils.profiling import require_profile_token
 
 load_dotenv() # TROCAR DEPOIS
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _hasher_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes.", headers={"Retry-After": "1"})
+
+async def _get_user_by_email(db, email: str):
+    return (await db.scalars(select(models.User).where(models.User.email == email))).first()
 
 @router.post("/register")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db = Depends(get_session)):
    
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await _get_user_by_email(db, user.email):
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
 
-    hashed_pw = pwd_context.hash(user.password)
+    # bcrypt é CPU-bound: executor dedicado e limitado (503 se a fila estiver cheia)
+    try:
+        hashed_pw = await password_service.hash_password(user.password)
+    except PasswordHasherBusyError:
+        raise _hasher_busy()
     new_user = models.User(name=user.name, email=user.email, password=hashed_pw)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     token = create_access_token(user_id=new_user.id, email=new_user.email)
 
@@ -47,10 +52,20 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    user_db = db.query(models.User).filter(models.User.email == user.email).first()
-    if not user_db or not pwd_context.verify(user.password, user_db.password):
+async def login(user: schemas.UserLogin, db = Depends(get_session)):
+    user_db = await _get_user_by_email(db, user.email)
+    if not user_db:
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    try:
+        valid, new_hash = await password_service.verify_password(user.password, user_db.password)
+    except PasswordHasherBusyError:
+        raise _hasher_busy()
+    if not valid:
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    if new_hash:
+        # BCRYPT_ROUNDS mudou desde que a senha foi gravada: salva o hash com o custo atual
+        user_db.password = new_hash
+        await db.commit()
 
     token = create_access_token(user_id=user_db.id, email=user_db.email)
     return {
@@ -62,9 +77,9 @@ def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
 
  
 @router.put("/user/me", response_model=schemas.UserResponse)
-def update_current_user(payload: schemas.UserUpdate, auth: dict = Depends(require_auth), db: Session = Depends(get_db)):
+async def update_current_user(payload: schemas.UserUpdate, auth: dict = Depends(require_auth), db = Depends(get_session)):
     user_id = get_user_id_from_payload(auth)
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
@@ -72,36 +87,40 @@ def update_current_user(payload: schemas.UserUpdate, auth: dict = Depends(requir
 
     new_email = data.get("email")
     if new_email and new_email != user.email:
-        exists = db.query(models.User).filter(models.User.email == new_email, models.User.id != user.id).first()
+        exists = (await db.scalars(
+            select(models.User).where(models.User.email == new_email, models.User.id != user.id)
+        )).first()
         if exists:
             raise HTTPException(status_code=400, detail="E-mail já cadastrado")
 
     new_password = data.get("password")
     if new_password:
-        data["password"] = pwd_context.hash(new_password)
+        try:
+            data["password"] = await password_service.hash_password(new_password)
+        except PasswordHasherBusyError:
+            raise _hasher_busy()
 
     for field, value in data.items():
         setattr(user, field, value)
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_context_cache.invalidate(user_id)
     return schemas.UserResponse.from_orm(user)
 
 @router.delete("/user/me")
-def delete_current_user(auth: dict = Depends(require_auth), db: Session = Depends(get_db)):
+async def delete_current_user(auth: dict = Depends(require_auth), db = Depends(get_session)):
     user_id = get_user_id_from_payload(auth)
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user is None:
+    if not await user_service.delete_user_async(db, user_id):
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    db.delete(user)
-    db.commit()
+    user_context_cache.invalidate(user_id)
     return {"message": "Usuário deletado com sucesso"}
 
 @router.get("/me")
-def me(payload: dict = Depends(require_auth), db: Session = Depends(get_db)):
+async def me(payload: dict = Depends(require_auth), db = Depends(get_session)):
     user_id = get_user_id_from_payload(payload)
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await get_user_context(db, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     return {"user_id": user_id,
@@ -110,3 +129,7 @@ def me(payload: dict = Depends(require_auth), db: Session = Depends(get_db)):
             "risk_profile": user.risk_profile,
     }
 
+@router.get("/password-hashing/stats", dependencies=[Depends(require_profile_token)])
+def password_hashing_stats():
+    """Métricas do executor de senha (tempo por operação, espera na fila, rejeições e rehash)."""
+    return password_service.get_stats()
@@ -1,24 +1,374 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from collections import deque
+from contextlib import asynccontextmanager
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from dotenv import load_dotenv
 import os
 
-load_dotenv() 
+from app.utils.metrics import PoolMetrics
+from app.utils.profiling import run_in_threadpool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
 
 # print(os.getenv("DATABASE_URL"))
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplica de leitura opcional para as listagens (GET). Sem ela, tudo vai ao primário.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+# DATABASE_ASYNC=true usa AsyncSession (asyncpg/aiosqlite); false mantém a Session
+# síncrona, executada no threadpool. As rotas são as mesmas nos dois modos.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Pool por processo: com gunicorn, o total de conexões é workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Depois de falhar ao conectar na réplica, lê do primário por este tempo antes de tentar de novo
+DB_READ_REPLICA_RETRY_SECONDS = float(os.getenv("DB_READ_REPLICA_RETRY_SECONDS", "30"))
+
+
+class PoolWaitStats:
+	"""Tempo de espera para obter uma conexão do pool (lido por get_pool_stats)."""
+
+	def __init__(self, pool: str, window: int = 1000):
+		self._lock = threading.Lock()
+		self.metrics = PoolMetrics(pool)
+		self.checkouts = 0
+		self.timeouts = 0
+		self.wait_sum = 0.0
+		self.wait_max = 0.0
+		self._recent: deque[float] = deque(maxlen=window)
+
+	def record(self, seconds: float, timed_out: bool = False) -> None:
+		if timed_out:
+			self.metrics.timeouts.inc()
+		else:
+			self.metrics.checkout_wait.observe(seconds)
+			self.metrics.checked_out.inc()
+		with self._lock:
+			if timed_out:
+				self.timeouts += 1
+				return
+			self.checkouts += 1
+			self.wait_sum += seconds
+			self.wait_max = max(self.wait_max, seconds)
+			self._recent.append(seconds)
+
+	def snapshot(self) -> dict:
+		with self._lock:
+			recent = sorted(self._recent)
+			return {
+				"checkouts": self.checkouts,
+				"timeouts": self.timeouts,
+				"avg_wait_ms": self.wait_sum / (self.checkouts or 1) * 1000,
+				"p95_wait_ms": recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000 if recent else 0.0,
+				"max_wait_ms": self.wait_max * 1000,
+			}
+
+
+def _timed_pool_class(base):
+	"""Subclasse do pool que mede a espera no checkout (inclui abrir conexão nova)."""
+
+	class TimedPool(base):
+		wait_stats: PoolWaitStats
+
+		def _do_get(self):
+			started = time.perf_counter()
+			try:
+				connection = super()._do_get()
+			except exc.TimeoutError:
+				self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+				raise
+			self.wait_stats.record(time.perf_counter() - started)
+			return connection
+
+		def _do_return_conn(self, record):
+			self.wait_stats.metrics.checked_out.dec()
+			super()._do_return_conn(record)
+
+	TimedPool.__name__ = f"Timed{base.__name__}"
+	return TimedPool
+
+
+_TimedQueuePool = _timed_pool_class(QueuePool)
+_TimedAsyncQueuePool = _timed_pool_class(AsyncAdaptedQueuePool)
+
+
+def _engine_options(url: str, *, is_async: bool = False) -> dict:
+	parsed = make_url(url)
+	options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+	# SQLite em memória usa um pool próprio (uma conexão por thread): sem dimensionamento
+	if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+		return options
+	options.update(
+		poolclass=_TimedAsyncQueuePool if is_async else _TimedQueuePool,
+		pool_size=DB_POOL_SIZE,
+		max_overflow=DB_MAX_OVERFLOW,
+		pool_timeout=DB_POOL_TIMEOUT,
+	)
+	return options
 
-engine = create_engine(DATABASE_URL)
+
+def _create_engine(url: str, name: str):
+	created = create_engine(url, **_engine_options(url))
+	if isinstance(created.pool, _TimedQueuePool):
+		created.pool.wait_stats = PoolWaitStats(name)
+	return created
+
+
+engine = _create_engine(DATABASE_URL, "primary")
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
-def get_db():
-	"""Dependência do FastAPI para obter uma sessão de DB por request.
-	Uso: def endpoint(db: Session = Depends(get_db))
+read_engine = _create_engine(DATABASE_READ_URL, "replica") if DATABASE_READ_URL else engine
+
+# Driver assíncrono equivalente ao driver síncrono da DATABASE_URL
+_ASYNC_DRIVERS = {
+	"postgresql": "postgresql+asyncpg",
+	"sqlite": "sqlite+aiosqlite",
+	"mysql": "mysql+aiomysql",
+}
+
+def _async_url(url: str, explicit: str | None) -> str:
+	if explicit:
+		return explicit
+	parsed = make_url(url)
+	driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+	if driver is None:
+		raise RuntimeError(f"Sem driver assíncrono conhecido para '{parsed.get_backend_name()}'; defina ASYNC_DATABASE_URL")
+	return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_database_url() -> str:
+	return _async_url(DATABASE_URL, os.getenv("ASYNC_DATABASE_URL"))
+
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+if DATABASE_ASYNC:
+	from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+	def _create_async_engine(url: str, name: str):
+		created = create_async_engine(url, **_engine_options(url, is_async=True))
+		if isinstance(created.sync_engine.pool, _TimedAsyncQueuePool):
+			created.sync_engine.pool.wait_stats = PoolWaitStats(name)
+		return created
+
+	async_engine = _create_async_engine(get_async_database_url(), "primary")
+	async_read_engine = (
+		_create_async_engine(_async_url(DATABASE_READ_URL, os.getenv("ASYNC_DATABASE_READ_URL")), "replica")
+		if DATABASE_READ_URL
+		else async_engine
+	)
+	# expire_on_commit=False: atributos continuam acessíveis após o commit sem
+	# novo I/O implícito (lazy load não é permitido fora de await)
+	AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def get_pool_stats() -> dict:
+	"""Ocupação e espera no checkout dos pools deste processo (primário e réplica)."""
+	engines = {"primary": async_engine.sync_engine if async_engine is not None else engine}
+	if DATABASE_READ_URL:
+		engines["replica"] = async_read_engine.sync_engine if async_read_engine is not None else read_engine
+	stats = {}
+	for name, eng in engines.items():
+		pool = eng.pool
+		entry = {"pool": type(pool).__name__, "status": pool.status()}
+		wait_stats = getattr(pool, "wait_stats", None)
+		if wait_stats is not None:
+			entry.update(
+				size=pool.size(),
+				checked_out=pool.checkedout(),
+				overflow=pool.overflow(),
+				**wait_stats.snapshot(),
+			)
+		stats[name] = entry
+	stats["replica_available"] = _replica_available() if DATABASE_READ_URL else None
+	return stats
+
+
+class SyncSessionAdapter:
+	"""API assíncrona (subconjunto da AsyncSession) sobre uma Session síncrona.
+
+	Cada operação com I/O roda no threadpool; os resultados de `execute` são
+	materializados no próprio thread, então podem ser lidos no event loop.
+	Permite escrever as rotas uma vez só, em estilo async, para os dois modos.
 	"""
-	db = SessionLocal()
+
+	def __init__(self, session):
+		self.sync_session = session
+
+	def add(self, instance) -> None:
+		self.sync_session.add(instance)
+
+	def add_all(self, instances) -> None:
+		self.sync_session.add_all(instances)
+
+	async def execute(self, statement, params=None):
+		frozen = await run_in_threadpool(lambda: self.sync_session.execute(statement, params).freeze())
+		return frozen()
+
+	async def scalar(self, statement, params=None):
+		return await run_in_threadpool(self.sync_session.scalar, statement, params)
+
+	async def scalars(self, statement, params=None):
+		return (await self.execute(statement, params)).scalars()
+
+	async def get(self, entity, ident):
+		return await run_in_threadpool(self.sync_session.get, entity, ident)
+
+	async def delete(self, instance) -> None:
+		await run_in_threadpool(self.sync_session.delete, instance)
+
+	async def flush(self) -> None:
+		await run_in_threadpool(self.sync_session.flush)
+
+	async def commit(self) -> None:
+		await run_in_threadpool(self.sync_session.commit)
+
+	async def rollback(self) -> None:
+		await run_in_threadpool(self.sync_session.rollback)
+
+	async def refresh(self, instance) -> None:
+		await run_in_threadpool(self.sync_session.refresh, instance)
+
+	async def close(self) -> None:
+		await run_in_threadpool(self.sync_session.close)
+
+	async def run_sync(self, fn, *args, **kwargs):
+		"""Executa `fn(session, *args)` com a Session síncrona (como AsyncSession.run_sync)."""
+		return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+@asynccontextmanager
+async def _open_session(read: bool = False):
+	"""AsyncSession ou SyncSessionAdapter; com `read`, a sessão lê da réplica (ver get_read_session)."""
+	if DATABASE_ASYNC:
+		async with (AsyncReadSessionLocal() if read else AsyncSessionLocal()) as session:
+			yield session
+	else:
+		session = SyncSessionAdapter(ReadSessionLocal() if read else SessionLocal())
+		try:
+			yield session
+		finally:
+			await session.close()
+
+
+async def get_session():
+	"""Dependência única das rotas: AsyncSession ou SyncSessionAdapter conforme DATABASE_ASYNC.
+	Uso: async def endpoint(db = Depends(get_session)) e `await db.execute(...)`.
+	Código síncrono (ex.: services) roda via `await db.run_sync(fn, ...)`.
+	"""
+	async with _open_session() as session:
+		yield session
+
+
+_replica_down_until = 0.0
+
+def _replica_available() -> bool:
+	return time.monotonic() >= _replica_down_until
+
+def _connect_replica(replica):
+	"""Conexão da réplica, ou None para ler do primário (réplica fora ou pool esgotado)."""
+	global _replica_down_until
+	if not _replica_available():
+		return None
 	try:
-		yield db
-	finally:
-		db.close()
+		return replica.connect()
+	except exc.TimeoutError:
+		return None
+	except (exc.DBAPIError, OSError) as e:
+		_replica_down_until = time.monotonic() + DB_READ_REPLICA_RETRY_SECONDS
+		logger.warning("Réplica de leitura indisponível, usando o primário por %.0fs: %s", DB_READ_REPLICA_RETRY_SECONDS, e)
+		return None
+
+
+def _read_session_class(primary, replica):
+	"""Session que só escolhe (e conecta) a réplica no primeiro comando.
+
+	Rotas servidas do cache em memória ou com 304 não chegam a executar nada,
+	então não ocupam conexão. `get_bind` roda no thread do comando (threadpool
+	ou greenlet da AsyncSession), onde a conexão síncrona pode ser aberta.
+	"""
+
+	class ReadSession(Session):
+		_replica_connection = None
+		_read_bind = None
+
+		def get_bind(self, mapper=None, **kw):
+			if self._read_bind is None:
+				self._replica_connection = _connect_replica(replica)
+				self._read_bind = self._replica_connection or primary
+			return self._read_bind
+
+		def close(self) -> None:
+			try:
+				super().close()
+			finally:
+				if self._replica_connection is not None:
+					self._replica_connection.close()
+				self._replica_connection = None
+				self._read_bind = None
+
+	return ReadSession
+
+
+if not DATABASE_READ_URL:
+	ReadSessionLocal = SessionLocal
+	AsyncReadSessionLocal = AsyncSessionLocal
+elif DATABASE_ASYNC:
+	ReadSessionLocal = None
+	AsyncReadSessionLocal = async_sessionmaker(
+		sync_session_class=_read_session_class(async_engine.sync_engine, async_read_engine.sync_engine),
+		autoflush=False,
+		expire_on_commit=False,
+	)
+else:
+	ReadSessionLocal = sessionmaker(class_=_read_session_class(engine, read_engine), autocommit=False, autoflush=False)
+	AsyncReadSessionLocal = None
+
+
+async def get_read_session():
+	"""Dependência para rotas só de leitura (listagens/GET): usa a réplica (DATABASE_READ_URL)
+	quando configurada e acessível, senão o primário. A conexão só é aberta no primeiro
+	comando. Não use em rotas que escrevem, nem onde o cliente precisa ler o que acabou
+	de gravar (a réplica pode estar atrasada).
+	"""
+	async with _open_session(read=True) as session:
+		yield session
+
+
+# Migrações (Alembic, diretório migrations/). Bancos criados pelo antigo
+# create_all do startup não têm alembic_version: são marcados na revisão que
+# corresponde às tabelas existentes e seguem daí.
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+_LEGACY_REVISIONS = (
+	("recommendation_runs", "0002"),
+	("users", "0001"),
+)
+
+def upgrade_database(revision: str = "head") -> None:
+	"""Aplica as migrações pendentes (equivale a `alembic upgrade head`)."""
+	from alembic import command
+	from alembic.config import Config
+	from sqlalchemy import inspect
+
+	config = Config(ALEMBIC_INI_PATH)
+	# Não reconfigura o logging do processo (uvicorn/gunicorn) ao migrar no boot
+	config.attributes["configure_logger"] = False
+	tables = set(inspect(engine).get_table_names())
+	if "alembic_version" not in tables:
+		for table, legacy_revision in _LEGACY_REVISIONS:
+			if table in tables:
+				command.stamp(config, legacy_revision)
+				break
+	command.upgrade(config, revision)
@@ -5,12 +5,16 @@ from app import auth
 from app.routes import cryptos
 from app.routes import recommendations
 from app.routes import questionnaire
-from app.database import Base, engine, SessionLocal
+from app.routes import system
+from app.database import SessionLocal, upgrade_database
+from app.utils import metrics, profiling, query_stats
+from app.utils.json_response import ORJSONResponse
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="CryptoLens API")
+# Respostas serializadas com orjson (tipos NumPy e NaN -> null)
+app = FastAPI(title="CryptoLens API", default_response_class=ORJSONResponse)
 
 # CORS: permite o frontend React/Vite (localhost:5173 por padrão) e origens extras via FRONTEND_ORIGINS
 default_origins = [
@@ -29,18 +33,36 @@ app.add_middleware(
 	allow_credentials=True,
 	allow_methods=["*"],
 	allow_headers=["*"],
+	# Cabeçalhos que o frontend precisa ler nas respostas
+	expose_headers=["ETag", "X-Recommendation-Run-Id", "X-Next-Cursor"],
 )
 
 app.include_router(auth.router)
 app.include_router(cryptos.router)
 app.include_router(recommendations.router)
 app.include_router(questionnaire.router)
+app.include_router(system.router)
 
-# Dev only: cria tabelas automaticamente no startup
+# Comandos SQL por request: warning acima do limite da rota ou com comando repetido (N+1)
+if query_stats.SQL_QUERY_STATS_ENABLED:
+	app.add_middleware(query_stats.QueryStatsMiddleware)
+
+# Profiling sob demanda (PROFILE_TOKEN/PROFILE_SAMPLE_RATE); desligado, não é instalado
+if profiling.PROFILING_ENABLED:
+	app.add_middleware(profiling.ProfilingMiddleware)
+
+# Métricas Prometheus: latência/status/concorrência por rota (middleware mais
+# externo, mede também o CORS) e GET /metrics para o scrape
+if metrics.METRICS_ENABLED:
+	app.add_middleware(metrics.MetricsMiddleware, router=app.router)
+	app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+
+# Schema via migrações (Alembic). Com vários workers/instâncias, prefira
+# DB_MIGRATE_ON_STARTUP=false e `alembic upgrade head` na etapa de release.
 @app.on_event("startup")
-def on_startup_create_tables_and_seed():
-	from app import models  # noqa: F401
-	Base.metadata.create_all(bind=engine)
+def on_startup_migrate_and_seed():
+	if os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+		upgrade_database()
 
 	# Seed opcional controlado por variável de ambiente
 	seed_questions = os.getenv("SEED_QUESTIONS_ON_STARTUP", "false").lower() in ("1", "true", "yes")
@@ -61,3 +83,41 @@ def on_startup_create_tables_and_seed():
 		except Exception as e:
 			# Não derruba a aplicação se o seed falhar
 			print(f"[startup] Seed de perguntas não executado: {e}")
+
+
+# Modelo e dados do recomendador são carregados no primeiro uso; em produção,
+# RECOMMENDER_WARMUP_ON_STARTUP=true antecipa essa carga para o boot do worker.
+@app.on_event("startup")
+def on_startup_warm_up_recommender():
+	if os.getenv("RECOMMENDER_WARMUP_ON_STARTUP", "false").lower() not in ("1", "true", "yes"):
+		return
+	try:
+		from app.ml.recommender import warm_up
+		from app.ml.snapshot import get_feature_snapshot
+
+		warm_up()
+		get_feature_snapshot()
+	except Exception as e:
+		print(f"[startup] Warm-up do recomendador não executado: {e}")
+
+
+# Pool de processos do recomendador (só quando RECOMMENDER_EXECUTOR=process)
+@app.on_event("startup")
+def on_startup_inference_pool():
+	from app.ml import inference_service
+
+	inference_service.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown_inference_pool():
+	from app.ml import inference_service
+
+	inference_service.shutdown()
+
+
+@app.on_event("shutdown")
+def on_shutdown_password_hasher():
+	from app.services import password_service
+
+	password_service.shutdown()
@@ -0,0 +1,167 @@
+"""Formato colunar binário para o histórico de features do recomendador.
+
+Layout de um feature store (diretório):
+
+    <dir>/manifest.json            -> aponta para a versão ativa
+    <dir>/<versao>/col_000.npy     -> uma coluna por arquivo (np.save)
+
+Colunas numéricas e de data são abertas com mmap (`np.load(mmap_mode="r")`),
+então só as páginas efetivamente lidas entram na memória. Textos são salvos como
+unicode de largura fixa. A projeção de colunas acontece na leitura: só os
+arquivos pedidos são abertos.
+
+`RECOMMENDER_CSV_PATH` pode apontar para um CSV (fallback), um arquivo
+`.parquet` (requer pyarrow) ou um diretório gerado por `convert_csv_to_store`.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from app.utils import metrics
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+DATE_COLUMNS = ("date",)
+
+
+def detect_format(path: str) -> str:
+    """Retorna 'store', 'parquet' ou 'csv' de acordo com o caminho informado."""
+    if os.path.isdir(path):
+        return "store"
+    if path.lower().endswith((".parquet", ".pq")):
+        return "parquet"
+    return "csv"
+
+
+def version_file(path: str) -> str:
+    """Arquivo cujo conteúdo/mtime identifica a versão dos dados."""
+    if detect_format(path) == "store":
+        return os.path.join(path, MANIFEST_NAME)
+    return path
+
+
+@metrics.timed("feature_frame_load")
+def load_feature_frame(path: str, columns: Iterable[str] | None = None, *, data: bytes | None = None) -> pd.DataFrame:
+    """Carrega o histórico de features projetando apenas `columns` (None = todas).
+
+    Colunas pedidas que não existem na origem são ignoradas; a validação de
+    colunas obrigatórias fica a cargo de quem chama.
+    `data` permite reaproveitar os bytes já lidos de um CSV/parquet.
+    """
+    wanted = None if columns is None else set(columns)
+    fmt = detect_format(path)
+    if fmt == "store":
+        return _load_store(path, wanted)
+
+    source = io.BytesIO(data) if data is not None else path
+    if fmt == "parquet":
+        if wanted is None:
+            return pd.read_parquet(source)
+        import pyarrow.parquet as pq
+
+        available = pq.read_schema(source).names
+        if data is not None:
+            source.seek(0)
+        return pd.read_parquet(source, columns=[c for c in available if c in wanted])
+
+    if wanted is None:
+        return pd.read_csv(source)
+    return pd.read_csv(source, usecols=lambda c: c in wanted)
+
+
+def _read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Versão de feature store não suportada: {manifest.get('format_version')}")
+    return manifest
+
+
+def _load_store(path: str, wanted: set[str] | None) -> pd.DataFrame:
+    manifest = _read_manifest(path)
+    base = os.path.join(path, manifest["data_dir"])
+    data = {}
+    for col in manifest["columns"]:
+        name = col["name"]
+        if wanted is not None and name not in wanted:
+            continue
+        arr = np.load(os.path.join(base, col["file"]), mmap_mode="r")
+        if col["kind"] == "text":
+            values = arr.astype(object)
+            if col.get("null_file"):
+                nulls = np.load(os.path.join(base, col["null_file"]), mmap_mode="r")
+                values[nulls] = np.nan
+            data[name] = values
+        else:
+            data[name] = arr
+    return pd.DataFrame(data, copy=False)
+
+
+def convert_csv_to_store(csv_path: str, out_dir: str, *, keep_versions: int = 2) -> dict:
+    """Converte o CSV de features para o formato colunar e retorna o manifest.
+
+    Cada conversão grava as colunas em um subdiretório novo e só então troca o
+    manifest (via os.replace), então leitores com mmap aberto continuam válidos.
+    """
+    with open(csv_path, "rb") as fh:
+        raw = fh.read()
+    source_hash = hashlib.sha256(raw).hexdigest()
+    df = pd.read_csv(io.BytesIO(raw))
+
+    data_dir = f"v{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')}-{source_hash[:8]}"
+    target = os.path.join(out_dir, data_dir)
+    os.makedirs(target, exist_ok=True)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry = {"name": name, "file": f"col_{i:03d}.npy"}
+        if name in DATE_COLUMNS:
+            arr = pd.to_datetime(series, errors="coerce").to_numpy(dtype="datetime64[ns]")
+            entry["kind"] = "datetime"
+        elif series.dtype == object:
+            nulls = series.isna().to_numpy()
+            arr = series.where(~nulls, "").astype(str).to_numpy(dtype=str)
+            entry["kind"] = "text"
+            if nulls.any():
+                entry["null_file"] = f"col_{i:03d}.null.npy"
+                np.save(os.path.join(target, entry["null_file"]), nulls)
+        else:
+            arr = series.to_numpy()
+            entry["kind"] = "numeric"
+        entry["dtype"] = str(arr.dtype)
+        np.save(os.path.join(target, entry["file"]), arr)
+        columns.append(entry)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "data_dir": data_dir,
+        "rows": int(len(df)),
+        "source": os.path.basename(csv_path),
+        "source_sha256": source_hash,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "columns": columns,
+    }
+    tmp_manifest = os.path.join(out_dir, f".{MANIFEST_NAME}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_manifest, os.path.join(out_dir, MANIFEST_NAME))
+
+    _prune_versions(out_dir, keep_versions)
+    return manifest
+
+
+def _prune_versions(out_dir: str, keep: int) -> None:
+    versions = sorted(
+        d for d in os.listdir(out_dir)
+        if d.startswith("v") and os.path.isdir(os.path.join(out_dir, d))
+    )
+    for d in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(out_dir, d), ignore_errors=True)
@@ -0,0 +1,280 @@
+"""Executor dedicado para o cálculo das recomendações.
+
+Com `RECOMMENDER_EXECUTOR=process`, o trabalho de pandas/modelo sai do
+threadpool do Starlette (que divide o GIL com as demais rotas) e vai para um
+pool de processos com o modelo pré-carregado. Pedidos concorrentes são
+agrupados em micro-lotes: o coletor espera até `RECOMMENDER_BATCH_WAIT_MS`
+(ou até `RECOMMENDER_BATCH_MAX_SIZE` pedidos), deduplica pedidos iguais
+(mesmo snapshot e catálogo) e envia o lote inteiro para o worker, que avalia
+todas as moedas do lote numa única chamada do modelo e reparte o resultado.
+A fila é limitada por `RECOMMENDER_QUEUE_MAX_DEPTH`; acima disso o pedido é
+rejeitado na hora com `InferenceQueueFullError`.
+
+Requests concorrentes com o mesmo snapshot e catálogo já são reunidos antes,
+pelo lock por chave do `result_cache`: chega ao batcher um pedido por chave, e
+um lote só junta chaves diferentes (troca de snapshot/catálogo, vários CSVs).
+As métricas de lote (`avg_batch_size`, `avg_batch_fill`) mostram isso.
+
+Com `RECOMMENDER_EXECUTOR=inline` (padrão) não há executor dedicado: o cálculo
+roda no threadpool do request, como antes, e continua disputando o GIL com as
+demais rotas (inclusive `/auth/*`). Para isolar a inferência, use `process`.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR = os.getenv("RECOMMENDER_EXECUTOR", "inline").lower()
+POOL_WORKERS = int(os.getenv("RECOMMENDER_POOL_WORKERS", "1"))
+POOL_START_METHOD = os.getenv("RECOMMENDER_POOL_START_METHOD", "spawn")
+BATCH_MAX_SIZE = int(os.getenv("RECOMMENDER_BATCH_MAX_SIZE", "32"))
+BATCH_WAIT_MS = float(os.getenv("RECOMMENDER_BATCH_WAIT_MS", "5"))
+QUEUE_MAX_DEPTH = int(os.getenv("RECOMMENDER_QUEUE_MAX_DEPTH", "256"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("RECOMMENDER_INFERENCE_TIMEOUT_SECONDS", "30"))
+
+
+class InferenceQueueFullError(RuntimeError):
+    """Fila do executor de inferência cheia (o chamador deve responder 503)."""
+
+
+@dataclass
+class _Request:
+    path: str
+    version: str
+    symbols: frozenset[str]
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    future: Future = field(default_factory=Future)
+
+    @property
+    def key(self) -> tuple[str, str, frozenset[str]]:
+        return (self.path, self.version, self.symbols)
+
+
+class BatchStats:
+    """Contadores do batcher (lidos por get_stats)."""
+
+    def __init__(self, max_batch_size: int = BATCH_MAX_SIZE):
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.evaluations = 0
+        self.batch_size_sum = 0
+        self.queue_delay_sum = 0.0
+        self.queue_delay_max = 0.0
+        self.last_batch_size = 0
+
+    def record_batch(self, requests: list[_Request], distinct: int, dispatched_at: float) -> None:
+        delays = [dispatched_at - r.enqueued_at for r in requests]
+        with self._lock:
+            self.requests += len(requests)
+            self.batches += 1
+            self.evaluations += distinct
+            self.batch_size_sum += len(requests)
+            self.last_batch_size = len(requests)
+            self.queue_delay_sum += sum(delays)
+            self.queue_delay_max = max(self.queue_delay_max, *delays)
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self, queue_depth: int) -> dict:
+        with self._lock:
+            batches = self.batches or 1
+            requests = self.requests or 1
+            return {
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "batches": self.batches,
+                "evaluations": self.evaluations,
+                "queue_depth": queue_depth,
+                "avg_batch_size": self.batch_size_sum / batches,
+                "avg_batch_fill": self.batch_size_sum / batches / self.max_batch_size,
+                "last_batch_size": self.last_batch_size,
+                "avg_queue_delay_ms": self.queue_delay_sum / requests * 1000,
+                "max_queue_delay_ms": self.queue_delay_max * 1000,
+            }
+
+
+class InferenceBatcher:
+    def __init__(
+        self,
+        *,
+        workers: int = POOL_WORKERS,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_WAIT_MS,
+        max_queue_depth: int = QUEUE_MAX_DEPTH,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: queue.Queue[_Request | None] = queue.Queue(maxsize=max(1, max_queue_depth))
+        self._pool = ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            mp_context=multiprocessing.get_context(POOL_START_METHOD),
+            initializer=_init_worker,
+        )
+        self.stats = BatchStats(self.max_batch_size)
+        self._collector = threading.Thread(target=self._collect_loop, name="inference-batcher", daemon=True)
+        self._collector.start()
+
+    def submit(self, path: str, version: str, symbols: frozenset[str]) -> Future:
+        request = _Request(path=path, version=version, symbols=symbols)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self.stats.record_rejected()
+            raise InferenceQueueFullError("Fila de inferência cheia")
+        return request.future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._collector.join(timeout=5)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _collect_loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch: list[_Request]) -> None:
+        by_key: dict[tuple, list[_Request]] = {}
+        for request in batch:
+            by_key.setdefault(request.key, []).append(request)
+        keys = list(by_key)
+        self.stats.record_batch(batch, len(keys), time.perf_counter())
+
+        jobs = [(path, version, sorted(symbols)) for path, version, symbols in keys]
+        try:
+            pool_future = self._pool.submit(_evaluate_batch, jobs)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        def _resolve(done: Future) -> None:
+            try:
+                results = done.result()
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                return
+            for key, result in zip(keys, results):
+                for request in by_key[key]:
+                    request.future.set_result(result)
+
+        pool_future.add_done_callback(_resolve)
+
+
+# --- Lado do worker (processo do pool) ---------------------------------------
+
+_worker_snapshots: dict = {}
+
+
+def _init_worker() -> None:
+    from app.ml.recommender import warm_up
+
+    warm_up()
+
+
+def _evaluate_batch(jobs: list[tuple[str, str, list[str]]]) -> list[tuple[str, object]]:
+    """Pontuação de cada job (uma única chamada do modelo para o lote) junto com a
+    versão do snapshot que o worker usou de fato."""
+    from app.ml.recommender import ScoredCryptos, score_cryptos_batch
+    from app.ml.snapshot import FeatureSnapshotManager
+
+    snapshots = []
+    for path, _version, _symbols in jobs:
+        manager = _worker_snapshots.get(path)
+        if manager is None:
+            manager = _worker_snapshots[path] = FeatureSnapshotManager(path)
+        snapshots.append(manager.get())
+    scored = score_cryptos_batch([(snapshot.latest, set(symbols)) for snapshot, (_, _, symbols) in zip(snapshots, jobs)])
+    return [(snapshot.version, result or ScoredCryptos.empty()) for snapshot, result in zip(snapshots, scored)]
+
+
+# --- API usada pelo cache de resultados/rotas ---------------------------------
+
+_batcher: InferenceBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> InferenceBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = InferenceBatcher()
+    return _batcher
+
+
+def start() -> None:
+    """Sobe o pool no startup (evita pagar o spawn + carga do modelo no primeiro request)."""
+    if EXECUTOR == "process":
+        get_batcher()
+
+
+def shutdown() -> None:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is not None:
+            _batcher.shutdown()
+            _batcher = None
+
+
+def get_stats() -> dict:
+    batcher = _batcher
+    if batcher is None:
+        return {"executor": EXECUTOR}
+    return {"executor": EXECUTOR, **batcher.stats.snapshot(batcher.queue_depth())}
+
+
+def _score_inline(snapshot, symbols: frozenset[str]):
+    from app.ml.recommender import ScoredCryptos, score_cryptos
+
+    return score_cryptos(snapshot.latest, allowed_symbols=set(symbols)) or ScoredCryptos.empty()
+
+
+def compute_scores(snapshot, symbols: frozenset[str]):
+    """`ScoredCryptos` (independente de perfil) do snapshot/catálogo, no executor configurado."""
+    if EXECUTOR != "process":
+        return _score_inline(snapshot, symbols)
+    future = get_batcher().submit(snapshot.path, snapshot.version, frozenset(symbols))
+    version, scores = future.result(timeout=INFERENCE_TIMEOUT_SECONDS)
+    if version != snapshot.version:
+        # O resultado é guardado sob a versão pedida: se o worker ainda lia outro
+        # snapshot (CSV trocado entre as duas leituras), recalcula com o deste processo
+        logger.info("Snapshot do worker (%s) difere do pedido (%s); recalculando localmente", version, snapshot.version)
+        return _score_inline(snapshot, symbols)
+    return scores
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+def normalize_symbols(symbols: pd.Series) -> pd.Series:
+    """Símbolo base (ex.: BTCUSDT -> BTC) para cruzar com a base cadastrada."""
+    return symbols.astype(str).str.replace(r"USDT$", "", regex=True)
+
+
+class LatestRowIndex:
+    """Índice `symbol_base` -> última linha de features do histórico.
+
+    Construído uma vez por snapshot, substitui o `sort_values(...).groupby(...).tail(1)`
+    que o recomendador fazia sobre o histórico inteiro a cada chamada. A regra de
+    "última linha" é a mesma do sort estável: maior data; linhas sem data (NaT)
+    ficam por último na ordenação e portanto vencem; empates ficam com a linha
+    que aparece depois no arquivo.
+
+    O índice é imutável: `with_appended` devolve um novo índice atualizado só com
+    as linhas novas, sem reordenar o histórico.
+    """
+
+    def __init__(self, frame: pd.DataFrame, *, _latest: pd.DataFrame | None = None):
+        self.frame = frame
+        if _latest is None:
+            _latest = self._latest_rows(frame, offset=0)
+        self._latest = _latest
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    @property
+    def symbols(self) -> list[str]:
+        return self._latest["symbol_base"].tolist()
+
+    def latest_frame(self, allowed_symbols: set[str] | None = None, *, copy: bool = True) -> pd.DataFrame:
+        """Uma linha por símbolo (ordenada por símbolo), opcionalmente só os cadastrados.
+
+        Por padrão retorna uma cópia pequena (n_símbolos linhas) que pode ser
+        alterada livremente; com `copy=False` o resultado pode compartilhar dados
+        com o índice e deve ser tratado como somente leitura.
+        """
+        latest = self._latest
+        if allowed_symbols:
+            latest = latest[latest["symbol_base"].isin(allowed_symbols)]
+        return latest.copy() if copy else latest
+
+    def with_appended(self, new_rows: pd.DataFrame) -> "LatestRowIndex":
+        """Novo índice considerando `new_rows` como acrescentadas ao fim do histórico."""
+        if new_rows.empty:
+            return self
+        frame = pd.concat([self.frame, new_rows], ignore_index=True)
+        candidates = self._latest_rows(new_rows, offset=len(self.frame))
+        if candidates.empty:
+            return LatestRowIndex(frame, _latest=self._latest)
+
+        current = self._latest
+        cur_dates = pd.Series(current["date"].to_numpy(), index=current["symbol_base"].to_numpy())
+        new_symbols = candidates["symbol_base"].to_numpy()
+        new_dates = candidates["date"]
+        has_current = pd.Index(new_symbols).isin(cur_dates.index)
+        cur_for_new = cur_dates.reindex(new_symbols).to_numpy()
+        # Linhas novas vêm depois no arquivo: vencem empates e, se tiverem NaT,
+        # vencem sempre; só perdem para uma linha atual sem data ou mais recente.
+        keep_current = has_current & new_dates.notna().to_numpy() & (
+            pd.isna(cur_for_new) | (cur_for_new > new_dates.to_numpy())
+        )
+        take = candidates[~keep_current]
+        latest = pd.concat([current[~current["symbol_base"].isin(take["symbol_base"])], take])
+        latest = latest.sort_values("symbol_base", kind="stable")
+        return LatestRowIndex(frame, _latest=latest)
+
+    @staticmethod
+    def _latest_rows(frame: pd.DataFrame, offset: int) -> pd.DataFrame:
+        if "symbol" in frame.columns:
+            symbol_base = normalize_symbols(frame["symbol"])
+        else:
+            symbol_base = pd.Series(None, index=frame.index, dtype=object)
+        if "date" in frame.columns:
+            dates = pd.to_datetime(frame["date"], errors="coerce")
+        else:
+            dates = pd.Series(pd.NaT, index=frame.index, dtype="datetime64[ns]")
+
+        keys = pd.DataFrame({
+            "symbol_base": symbol_base.to_numpy(),
+            "date": dates.to_numpy(),
+            "_row": np.arange(offset, offset + len(frame)),
+        })
+        last = keys.sort_values(["symbol_base", "date"]).groupby("symbol_base", as_index=False).tail(1)
+
+        rows = frame.iloc[last["_row"].to_numpy() - offset].copy()
+        rows["symbol_base"] = last["symbol_base"].to_numpy()
+        rows["date"] = last["date"].to_numpy()
+        # Índice = posição da linha no histórico completo
+        rows.index = pd.Index(last["_row"].to_numpy())
+        return rows
@@ -1,138 +1,391 @@
+import os
+import threading
+import warnings
+from dataclasses import dataclass, field
+
 import joblib
 import pandas as pd
 import numpy as np
 
+from app.ml.latest_index import LatestRowIndex
+from app.utils import metrics
+
 # Caminho relativo aos arquivos salvos
-MODEL_PATH = "app/ml/model.joblib"
-FEATURES_PATH = "app/ml/model_features.joblib"
+MODEL_PATH = os.getenv("RECOMMENDER_MODEL_PATH", "app/ml/model.joblib")
+FEATURES_PATH = os.getenv("RECOMMENDER_FEATURES_PATH", "app/ml/model_features.joblib")
+# "compiled": árvores achatadas em arrays NumPy (tree_engine); "sklearn": modelo original
+INFERENCE_ENGINE = os.getenv("RECOMMENDER_INFERENCE_ENGINE", "compiled").lower()
+
+# Modelo e features são carregados no primeiro uso (ou em warm_up), não no import
+_model = None
+_model_features = None
+_engine = None
+_engine_ready = False
+_load_lock = threading.RLock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                _model = joblib.load(MODEL_PATH)
+    return _model
+
+
+def get_model_features() -> list[str]:
+    global _model_features
+    if _model_features is None:
+        with _load_lock:
+            if _model_features is None:
+                _model_features = joblib.load(FEATURES_PATH)
+    return _model_features
+
+
+def get_inference_engine():
+    """Motor de inferência compilado, ou None se desativado/não suportado pelo modelo."""
+    global _engine, _engine_ready
+    if INFERENCE_ENGINE != "compiled":
+        return None
+    if not _engine_ready:
+        with _load_lock:
+            if not _engine_ready:
+                from app.ml.tree_engine import compile_model
 
-# Carregar o modelo e as features
-model = joblib.load(MODEL_PATH)
-model_features = joblib.load(FEATURES_PATH)
+                _engine = compile_model(get_model())
+                _engine_ready = True
+    return _engine
 
+
+def warm_up():
+    """Carrega modelo e lista de features antecipadamente (ex.: no startup do worker)."""
+    get_model_features()
+    get_model()
+    get_inference_engine()
+
+
+@metrics.timed("predict_crypto_movement")
 def predict_crypto_movement(input_data: pd.DataFrame):
     """
     Recebe dados de criptomoedas e retorna a previsão de movimento.
     input_data: DataFrame com as mesmas features usadas no treino.
     """
     # Garantir que as colunas estão na ordem certa
-    input_data = input_data[model_features]
+    input_data = input_data[get_model_features()]
 
     # Fazer previsões (1 = alta, 0 = queda)
-    preds = model.predict(input_data)
+    preds = get_model().predict(input_data)
 
     return preds
 
 
+@metrics.timed("predict_proba_up")
 def predict_proba_up(input_data: pd.DataFrame):
     """
     Retorna a probabilidade prevista de alta (classe 1) para cada linha.
     Se o modelo não suportar predict_proba, retorna NaN.
     """
-    X = input_data[model_features]
+    X = input_data[get_model_features()]
+    model = get_model()
     if hasattr(model, "predict_proba"):
         probs = model.predict_proba(X)
-        classes = getattr(model, "classes_", None)
-        if classes is not None and 1 in list(classes):
-            idx = list(classes).index(1)
-        else:
-            # Fallback: utiliza a última coluna como "classe positiva"
-            idx = probs.shape[1] - 1
-        return probs[:, idx]
+        return probs[:, _positive_class_index(getattr(model, "classes_", None), probs)]
     # Sem suporte a predict_proba
     return np.full(len(X), np.nan)
 
 
-def recommend_cryptos(user_risk: str, crypto_data: pd.DataFrame, allowed_symbols: set[str] | None = None):
+RISK_PROFILES = ("baixo", "moderado", "alto")
+
+
+@metrics.timed("predict_with_proba_up")
+def predict_with_proba_up(input_data: pd.DataFrame):
+    """
+    Retorna (previsão de movimento, probabilidade de alta) para cada linha.
+    Com o motor compilado, as duas saem de uma única travessia das árvores;
+    caso contrário (ou com valores não finitos) usa as funções do sklearn acima.
+    """
+    X = input_data[get_model_features()]
+    engine = get_inference_engine()
+    if engine is not None:
+        X32 = np.asarray(X, dtype=np.float32)
+        # NaN/inf seguem pelo sklearn para manter a mesma validação/erros
+        if np.isfinite(X32).all():
+            preds, probs = engine.predict_with_proba(X32)
+            return preds, probs[:, _positive_class_index(engine.classes_, probs)]
+
+    preds = predict_crypto_movement(input_data)
+    try:
+        proba_up = predict_proba_up(input_data)
+    except Exception:
+        proba_up = np.full(len(X), np.nan)
+    return preds, proba_up
+
+
+def _positive_class_index(classes, probs) -> int:
+    if classes is not None and 1 in list(classes):
+        return list(classes).index(1)
+    # Fallback: utiliza a última coluna como "classe positiva"
+    return probs.shape[1] - 1
+
+
+def recommend_cryptos(user_risk: str, crypto_data: pd.DataFrame | LatestRowIndex, allowed_symbols: set[str] | None = None):
     """
     Gera recomendações com base no perfil de risco do usuário e previsões do modelo.
     """
+    scored = score_cryptos(crypto_data, allowed_symbols)
+    if scored is None:
+        return []
+    return scored.records(user_risk)
+
+
+def recommend_all_profiles(crypto_data: pd.DataFrame | LatestRowIndex, allowed_symbols: set[str] | None = None) -> dict[str, list[dict]]:
+    """
+    Gera as recomendações dos três perfis de risco em uma única passada
+    (quantis e modelo são calculados uma vez; só a elegibilidade muda por perfil).
+    """
+    scored = score_cryptos(crypto_data, allowed_symbols)
+    if scored is None:
+        return {profile: [] for profile in RISK_PROFILES}
+    return {profile: scored.records(profile) for profile in RISK_PROFILES}
+
+
+# Níveis de risco na ordem dos códigos usados internamente (0, 1, 2)
+RISK_LEVELS = np.array(["baixo", "moderado", "alto"], dtype=object)
+# Maior código de risco elegível por perfil; perfil desconhecido se comporta como "alto"
+_MAX_ELIGIBLE_CODE = {"baixo": 0, "moderado": 1, "alto": 2}
+
+# Campos de cada registro, na ordem da resposta ("network" só se existir no CSV)
+OUTPUT_FIELDS = ("symbol", "network", "Risk_Level", "predicted_movement", "predicted_proba_up", "eligible_for_profile")
+# Campos aceitos como chave de ordenação em ScoredCryptos.select
+SORT_FIELDS = ("predicted_proba_up", "predicted_movement", "Risk_Level", "symbol")
+
+
+@dataclass(frozen=True)
+class ScoredCryptos:
+    """Resultado independente do perfil: uma posição por moeda (ordenadas por símbolo).
+
+    As colunas ficam como listas Python (já convertidas com `tolist()`), então
+    montar os registros de um perfil é só um zip; apenas a elegibilidade muda.
+    Os registros completos de cada perfil são memorizados e compartilhados:
+    não devem ser alterados por quem os recebe.
+    """
+
+    symbol: list
+    network: list | None
+    risk_code: np.ndarray
+    risk_level: list
+    predicted_movement: list
+    predicted_proba_up: list
+    _memo: dict = field(default_factory=dict, repr=False, compare=False)
 
-    # Trabalhar em uma cópia e consolidar em 1 linha por símbolo (última data)
-    df = crypto_data.copy()
-    # Normaliza símbolo base (ex.: BTCUSDT -> BTC) para cruzar com base cadastrada
-    if "symbol" in df.columns:
-        df["symbol_base"] = df["symbol"].astype(str).str.replace(r"USDT$", "", regex=True)
-    else:
-        df["symbol_base"] = None
+    @classmethod
+    def empty(cls) -> "ScoredCryptos":
+        return cls(symbol=[], network=None, risk_code=np.zeros(0, dtype=np.int8), risk_level=[], predicted_movement=[], predicted_proba_up=[])
 
-    # Filtra para somente as moedas cadastradas, se informado
-    if allowed_symbols:
-        df = df[df["symbol_base"].isin(allowed_symbols)]
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        return tuple(f for f in OUTPUT_FIELDS if f != "network" or self.network is not None)
+
+    def eligible_mask(self, user_risk: str) -> np.ndarray:
+        return self.risk_code <= _MAX_ELIGIBLE_CODE.get(user_risk, 2)
+
+    def records(self, user_risk: str) -> list[dict]:
+        # Em vez de filtrar e limitar top 10, retornamos TODAS as moedas
+        # e indicamos se elas são elegíveis para o perfil do usuário.
+        records = self._memo.get(("records", user_risk))
+        if records is None:
+            eligible = self.eligible_mask(user_risk).tolist()
+            columns = [self._column(f, eligible) for f in self.fields]
+            records = [dict(zip(self.fields, row)) for row in zip(*columns)]
+            self._memo[("records", user_risk)] = records
+        return records
+
+    def select(
+        self,
+        user_risk: str,
+        *,
+        fields: tuple[str, ...] | None = None,
+        eligible_only: bool = False,
+        sort_by: str | None = None,
+        descending: bool = True,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[list[dict], int]:
+        """Página de registros de um perfil: filtro, ordenação, recorte e projeção.
+
+        Só as `offset + limit` primeiras posições da ordenação são escolhidas
+        (seleção parcial com `argpartition`) e só a página é montada como dict.
+        Empates mantêm a ordem por símbolo; NaN vai para o fim. Retorna os
+        registros e o total de moedas que passam no filtro.
+        """
+        mask = self.eligible_mask(user_risk)
+        positions = np.flatnonzero(mask) if eligible_only else np.arange(len(self))
+        total = len(positions)
+        k = total if limit is None else min(total, offset + limit)
+        page = self._top_positions(positions, sort_by, descending, k)[offset:k]
+
+        out_fields = self.fields if fields is None else tuple(f for f in self.fields if f in fields)
+        page_list = page.tolist()
+        columns = []
+        for f in out_fields:
+            if f == "eligible_for_profile":
+                columns.append(mask[page].tolist())
+            else:
+                column = self._column(f, None)
+                columns.append([column[i] for i in page_list])
+        if not columns:
+            # Uma entrada por posição mesmo sem campos: o total da página continua certo
+            return [{} for _ in page_list], total
+        return [dict(zip(out_fields, row)) for row in zip(*columns)], total
+
+    def _column(self, name: str, eligible: list | None) -> list:
+        return {
+            "symbol": self.symbol,
+            "network": self.network,
+            "Risk_Level": self.risk_level,
+            "predicted_movement": self.predicted_movement,
+            "predicted_proba_up": self.predicted_proba_up,
+            "eligible_for_profile": eligible,
+        }[name]
+
+    def _sort_values(self, sort_by: str) -> np.ndarray:
+        values = self._memo.get(("sort", sort_by))
+        if values is None:
+            if sort_by == "Risk_Level":
+                values = self.risk_code.astype(float)
+            else:
+                values = np.asarray(getattr(self, sort_by), dtype=float)
+            self._memo[("sort", sort_by)] = values
+        return values
+
+    def _top_positions(self, positions: np.ndarray, sort_by: str | None, descending: bool, k: int) -> np.ndarray:
+        """As k primeiras de `positions` na ordem pedida (estável: empate por posição)."""
+        if sort_by is None or sort_by == "symbol":
+            # As posições já estão em ordem de símbolo
+            return positions[::-1][:k] if descending and sort_by == "symbol" else positions[:k]
+
+        keys = self._sort_values(sort_by)[positions]
+        if descending:
+            keys = -keys
+        nan = np.isnan(keys)
+        valid_pos, valid_keys = positions[~nan], keys[~nan]
+        if k < len(valid_pos):
+            # k-ésimo menor valor em O(n); completa com os empatados de menor posição
+            kth = np.partition(valid_keys, k - 1)[k - 1]
+            less = valid_keys < kth
+            tied = valid_pos[valid_keys == kth][: k - int(less.sum())]
+            valid_pos = np.concatenate([valid_pos[less], tied])
+            valid_keys = self._sort_values(sort_by)[valid_pos] * (-1 if descending else 1)
+        top = valid_pos[np.lexsort((valid_pos, valid_keys))]
+        if len(top) < k:
+            top = np.concatenate([top, positions[nan][: k - len(top)]])
+        return top
+
+
+def latest_rows(crypto_data: pd.DataFrame | LatestRowIndex, allowed_symbols: set[str] | None = None) -> pd.DataFrame:
+    """Última linha de cada moeda (só leitura), filtrada pelas moedas cadastradas se informado."""
+    # Uma linha por símbolo (último registro), já com symbol_base normalizado e
+    # date convertido; o índice vem pronto do snapshot ou é montado aqui.
+    index = crypto_data if isinstance(crypto_data, LatestRowIndex) else LatestRowIndex(crypto_data)
+    # Só leitura: nada é escrito no frame, então não precisa de cópia.
+    return index.latest_frame(allowed_symbols, copy=False)
+
+
+def score_rows(df_last: pd.DataFrame, predictions, proba_up) -> ScoredCryptos:
+    """`ScoredCryptos` das linhas de `df_last` com as previsões do modelo já calculadas."""
+    # Classificar risco usando volatilidade relativa (normalizada) para evitar tudo "alto"
+    risk_code = risk_tier_codes(compute_risk_metric(df_last))
+
+    # Preferimos expor 'symbol' como base cadastrado (ex.: BTC)
+    return ScoredCryptos(
+        symbol=df_last["symbol_base"].tolist(),
+        network=df_last["network"].tolist() if "network" in df_last.columns else None,
+        risk_code=risk_code,
+        risk_level=RISK_LEVELS[risk_code].tolist(),
+        predicted_movement=np.asarray(predictions).tolist(),
+        predicted_proba_up=np.asarray(proba_up).tolist(),
+    )
+
+
+def score_cryptos(crypto_data: pd.DataFrame | LatestRowIndex, allowed_symbols: set[str] | None = None) -> ScoredCryptos | None:
+    """
+    Parte independente do perfil: última linha por moeda, previsões do modelo e
+    nível de risco de cada moeda. Retorna None se não houver dados.
+    """
+    df_last = latest_rows(crypto_data, allowed_symbols)
 
     # Se não houver dados suficientes após o filtro, retorna vazio
-    if df.empty:
-        return []
-    # Prepara datas para cálculos por janela
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    else:
-        df["date"] = pd.NaT
+    if df_last.empty:
+        return None
+
+    # Previsão (1 = alta, 0 = queda) e probabilidade de alta (classe 1), quando disponível
+    predictions, proba_up = predict_with_proba_up(df_last)
+    return score_rows(df_last, predictions, proba_up)
+
+
+def score_cryptos_batch(
+    jobs: list[tuple[pd.DataFrame | LatestRowIndex, set[str] | None]],
+) -> list[ScoredCryptos | None]:
+    """`score_cryptos` de vários (dados, catálogo) com uma única chamada do modelo.
+
+    As últimas linhas de todos os jobs são concatenadas, avaliadas juntas e as
+    previsões são repartidas de volta (cada linha é prevista de forma
+    independente, então o resultado é o mesmo de chamadas separadas). O nível de
+    risco continua calculado por job, pelos tercis das moedas daquele job.
+    """
+    frames = [latest_rows(data, allowed) for data, allowed in jobs]
+    filled = [frame for frame in frames if not frame.empty]
+    if not filled:
+        return [None] * len(frames)
+    union = filled[0] if len(filled) == 1 else pd.concat(filled, ignore_index=True)
+    predictions, proba_up = predict_with_proba_up(union)
+    predictions, proba_up = np.asarray(predictions), np.asarray(proba_up)
 
-    # Consolidar uma linha por símbolo para passagem no modelo (último registro)
-    df_last = df.sort_values(["symbol_base", "date"]).groupby("symbol_base", as_index=False).tail(1)
+    results: list[ScoredCryptos | None] = []
+    start = 0
+    for frame in frames:
+        if frame.empty:
+            results.append(None)
+            continue
+        end = start + len(frame)
+        results.append(score_rows(frame, predictions[start:end], proba_up[start:end]))
+        start = end
+    return results
 
+
+def compute_risk_metric(df_last: pd.DataFrame) -> np.ndarray:
+    """Métrica de risco de 7 dias de cada moeda (uma linha por moeda)."""
     # Métrica de risco baseada em 7 dias: usar volatility_7 normalizada por preço (close)
     # Isso alinha a janela de risco à das predições.
-    if "volatility_7" in df_last.columns:
-        if "close" in df_last.columns:
-            risk_metric = df_last["volatility_7"].astype(float) / (df_last["close"].abs().astype(float) + 1e-9)
-        else:
-            # Sem close, usa a própria volatility_7 e normaliza por min-max no conjunto atual
-            v = df_last["volatility_7"].astype(float)
-            rng = float((v.max() - v.min()) or 1.0)
-            risk_metric = (v - v.min()) / (rng + 1e-12)
-    else:
+    if "volatility_7" not in df_last.columns:
         # Fallback para zero se coluna estiver ausente
-        risk_metric = pd.Series([0.0] * len(df_last), index=df_last.index)
-
-    # Quantis entre as moedas cadastradas
-    q1 = risk_metric.quantile(0.33)
-    q2 = risk_metric.quantile(0.66)
-
-    def classify_from_value(val: float) -> str:
-        if val <= q1:
-            return "baixo"
-        if val <= q2:
-            return "moderado"
-        return "alto"
-
-    predictions = predict_crypto_movement(df_last)
-    df_last["predicted_movement"] = predictions
-    # Probabilidade de alta (classe 1), quando disponível
-    try:
-        proba_up = predict_proba_up(df_last)
-        df_last["predicted_proba_up"] = proba_up
-    except Exception:
-        df_last["predicted_proba_up"] = np.nan
+        return np.zeros(len(df_last))
+    v = df_last["volatility_7"].to_numpy(dtype=float)
+    if "close" in df_last.columns:
+        return v / (np.abs(df_last["close"].to_numpy(dtype=float)) + 1e-9)
+    # Sem close, usa a própria volatility_7 e normaliza por min-max no conjunto atual
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        v_min, v_max = np.nanmin(v), np.nanmax(v)
+    rng = float((v_max - v_min) or 1.0)
+    return (v - v_min) / (rng + 1e-12)
 
-    # Classificar o risco da moeda baseado em volatilidade
-    # Classificar risco usando volatilidade relativa (normalizada) para evitar tudo "alto"
-    # Preferimos usar close como base; se não houver, caímos para min-max de volatility_7
-    # Aplica classificação baseada na métrica de 7 dias
-    df_last["_risk_metric_7d"] = risk_metric
-    df_last["Risk_Level"] = df_last["_risk_metric_7d"].apply(classify_from_value)
-
-    # Em vez de filtrar e limitar top 10, retornamos TODAS as moedas
-    # e indicamos se elas são elegíveis para o perfil do usuário.
-    if user_risk == "baixo":
-        eligible_mask = df_last["Risk_Level"] == "baixo"
-    elif user_risk == "moderado":
-        eligible_mask = df_last["Risk_Level"].isin(["baixo", "moderado"])
-    else:  # alto
-        eligible_mask = pd.Series([True] * len(df_last), index=df_last.index)
-
-    df_last["eligible_for_profile"] = eligible_mask
-
-    # Selecionar colunas de saída com tolerância a ausência de algumas colunas
-    out_cols = []
-    # Preferimos expor 'symbol' como base cadastrado (ex.: BTC)
-    if "symbol_base" in df_last.columns:
-        df_last["symbol"] = df_last["symbol_base"]
 
-    for c in ["symbol", "network", "Risk_Level", "predicted_movement", "predicted_proba_up", "eligible_for_profile"]:
-        if c in df_last.columns:
-            out_cols.append(c)
+def risk_tier_codes(risk_metric: np.ndarray) -> np.ndarray:
+    """Código do nível de risco (0 baixo, 1 moderado, 2 alto) pelos tercis entre as moedas.
+
+    Mesma regra de antes: <= q33 é baixo, <= q66 é moderado, o resto (inclusive
+    NaN) é alto; os quantis ignoram NaN, como o `Series.quantile`.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        q1, q2 = np.nanquantile(risk_metric, [0.33, 0.66])
+    return np.select([risk_metric <= q1, risk_metric <= q2], [0, 1], default=2).astype(np.int8)
+
 
-    result_df = df_last[out_cols]
-    return result_df.to_dict(orient="records")
+def classify_risk_levels(risk_metric: np.ndarray) -> np.ndarray:
+    """Nível de risco (baixo/moderado/alto) de cada moeda."""
+    return RISK_LEVELS[risk_tier_codes(risk_metric)]
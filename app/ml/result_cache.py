@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable
+
+from app.ml.inference_service import compute_scores
+from app.ml.snapshot import FeatureSnapshot
+
+if TYPE_CHECKING:
+    from app.ml.recommender import ScoredCryptos
+
+MAX_ENTRIES = 4
+# Respostas já serializadas: uma por perfil (3) para cada entrada de pontuação
+MAX_ENCODED_ENTRIES = MAX_ENTRIES * 3
+
+
+class RecommendationResultCache:
+    """Pontuação das moedas (`ScoredCryptos`) pré-calculada por snapshot e catálogo.
+
+    A saída depende apenas do perfil, do snapshot de features e do conjunto de
+    símbolos cadastrados; por isso a chave é (versão do snapshot, versão do
+    catálogo) e cada entrada guarda a pontuação independente de perfil, da qual
+    saem os registros de qualquer perfil (`records`) ou páginas (`select`).
+    Os registros retornados são compartilhados entre requests: não devem ser alterados.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], ScoredCryptos] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._encoded: OrderedDict[tuple, bytes] = OrderedDict()
+
+    def _touch(self, entries: OrderedDict, key) -> None:
+        """Marca `key` como usada por último (LRU); pode ter sido descartada desde a leitura."""
+        with self._lock:
+            if key in entries:
+                entries.move_to_end(key)
+
+    def get(self, snapshot: FeatureSnapshot, symbols: frozenset[str], catalog_version: str) -> ScoredCryptos:
+        key = (snapshot.version, catalog_version)
+        results = self._entries.get(key)
+        if results is not None:
+            self._touch(self._entries, key)
+            return results
+
+        # Um único cálculo por chave mesmo com vários requests simultâneos
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._touch(self._entries, key)
+                return results
+            results = compute_scores(snapshot, symbols)
+            with self._lock:
+                self._entries[key] = results
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._key_locks.pop(key, None)
+            return results
+
+    def get_encoded(self, key: tuple, build: Callable[[], bytes]) -> bytes:
+        """Corpo de resposta já serializado para `key`, gerado por `build()` na primeira vez.
+
+        A chave deve conter as versões de snapshot e catálogo (além do perfil),
+        assim uma mudança de dados nunca devolve bytes antigos.
+        """
+        payload = self._encoded.get(key)
+        if payload is not None:
+            self._touch(self._encoded, key)
+            return payload
+        # Serializar duas vezes em uma corrida é inofensivo: os bytes são iguais
+        payload = build()
+        with self._lock:
+            self._encoded[key] = payload
+            self._encoded.move_to_end(key)
+            while len(self._encoded) > MAX_ENCODED_ENTRIES:
+                self._encoded.popitem(last=False)
+        return payload
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._encoded.clear()
+
+
+result_cache = RecommendationResultCache()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from app.utils import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from app.ml.latest_index import LatestRowIndex
+
+# Este módulo é importado pelas rotas: pandas/numpy (via feature_store) e o
+# modelo só são importados quando o snapshot é efetivamente carregado.
+
+DEFAULT_CSV_PATH = "app/docs/dataframe_com_features.csv"
+REQUIRED_COLUMNS = ("network", "volatility_7", "symbol")
+# Colunas lidas por recommend_cryptos além das features do modelo
+RECOMMENDER_COLUMNS = REQUIRED_COLUMNS + ("date", "close")
+
+
+class SnapshotError(Exception):
+    """Erro genérico ao carregar o snapshot de features."""
+
+
+class SnapshotNotFoundError(SnapshotError):
+    """Arquivo de features não encontrado no caminho configurado."""
+
+    def __init__(self, path: str):
+        super().__init__(f"Arquivo CSV não encontrado em '{path}'")
+        self.path = path
+
+
+class SnapshotSchemaError(SnapshotError):
+    """Arquivo carregado não possui as colunas obrigatórias."""
+
+    def __init__(self, missing: list[str]):
+        super().__init__(f"CSV faltando colunas: {', '.join(missing)}")
+        self.missing = missing
+
+
+@dataclass(frozen=True)
+class FeatureSnapshot:
+    """Versão imutável do histórico de features carregado em memória.
+
+    O DataFrame é compartilhado entre requests e não deve ser alterado.
+    `latest` é o índice da última linha por símbolo, montado uma vez por snapshot.
+    """
+
+    path: str
+    version: str
+    frame: pd.DataFrame
+    latest: LatestRowIndex
+    mtime_ns: int
+    size: int
+    loaded_at: datetime
+
+
+def get_csv_path() -> str:
+    return os.getenv("RECOMMENDER_CSV_PATH", DEFAULT_CSV_PATH)
+
+
+def projected_columns() -> list[str]:
+    """Colunas realmente usadas pelo recomendador (projeção aplicada na leitura)."""
+    from app.ml.recommender import get_model_features
+
+    return list(dict.fromkeys([*RECOMMENDER_COLUMNS, *get_model_features()]))
+
+
+class FeatureSnapshotManager:
+    """Carrega o histórico de features uma vez por worker e recarrega só quando muda.
+
+    A cada chamada de `get()` apenas um `os.stat` é feito; se mtime/tamanho
+    mudarem, o arquivo é relido, o hash do conteúdo define a nova versão e o
+    snapshot é trocado de forma atômica (os leitores nunca veem um estado parcial).
+    Aceita CSV, parquet ou um diretório de feature store (ver `feature_store`);
+    para o feature store, a versão vem do manifest.
+    """
+
+    def __init__(self, path: str | None = None):
+        self._path = path
+        self._snapshot: FeatureSnapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path or get_csv_path()
+
+    def get(self) -> FeatureSnapshot:
+        from app.ml import feature_store
+
+        path = self.path
+        try:
+            st = os.stat(feature_store.version_file(path))
+        except FileNotFoundError:
+            raise SnapshotNotFoundError(path)
+
+        current = self._snapshot
+        if current is not None and self._is_current(current, path, st):
+            return current
+
+        with self._lock:
+            # Outro thread pode ter recarregado enquanto esperávamos o lock
+            current = self._snapshot
+            if current is not None and self._is_current(current, path, st):
+                return current
+            snapshot = self._load(path, current)
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    @staticmethod
+    def _is_current(snapshot: FeatureSnapshot, path: str, st: os.stat_result) -> bool:
+        return snapshot.path == path and snapshot.mtime_ns == st.st_mtime_ns and snapshot.size == st.st_size
+
+    @metrics.timed("snapshot_load")
+    def _load(self, path: str, previous: FeatureSnapshot | None) -> FeatureSnapshot:
+        from app.ml import feature_store
+        from app.ml.latest_index import LatestRowIndex
+
+        fmt = feature_store.detect_format(path)
+        try:
+            with open(feature_store.version_file(path), "rb") as fh:
+                raw = fh.read()
+                st = os.fstat(fh.fileno())
+        except FileNotFoundError:
+            raise SnapshotNotFoundError(path)
+
+        version = hashlib.sha256(raw).hexdigest()[:16]
+        if previous is not None and previous.path == path and previous.version == version:
+            # Apenas o mtime mudou (ex.: touch/cópia idêntica): reaproveita o frame
+            frame, latest = previous.frame, previous.latest
+        else:
+            try:
+                appended = self._appended_rows(path, fmt, raw, previous)
+                if appended is not None:
+                    # CSV só cresceu: atualiza o índice com as linhas novas
+                    latest = previous.latest.with_appended(appended)
+                    frame = latest.frame
+                else:
+                    frame = feature_store.load_feature_frame(
+                        path,
+                        projected_columns(),
+                        data=None if fmt == "store" else raw,
+                    )
+                    latest = None
+            except Exception as e:
+                raise SnapshotError(f"Falha ao ler CSV: {e}") from e
+            missing = [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+            if missing:
+                raise SnapshotSchemaError(missing)
+            if latest is None:
+                latest = LatestRowIndex(frame)
+
+        return FeatureSnapshot(
+            path=path,
+            version=version,
+            frame=frame,
+            latest=latest,
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            loaded_at=datetime.now(timezone.utc),
+        )
+
+    @staticmethod
+    def _appended_rows(path: str, fmt: str, raw: bytes, previous: FeatureSnapshot | None):
+        """Linhas acrescentadas ao fim do CSV desde `previous`, ou None se não for só um append."""
+        from app.ml import feature_store
+
+        if previous is None or previous.path != path or fmt != "csv" or len(raw) <= previous.size:
+            return None
+        prefix = raw[:previous.size]
+        if not prefix.endswith(b"\n") or hashlib.sha256(prefix).hexdigest()[:16] != previous.version:
+            return None
+        header = raw[:raw.index(b"\n") + 1]
+        return feature_store.load_feature_frame(path, projected_columns(), data=header + raw[previous.size:])
+
+
+snapshot_manager = FeatureSnapshotManager()
+
+
+def get_feature_snapshot() -> FeatureSnapshot:
+    """Retorna o snapshot de features atual (compartilhado pelas rotas)."""
+    return snapshot_manager.get()
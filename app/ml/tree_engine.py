@@ -0,0 +1,167 @@
+"""Inferência vetorizada para árvores/florestas de classificação do scikit-learn.
+
+O ensemble carregado do joblib é achatado em arrays contíguos de nós
+(feature, threshold, filhos e valores das folhas) e todas as árvores são
+percorridas ao mesmo tempo, para todas as linhas, em um único laço por
+profundidade. Classe e probabilidade saem da mesma travessia, sem o overhead
+por chamada do sklearn (validação, joblib.Parallel, uma chamada por árvore).
+
+Os resultados reproduzem o sklearn bit a bit:
+- X é convertido para float32 antes da comparação, como no `_validate_X_predict`;
+- NaN segue `missing_go_to_left` de cada nó;
+- as probabilidades das árvores são somadas na mesma ordem e divididas por
+  `len(estimators_)`, como em `ForestClassifier.predict_proba`.
+
+`compile_model` só aceita os estimadores conhecidos e confere o resultado
+contra o próprio sklearn antes de ser usado; qualquer divergência faz o
+chamador continuar no sklearn.
+"""
+import logging
+import warnings
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_LEAF = -1
+
+
+class UnsupportedModelError(ValueError):
+    """O estimador não pode ser compilado (tipo ou formato não suportado)."""
+
+
+class CompiledTreeEnsemble:
+    def __init__(self, model):
+        trees, is_forest = _extract_trees(model)
+        self.classes_ = np.asarray(model.classes_)
+        self.n_features_in_ = int(model.n_features_in_)
+        self.n_trees = len(trees)
+        self._is_forest = is_forest
+
+        n_classes = len(self.classes_)
+        sizes = [t.node_count for t in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        total = int(np.sum(sizes))
+
+        self._roots = offsets
+        self._feature = np.zeros(total, dtype=np.intp)
+        self._threshold = np.zeros(total, dtype=np.float64)
+        self._left = np.zeros(total, dtype=np.intp)
+        self._right = np.zeros(total, dtype=np.intp)
+        self._missing_left = np.zeros(total, dtype=bool)
+        self._value = np.zeros((total, n_classes), dtype=np.float64)
+        self._max_depth = 0
+
+        for tree, off in zip(trees, offsets):
+            n = tree.node_count
+            sl = slice(off, off + n)
+            own = np.arange(off, off + n, dtype=np.intp)
+            is_leaf = tree.children_left == _LEAF
+            # Folhas apontam para si mesmas: a travessia pode rodar a
+            # profundidade máxima para todas as árvores sem ramificar.
+            self._left[sl] = np.where(is_leaf, own, tree.children_left + off)
+            self._right[sl] = np.where(is_leaf, own, tree.children_right + off)
+            self._feature[sl] = np.where(is_leaf, 0, tree.feature)
+            self._threshold[sl] = tree.threshold
+            missing = getattr(tree, "missing_go_to_left", None)
+            if missing is not None:
+                self._missing_left[sl] = np.asarray(missing, dtype=bool)
+            self._value[sl] = tree.value[:, 0, :n_classes]
+            self._max_depth = max(self._max_depth, int(tree.max_depth))
+
+    def apply(self, X) -> np.ndarray:
+        """Índice global da folha alcançada em cada árvore: shape (n_amostras, n_árvores)."""
+        X = self._as_float32(X)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self._roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self._max_depth):
+            x = X[rows, self._feature[node]]
+            go_left = np.where(np.isnan(x), self._missing_left[node], x <= self._threshold[node])
+            node = np.where(go_left, self._left[node], self._right[node])
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        if not self._is_forest:
+            return self._value[leaves[:, 0]]
+        proba = np.zeros((leaves.shape[0], self._value.shape[1]), dtype=np.float64)
+        # Soma árvore a árvore, na ordem de estimators_, como o sklearn faz
+        for t in range(self.n_trees):
+            proba += self._value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict_with_proba(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """Classe prevista e matriz de probabilidades a partir de uma única travessia."""
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0), proba
+
+    def _as_float32(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Esperado X com {self.n_features_in_} colunas, recebido shape {X.shape}")
+        return X
+
+
+def _extract_trees(model):
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+
+    if type(model) in (RandomForestClassifier, ExtraTreesClassifier):
+        estimators = list(model.estimators_)
+        if not estimators:
+            raise UnsupportedModelError("Floresta sem estimadores")
+        is_forest = True
+    elif type(model) in (DecisionTreeClassifier, ExtraTreeClassifier):
+        estimators = [model]
+        is_forest = False
+    else:
+        raise UnsupportedModelError(f"Estimador não suportado: {type(model).__name__}")
+
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise UnsupportedModelError("Apenas modelos com uma saída são suportados")
+    return [e.tree_ for e in estimators], is_forest
+
+
+def probe_matrix(engine: CompiledTreeEnsemble, n_rows: int = 2048, seed: int = 0) -> np.ndarray:
+    """Linhas sintéticas que exercitam os dois lados de cada threshold do modelo."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, engine.n_features_in_), dtype=np.float32)
+    internal = engine._left != np.arange(len(engine._left))
+    for f in range(engine.n_features_in_):
+        thr = engine._threshold[internal & (engine._feature == f)].astype(np.float32)
+        if thr.size == 0:
+            X[:, f] = rng.normal(size=n_rows)
+            continue
+        candidates = np.concatenate([
+            thr,
+            np.nextafter(thr, np.float32(np.inf)),
+            np.nextafter(thr, np.float32(-np.inf)),
+        ])
+        X[:, f] = rng.choice(candidates, size=n_rows)
+    return X
+
+
+def verify_against_sklearn(engine: CompiledTreeEnsemble, model, X) -> bool:
+    """Confere bit a bit classe e probabilidades contra o sklearn para X."""
+    preds, proba = engine.predict_with_proba(X)
+    with warnings.catch_warnings():
+        # Modelo treinado com DataFrame avisa sobre X sem nomes de colunas
+        warnings.simplefilter("ignore", UserWarning)
+        expected_proba = model.predict_proba(X)
+        expected_preds = model.predict(X)
+    return np.array_equal(proba, expected_proba) and np.array_equal(preds, expected_preds)
+
+
+def compile_model(model) -> CompiledTreeEnsemble | None:
+    """Compila o modelo ou retorna None (o chamador deve usar o sklearn)."""
+    try:
+        engine = CompiledTreeEnsemble(model)
+    except UnsupportedModelError as e:
+        logger.info("Inferência compilada indisponível: %s", e)
+        return None
+
+    if not verify_against_sklearn(engine, model, probe_matrix(engine)):
+        logger.warning("Inferência compilada diverge do sklearn; usando o modelo sklearn")
+        return None
+    return engine
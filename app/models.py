@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Enum, Float, ForeignKey, Index
 from datetime import datetime
 from app.database import Base
 from sqlalchemy.orm import relationship
@@ -37,6 +37,9 @@ class Recommendation(Base):
     risk_level = Column(Enum(RiskLevel), nullable=True)
     recommended_at = Column(DateTime, default=datetime.utcnow)
 
+    # Listagem por usuário, mais recentes primeiro (keyset em recommended_at, id)
+    __table_args__ = (Index("ix_recommendations_user_id_recommended_at", "user_id", "recommended_at", "id"),)
+
     user = relationship("User", back_populates="recommendations")
     crypto = relationship("Cryptos", back_populates="recommendations")
 
@@ -54,7 +57,7 @@ class QuestionOption(Base):
     __tablename__ = "question_options"
 
     id = Column(Integer, primary_key=True, index=True)
-    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"))
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), index=True)
     value = Column(String(50), index=True)  # ex: 'short', 'medium', 'long'
     label = Column(String(255))             
     score = Column(Integer)                 
@@ -72,6 +75,8 @@ class QuestionnaireSubmission(Base):
     risk_level = Column(Enum(RiskLevel))  # baixo/moderado/alto
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_questionnaire_submissions_user_id_created_at", "user_id", "created_at", "id"),)
+
     user = relationship("User", back_populates="questionnaires")
     answers = relationship("UserAnswer", back_populates="submission", cascade="all, delete-orphan")
 
@@ -80,7 +85,7 @@ class UserAnswer(Base):
     __tablename__ = "user_answers"
 
     id = Column(Integer, primary_key=True, index=True)
-    submission_id = Column(Integer, ForeignKey("questionnaire_submissions.id", ondelete="CASCADE"))
+    submission_id = Column(Integer, ForeignKey("questionnaire_submissions.id", ondelete="CASCADE"), index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"))
     option_id = Column(Integer, ForeignKey("question_options.id", ondelete="SET NULL"), nullable=True)
@@ -88,12 +93,60 @@ class UserAnswer(Base):
     score = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_user_answers_user_id_created_at", "user_id", "created_at", "id"),)
+
     submission = relationship("QuestionnaireSubmission", back_populates="answers")
     user = relationship("User", back_populates="answers")
     question = relationship("Questions", back_populates="answers")
     option = relationship("QuestionOption")
 
 
+class RecommendationRun(Base):
+    """Conjunto de recomendações gerado para um usuário (uma execução do recomendador)."""
+    __tablename__ = "recommendation_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    risk_profile = Column(Enum(RiskLevel))
+    snapshot_version = Column(String(64))
+    catalog_version = Column(String(64))
+    source = Column(String(20))  # 'recommender' ou 'questionnaire'
+    submission_id = Column(Integer, ForeignKey("questionnaire_submissions.id", ondelete="SET NULL"), nullable=True)
+    item_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_recommendation_runs_user_id_created_at", "user_id", "created_at", "id"),)
+
+    items = relationship("RecommendationRunItem", back_populates="run", cascade="all, delete-orphan")
+
+
+class RecommendationRunItem(Base):
+    __tablename__ = "recommendation_run_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("recommendation_runs.id", ondelete="CASCADE"), index=True)
+    crypto_id = Column(Integer, ForeignKey("cryptos.id", ondelete="SET NULL"), nullable=True)
+    symbol = Column(String(20))
+    network = Column(String(100), nullable=True)
+    risk_level = Column(Enum(RiskLevel))
+    predicted_movement = Column(Integer, nullable=True)
+    predicted_proba_up = Column(Float, nullable=True)
+    eligible = Column(Boolean)
+
+    run = relationship("RecommendationRun", back_populates="items")
+
+
+class CatalogVersion(Base):
+    """Versão de um catálogo estático (ex.: 'questions'): incrementada a cada alteração por seed/migração."""
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 User.answers = relationship("UserAnswer", back_populates="user", cascade="all, delete-orphan")
 User.questionnaires = relationship("QuestionnaireSubmission", back_populates="user", cascade="all, delete-orphan")
 
+
+User.recommendation_runs = relationship("RecommendationRun", cascade="all, delete-orphan")
@@ -1,29 +1,39 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, Response
 from app import models, schemas
-from app.database import get_db
+from app.database import get_read_session, get_session
+from app.services.catalog_service import crypto_catalog
+from app.ml.result_cache import result_cache
+from app.utils.http_cache import CACHE_CONTROL_CRYPTOS, cache_headers, etag_matches, make_etag, not_modified
 
 router = APIRouter(prefix="/cryptos", tags=["Cryptos"])
 
 @router.get("/", response_model=list[schemas.CryptoResponse])
-def get_cryptos(db: Session = Depends(get_db)):
-    cryptos = db.query(models.Cryptos).all()
-    return cryptos
+async def get_cryptos(response: Response, db = Depends(get_read_session), if_none_match: str | None = Header(default=None)):
+    # Com o catálogo em cache (TTL) ainda válido, nem o 304 nem o corpo vão ao banco
+    catalog = crypto_catalog.current() or await db.run_sync(crypto_catalog.get)
+    etag = make_etag("cryptos", catalog.listing_version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_CRYPTOS)
+    response.headers.update(cache_headers(etag, CACHE_CONTROL_CRYPTOS))
+    return [{"id": id_, "name": name, "symbol": symbol} for id_, name, symbol in catalog.rows]
 
 @router.get("/{crypto_id}", response_model=schemas.CryptoResponse)
-def get_crypto(crypto_id: int, db: Session = Depends(get_db)):
-    crypto = db.query(models.Cryptos).filter(models.Cryptos.id == crypto_id).first()
+async def get_crypto(crypto_id: int, db = Depends(get_session)):
+    crypto = await db.get(models.Cryptos, crypto_id)
     if crypto:
         return crypto
     return {"error": "Crypto not found"}
 
 @router.post("/", response_model=schemas.CryptoResponse)
-def create_crypto(crypto: schemas.CryptoCreate, db: Session = Depends(get_db)):
+async def create_crypto(crypto: schemas.CryptoCreate, db = Depends(get_session)):
     new_crypto = models.Cryptos(
         name=crypto.name,
         symbol=crypto.symbol
     )
     db.add(new_crypto)
-    db.commit()
-    db.refresh(new_crypto)
-    return new_crypto
\ No newline at end of file
+    await db.commit()
+    await db.refresh(new_crypto)
+    # Novo símbolo muda o universo de moedas do recomendador
+    crypto_catalog.invalidate()
+    result_cache.invalidate()
+    return new_crypto
@@ -1,35 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import select
+from app.utils.profiling import run_in_threadpool
+from app.database import get_read_session, get_session
 from app import schemas
-from app.services.risk_service import submit_questionnaire, update_questionnaire_submission
-from app.ml.recommender import recommend_cryptos
-import os
-import pandas as pd
+from app.services.risk_service import UserNotFoundError, submit_questionnaire_async, update_questionnaire_submission_async
+from app.ml.result_cache import result_cache
+from app.ml.snapshot import get_feature_snapshot, SnapshotError
 from app import models
 from app.utils.security import require_auth, get_user_id_from_payload
+from app.services.catalog_service import crypto_catalog, question_catalog
+from app.services import recommendation_history_service as history
+from app.services.user_context_service import user_context_cache
+from app.utils.pagination import ListPage, keyset_paginate, list_page, page_rows, set_next_cursor
+from app.utils.http_cache import CACHE_CONTROL_QUESTIONS, cache_headers, etag_matches, make_etag, not_modified
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/questionnaire", tags=["Questionnaire"])
 
 @router.get("/questions", response_model=list[schemas.Question])
-def list_questions(db: Session = Depends(get_db), _=Depends(require_auth)):
-    questions = db.query(models.Questions).all()
-    return questions
+async def list_questions(response: Response, db = Depends(get_read_session), _=Depends(require_auth), if_none_match: str | None = Header(default=None)):
+    catalog = question_catalog.current() or await db.run_sync(question_catalog.get)
+    etag = make_etag("questions", catalog.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_QUESTIONS)
+    response.headers.update(cache_headers(etag, CACHE_CONTROL_QUESTIONS))
+    return list(catalog.questions)
+
+def _profile_recommendations(snapshot, catalog, risk_profile: str):
+    return result_cache.get(snapshot, catalog.symbols, catalog.version).records(risk_profile)
+
+async def _record_submission_run(db, user_id: int, submission_id: int, risk_profile: str, snapshot, catalog, recs) -> int | None:
+    """Grava as recomendações da submissão no histórico (None se desligado ou se a gravação falhar)."""
+    if not history.RECOMMENDATION_HISTORY_ENABLED:
+        return None
+    try:
+        return await history.record_run_async(
+            db, user_id, risk_profile, snapshot.version, catalog.version, recs, catalog.symbol_ids,
+            source="questionnaire", submission_id=submission_id,
+        )
+    except Exception:
+        # A submissão já foi gravada: falha no histórico não impede a resposta
+        logger.exception("Falha ao gravar execução do questionário")
+        return None
 
 @router.post("/submit")
-def submit(data: schemas.QuestionnaireSubmitIn, db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def submit(data: schemas.QuestionnaireSubmitIn, db = Depends(get_session), payload: dict = Depends(require_auth)):
     auth_user_id = get_user_id_from_payload(payload)
-    user = db.query(models.User).get(auth_user_id)
-    if not user:
+    try:
+        submission = await submit_questionnaire_async(db, auth_user_id, [a.model_dump() for a in data.answers])
+    except UserNotFoundError:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    submission = submit_questionnaire(db, auth_user_id, [a.model_dump() for a in data.answers])
+    # risk_profile do usuário mudou
+    user_context_cache.invalidate(auth_user_id)
     risk_profile = submission.risk_level.value
 
     # Geração de recomendações imediatas com base no perfil calculado
-    csv_path = os.getenv("RECOMMENDER_CSV_PATH", "app/docs/dataframe_com_features.csv")
     try:
-        df = pd.read_csv(csv_path)
-    except Exception as e:
+        # Carga do snapshot e cálculo do modelo são CPU-bound: fora do event loop
+        snapshot = await run_in_threadpool(get_feature_snapshot)
+    except SnapshotError as e:
         # Se falhar a leitura, retorna apenas resultado do questionário
         return {
             "questionnaire": {
@@ -41,9 +73,12 @@ def submit(data: schemas.QuestionnaireSubmitIn, db: Session = Depends(get_db), p
             "recommendations_error": f"Falha ao carregar dados para recomendações: {e}",
         }
 
-    required_cols = ["network", "volatility_7", "symbol"]
-    missing = [c for c in required_cols if c not in df.columns]
-    if missing:
+    try:
+        catalog = crypto_catalog.current() or await db.run_sync(crypto_catalog.get)
+        recs = await run_in_threadpool(_profile_recommendations, snapshot, catalog, risk_profile)
+    except Exception as e:
+        # A submissão já foi gravada: fila cheia, timeout ou erro do modelo não viram 500
+        # (o cliente repetiria o envio e duplicaria a submissão), como no PUT
         return {
             "questionnaire": {
                 "submission_id": submission.id,
@@ -51,11 +86,9 @@ def submit(data: schemas.QuestionnaireSubmitIn, db: Session = Depends(get_db), p
                 "max_score": submission.max_score,
                 "risk_level": risk_profile,
             },
-            "recommendations_error": f"CSV faltando colunas: {', '.join(missing)}",
+            "recommendations_error": f"Falha ao gerar recomendações: {e}",
         }
-
-    registered = {c.symbol for c in db.query(models.Cryptos).all()}
-    recs = recommend_cryptos(risk_profile, df, allowed_symbols=registered)
+    run_id = await _record_submission_run(db, auth_user_id, submission.id, risk_profile, snapshot, catalog, recs)
 
     return {
         "questionnaire": {
@@ -64,13 +97,20 @@ def submit(data: schemas.QuestionnaireSubmitIn, db: Session = Depends(get_db), p
             "max_score": submission.max_score,
             "risk_level": risk_profile,
         },
+        "snapshot_version": snapshot.version,
+        "run_id": run_id,
         "recommendations": recs,
     }
 
 @router.get("/submission/", response_model=list[schemas.QuestionnaireResult])
-def list_submissions(db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def list_submissions(response: Response, db = Depends(get_read_session), payload: dict = Depends(require_auth), page: ListPage = Depends(list_page)):
     auth_user_id = get_user_id_from_payload(payload)
-    submissions = db.query(models.QuestionnaireSubmission).filter(models.QuestionnaireSubmission.user_id == auth_user_id).all()
+    rows = (await db.scalars(keyset_paginate(
+        select(models.QuestionnaireSubmission).where(models.QuestionnaireSubmission.user_id == auth_user_id),
+        models.QuestionnaireSubmission.created_at, models.QuestionnaireSubmission.id, page,
+    ))).all()
+    submissions, next_cursor = page_rows(rows, page, "created_at")
+    set_next_cursor(response, next_cursor)
     return [
         schemas.QuestionnaireResult(
             submission_id=submission.id,
@@ -82,36 +122,41 @@ def list_submissions(db: Session = Depends(get_db), payload: dict = Depends(requ
     ]
 
 @router.get("/answers/", response_model=list[schemas.UserAnswer])
-def list_answers(db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def list_answers(response: Response, db = Depends(get_read_session), payload: dict = Depends(require_auth), page: ListPage = Depends(list_page)):
     auth_user_id = get_user_id_from_payload(payload)
-    answers = db.query(models.UserAnswer).filter(models.UserAnswer.user_id == auth_user_id).all()
+    rows = (await db.scalars(keyset_paginate(
+        select(models.UserAnswer).where(models.UserAnswer.user_id == auth_user_id),
+        models.UserAnswer.created_at, models.UserAnswer.id, page,
+    ))).all()
+    answers, next_cursor = page_rows(rows, page, "created_at")
+    set_next_cursor(response, next_cursor)
     return answers
 
 @router.put("/submission/{submission_id}")
-def update_submission(submission_id: int, data: schemas.QuestionnaireSubmitIn, db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def update_submission(submission_id: int, data: schemas.QuestionnaireSubmitIn, db = Depends(get_session), payload: dict = Depends(require_auth)):
     auth_user_id = get_user_id_from_payload(payload)
-    submission = db.query(models.QuestionnaireSubmission).get(submission_id)
+    submission = await db.get(models.QuestionnaireSubmission, submission_id)
     if not submission:
         raise HTTPException(status_code=404, detail="Submissão não encontrada")
     if submission.user_id != auth_user_id:
         raise HTTPException(status_code=400, detail="Usuário não bate com a submissão")
-    updated_submission = update_questionnaire_submission(db, submission_id, auth_user_id, [a.model_dump() for a in data.answers])
+    updated_submission = await update_questionnaire_submission_async(db, submission_id, auth_user_id, [a.model_dump() for a in data.answers])
+    user_context_cache.invalidate(auth_user_id)
     risk_profile = updated_submission.risk_level.value
 
-    csv_path = os.getenv("RECOMMENDER_CSV_PATH", "app/docs/dataframe_com_features.csv")
+    snapshot_version = None
+    run_id = None
     try:
-        df = pd.read_csv(csv_path)
-        required_cols = ["network", "volatility_7", "symbol"]
-        missing = [c for c in required_cols if c not in df.columns]
-        if missing:
-            raise ValueError(f"CSV faltando colunas: {', '.join(missing)}")
-        registered = {c.symbol for c in db.query(models.Cryptos).all()}
-        recs = recommend_cryptos(risk_profile, df, allowed_symbols=registered)
+        snapshot = await run_in_threadpool(get_feature_snapshot)
+        snapshot_version = snapshot.version
+        catalog = crypto_catalog.current() or await db.run_sync(crypto_catalog.get)
+        recs = await run_in_threadpool(_profile_recommendations, snapshot, catalog, risk_profile)
     except Exception as e:
         recs = []
         rec_error = str(e)
     else:
         rec_error = None
+        run_id = await _record_submission_run(db, auth_user_id, updated_submission.id, risk_profile, snapshot, catalog, recs)
 
     return {
         "questionnaire": {
@@ -120,6 +165,8 @@ def update_submission(submission_id: int, data: schemas.QuestionnaireSubmitIn, d
             "max_score": updated_submission.max_score,
             "risk_level": risk_profile,
         },
+        "snapshot_version": snapshot_version,
+        "run_id": run_id,
         "recommendations": recs,
         "recommendations_error": rec_error,
     }
@@ -1,61 +1,69 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+import logging
+from dataclasses import dataclass
+
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Response
+from sqlalchemy import select
+from app.utils.profiling import require_profile_token, run_in_threadpool
 from app import models, schemas
-from app.database import get_db
+from app.database import get_read_session, get_session
 from app.utils.security import require_auth, get_user_id_from_payload
-from app.ml.recommender import recommend_cryptos
-import pandas as pd
-import os
+from app.utils.json_response import EncodedJSONResponse, dumps
+from app.utils.pagination import ListPage, decode_cursor, encode_cursor, keyset_paginate, list_page, page_rows, set_next_cursor
+from app.utils.http_cache import CACHE_CONTROL_RECOMMENDER, cache_headers, etag_matches, make_etag, not_modified
+from app.services.catalog_service import crypto_catalog
+from app.services import recommendation_history_service as history
+from app.services.user_context_service import get_user_context
+from app.ml.result_cache import result_cache
+from app.ml.inference_service import InferenceQueueFullError, get_stats as get_inference_stats
+from app.ml.snapshot import get_feature_snapshot, SnapshotError, SnapshotNotFoundError, SnapshotSchemaError
+
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/recommendations", tags=["Recommendations"])
 
+# Maior página aceita em `limit` no recomendador
+MAX_RECOMMENDER_PAGE_SIZE = 500
+
 @router.get("/")
-def get_recommendations(db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def get_recommendations(response: Response, db = Depends(get_read_session), payload: dict = Depends(require_auth), page: ListPage = Depends(list_page)):
     auth_user_id = get_user_id_from_payload(payload)
-    recommendations = (
-        db.query(models.Recommendation)
-        .filter(models.Recommendation.user_id == auth_user_id)
-        .all()
-    )
+    rows = (await db.scalars(keyset_paginate(
+        select(models.Recommendation).where(models.Recommendation.user_id == auth_user_id),
+        models.Recommendation.recommended_at, models.Recommendation.id, page,
+    ))).all()
+    recommendations, next_cursor = page_rows(rows, page, "recommended_at")
+    set_next_cursor(response, next_cursor)
     return recommendations
 
 @router.get("/id/{recommendation_id}")
-def get_recommendation(recommendation_id: int, db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def get_recommendation(recommendation_id: int, db = Depends(get_session), payload: dict = Depends(require_auth)):
     auth_user_id = get_user_id_from_payload(payload)
-    recommendation = (
-        db.query(models.Recommendation)
-        .filter(models.Recommendation.id == recommendation_id)
-        .first()
-    )
+    recommendation = await db.get(models.Recommendation, recommendation_id)
     if not recommendation or recommendation.user_id != auth_user_id:
         return {"error": "Recommendation not found"}
     return recommendation
 
 @router.post("/")
-def create_recommendation(recommendation: schemas.RecommendationCreate, db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def create_recommendation(recommendation: schemas.RecommendationCreate, db = Depends(get_session), payload: dict = Depends(require_auth)):
     auth_user_id = get_user_id_from_payload(payload)
     data = recommendation.dict()
     data["user_id"] = auth_user_id
     db_recommendation = models.Recommendation(**data)
     db.add(db_recommendation)
-    db.commit()
-    db.refresh(db_recommendation)
+    await db.commit()
+    await db.refresh(db_recommendation)
     return db_recommendation
 
 @router.patch("/id/{recommendation_id}")
-def update_recommendation(risk_level: schemas.RiskLevelUpdate, recommendation_id: int, db: Session = Depends(get_db), payload: dict = Depends(require_auth)):
+async def update_recommendation(risk_level: schemas.RiskLevelUpdate, recommendation_id: int, db = Depends(get_session), payload: dict = Depends(require_auth)):
     auth_user_id = get_user_id_from_payload(payload)
-    recommendation = (
-        db.query(models.Recommendation)
-        .filter(models.Recommendation.id == recommendation_id)
-        .first()
-    )
+    recommendation = await db.get(models.Recommendation, recommendation_id)
     if not recommendation or recommendation.user_id != auth_user_id:
         return {"error": "Recommendation not found"}
     recommendation.risk_level = risk_level.risk_level
-    db.commit()
-    db.refresh(recommendation)
+    await db.commit()
+    await db.refresh(recommendation)
     return recommendation
 
 def _resolve_risk_profile(risk_profile_param, body_obj, user_obj):
@@ -68,55 +76,187 @@ def _resolve_risk_profile(risk_profile_param, body_obj, user_obj):
         return user_obj.risk_profile
     return None
 
-def _generate_dynamic_recommendations(db: Session, auth_user_id: int, effective_profile: str):
-    csv_path = os.getenv("RECOMMENDER_CSV_PATH", "app/docs/dataframe_com_features.csv")
+@dataclass(frozen=True)
+class RecommenderView:
+    """Recorte pedido pelo cliente sobre as recomendações de um perfil."""
+    limit: int | None = None
+    cursor: str | None = None
+    eligible_only: bool = False
+    sort_by: str | None = None
+    descending: bool = True
+    fields: tuple[str, ...] | None = None
+
+    @property
+    def is_full(self) -> bool:
+        """Sem parâmetros: resposta completa de sempre (todas as moedas, todos os campos)."""
+        return self == RecommenderView()
+
+    def signature(self, profile: str) -> str:
+        # O cursor só vale para a mesma consulta (mesmo perfil, filtro e ordenação)
+        return f"{profile}|{self.eligible_only}|{self.sort_by}|{self.descending}"
+
+def _recommender_view(
+    limit: int | None = Query(default=None, ge=1, le=MAX_RECOMMENDER_PAGE_SIZE, description="Tamanho da página (top-K pela ordenação)"),
+    cursor: str | None = Query(default=None, description="Valor de next_cursor da página anterior"),
+    eligible_only: bool = Query(default=False, description="Somente moedas elegíveis para o perfil"),
+    sort: schemas.RecommenderSortField | None = Query(default=None, description="Campo de ordenação (padrão: símbolo)"),
+    order: schemas.SortOrder = Query(default=schemas.SortOrder.desc, description="Direção da ordenação"),
+    fields: str | None = Query(default=None, description="Campos do registro separados por vírgula (ex.: symbol,predicted_proba_up)"),
+) -> RecommenderView:
+    projection = tuple(f.strip() for f in fields.split(",") if f.strip()) if fields is not None else None
+    if projection == ():
+        # `fields=,` ou `fields=%20`: página sem campos, e o cursor não avançaria
+        raise HTTPException(status_code=400, detail="fields vazio: informe ao menos um campo ou omita o parâmetro")
+    return RecommenderView(
+        limit=limit,
+        cursor=cursor,
+        eligible_only=eligible_only,
+        sort_by=sort.value if sort is not None else None,
+        descending=order == schemas.SortOrder.desc,
+        fields=projection,
+    )
+
+async def _generate_dynamic_recommendations(db, auth_user_id: int, effective_profile: str, view: RecommenderView, *, conditional: bool = False, if_none_match: str | None = None):
+    catalog = crypto_catalog.current() or await db.run_sync(crypto_catalog.get)
+    # Carga do snapshot e cálculo do modelo são CPU-bound: fora do event loop
+    response, generated = await run_in_threadpool(_compute_recommendations, catalog, effective_profile, view, conditional, if_none_match)
+    if generated is not None and history.RECOMMENDATION_HISTORY_ENABLED:
+        # Guarda o conjunto completo do perfil (não só a página pedida) no histórico
+        snapshot_version, records = generated
+        try:
+            run_id = await history.get_or_record_run_async(
+                db, auth_user_id, effective_profile, snapshot_version, catalog.version, records, catalog.symbol_ids,
+            )
+        except Exception:
+            # Falha ao gravar o histórico não impede a resposta
+            logger.exception("Falha ao gravar execução do recomendador")
+        else:
+            response.headers["X-Recommendation-Run-Id"] = str(run_id)
+    return response
+
+def _compute_recommendations(catalog, effective_profile: str, view: RecommenderView, conditional: bool = False, if_none_match: str | None = None):
+    """Resposta do recomendador e (versão do snapshot, registros do perfil) para o histórico.
+
+    Com `conditional` (GET), leva ETag/Cache-Control e, se o If-None-Match
+    bater, devolve 304 (sem registros) antes de tocar no modelo.
+    """
     try:
-        df = pd.read_csv(csv_path)
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail=f"Arquivo CSV não encontrado em '{csv_path}'. Suba o arquivo ou ajuste RECOMMENDER_CSV_PATH.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Falha ao ler CSV: {e}")
+        snapshot = get_feature_snapshot()
+    except SnapshotNotFoundError as e:
+        raise HTTPException(status_code=500, detail=f"Arquivo CSV não encontrado em '{e.path}'. Suba o arquivo ou ajuste RECOMMENDER_CSV_PATH.")
+    except SnapshotSchemaError as e:
+        raise HTTPException(status_code=400, detail=f"CSV precisa conter as colunas: {', '.join(e.missing)}.")
+    except SnapshotError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    required_cols = ["network", "volatility_7", "symbol"]
-    missing = [c for c in required_cols if c not in df.columns]
-    if missing:
-        raise HTTPException(status_code=400, detail=f"CSV precisa conter as colunas: {', '.join(missing)}.")
+    # O corpo depende só do snapshot, do catálogo, do perfil e do recorte pedido
+    etag = make_etag("recommender", snapshot.version, catalog.version, effective_profile, view)
+    if conditional and etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_RECOMMENDER, private=True), None
+    headers = cache_headers(etag, CACHE_CONTROL_RECOMMENDER, private=True) if conditional else None
 
     try:
-        registered = {c.symbol for c in db.query(models.Cryptos).all()}
-        results = recommend_cryptos(effective_profile, df, allowed_symbols=registered)
+        scored = result_cache.get(snapshot, catalog.symbols, catalog.version)
+    except InferenceQueueFullError:
+        raise HTTPException(status_code=503, detail="Recomendador sobrecarregado, tente novamente em instantes.")
     except KeyError as e:
         missing = str(e).strip("'\"")
         raise HTTPException(status_code=400, detail=f"Coluna de feature ausente no CSV: {missing}.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha ao gerar recomendações: {e}")
-    return results
+
+    generated = (snapshot.version, scored.records(effective_profile))
+    body = {"profile": effective_profile, "snapshot_version": snapshot.version}
+    if view.is_full:
+        # Resposta completa é a mesma para todo usuário do perfil: serializada uma
+        # vez por snapshot/catálogo e servida como bytes nas próximas chamadas
+        payload = result_cache.get_encoded(
+            (snapshot.version, catalog.version, effective_profile),
+            lambda: dumps({**body, "recommendations": scored.records(effective_profile)}),
+        )
+        return EncodedJSONResponse(payload, headers=headers), generated
+
+    unknown = [f for f in view.fields or () if f not in scored.fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconhecidos em fields: {', '.join(unknown)} (use: {', '.join(scored.fields)}).")
+
+    # O cursor guarda a posição na ordenação de um snapshot/catálogo específico;
+    # se qualquer um mudou, a ordenação não é mais a mesma
+    offset = 0
+    state = {"s": snapshot.version, "c": catalog.version, "q": view.signature(effective_profile)}
+    if view.cursor:
+        data = decode_cursor(view.cursor)
+        if any(data.get(k) != v for k, v in state.items()):
+            raise HTTPException(status_code=400, detail="cursor expirado ou de outra consulta; recomece sem cursor")
+        offset = data.get("o", 0)
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(status_code=400, detail="cursor inválido")
+
+    records, total = scored.select(
+        effective_profile,
+        fields=view.fields,
+        eligible_only=view.eligible_only,
+        sort_by=view.sort_by,
+        descending=view.descending,
+        offset=offset,
+        limit=view.limit,
+    )
+    next_offset = offset + len(records)
+    body["recommendations"] = records
+    body["total"] = total
+    body["next_cursor"] = encode_cursor({**state, "o": next_offset}) if view.limit is not None and next_offset < total else None
+    return EncodedJSONResponse(dumps(body), headers=headers), generated
 
 @router.post("/recommender")
-def run_recommender(
-    db: Session = Depends(get_db),
+async def run_recommender(
+    db = Depends(get_session),
     payload: dict = Depends(require_auth),
     risk_profile: schemas.RiskLevelEnum | None = Query(default=None, description="Perfil de risco: baixo, moderado, alto"),
     body: schemas.RecommenderRequest | None = None,
+    view: RecommenderView = Depends(_recommender_view),
 ):
     auth_user_id = get_user_id_from_payload(payload)
-    user = db.query(models.User).get(auth_user_id)
+    user = await get_user_context(db, auth_user_id)
     effective = _resolve_risk_profile(risk_profile, body, user)
     if effective not in {"baixo", "moderado", "alto"}:
         raise HTTPException(status_code=400, detail="risk_profile ausente ou inválido (use: baixo/moderado/alto)")
-    results = _generate_dynamic_recommendations(db, auth_user_id, effective)
-    return {"profile": effective, "recommendations": results}
+    return await _generate_dynamic_recommendations(db, auth_user_id, effective, view)
 
 @router.get("/recommender")
-def get_recommender(
-    db: Session = Depends(get_db),
+async def get_recommender(
+    db = Depends(get_session),
     payload: dict = Depends(require_auth),
     risk_profile: schemas.RiskLevelEnum | None = Query(default=None, description="Perfil de risco: baixo, moderado, alto"),
+    view: RecommenderView = Depends(_recommender_view),
+    if_none_match: str | None = Header(default=None),
 ):
     auth_user_id = get_user_id_from_payload(payload)
-    user = db.query(models.User).get(auth_user_id)
+    # Com o perfil na query, o usuário nem precisa ser lido do banco
+    user = await get_user_context(db, auth_user_id) if risk_profile is None else None
     effective = _resolve_risk_profile(risk_profile, None, user)
     if effective not in {"baixo", "moderado", "alto"}:
         raise HTTPException(status_code=400, detail="risk_profile ausente ou inválido (use: baixo/moderado/alto)")
-    results = _generate_dynamic_recommendations(db, auth_user_id, effective)
-    return {"profile": effective, "recommendations": results}
\ No newline at end of file
+    return await _generate_dynamic_recommendations(db, auth_user_id, effective, view, conditional=True, if_none_match=if_none_match)
+
+@router.get("/history")
+async def list_recommendation_history(response: Response, db = Depends(get_read_session), payload: dict = Depends(require_auth), page: ListPage = Depends(list_page)):
+    """Execuções anteriores do recomendador/questionário do usuário (mais recentes primeiro)."""
+    auth_user_id = get_user_id_from_payload(payload)
+    runs, next_cursor = await db.run_sync(history.list_runs, auth_user_id, page)
+    set_next_cursor(response, next_cursor)
+    return [history.run_summary(run) for run in runs]
+
+@router.get("/history/{run_id}")
+async def get_recommendation_run(run_id: int, db = Depends(get_session), payload: dict = Depends(require_auth)):
+    """Recomendações gravadas de uma execução, no mesmo formato do recomendador."""
+    auth_user_id = get_user_id_from_payload(payload)
+    run = await db.get(models.RecommendationRun, run_id)
+    if not run or run.user_id != auth_user_id:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    items = await db.run_sync(history.get_run_items, run_id)
+    return {**history.run_summary(run), "recommendations": [history.item_record(item) for item in items]}
+
+@router.get("/inference/stats", dependencies=[Depends(require_profile_token)])
+def inference_stats():
+    """Métricas do executor de inferência (tamanho/ocupação dos lotes e espera na fila)."""
+    return get_inference_stats()
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.database import get_pool_stats
+from app.utils.profiling import profile_store, require_profile_token
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+
+@router.get("/db/pool", dependencies=[Depends(require_profile_token)])
+def db_pool_stats():
+    """Ocupação dos pools de conexão deste worker e espera no checkout (primário e réplica)."""
+    return get_pool_stats()
+
+
+@router.get("/profiles", dependencies=[Depends(require_profile_token)])
+def list_profiles():
+    """Perfis gravados (mais recentes primeiro), de todos os workers que compartilham PROFILE_DIR."""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+def get_profile(profile_id: str, format: str = Query("prof", pattern="^(prof|text)$"), limit: int = Query(60, ge=1, le=500)):
+    """Baixa o `.prof` (pstats: snakeviz/tuna) ou, com `format=text`, as funções por tempo acumulado."""
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    if format == "text":
+        return PlainTextResponse(profile_store.text(path, limit))
+    return FileResponse(path, media_type="application/octet-stream", filename=profile_id)
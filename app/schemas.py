@@ -139,4 +139,16 @@ class UserAnswer(BaseModel):
 
 # Requisição para o recomendador
 class RecommenderRequest(BaseModel):
-    risk_profile: Optional[RiskLevelEnum] = None
\ No newline at end of file
+    risk_profile: Optional[RiskLevelEnum] = None
+
+# Ordenação das recomendações (GET/POST /recommendations/recommender)
+class RecommenderSortField(str, PyEnum):
+    predicted_proba_up = "predicted_proba_up"
+    predicted_movement = "predicted_movement"
+    Risk_Level = "Risk_Level"
+    symbol = "symbol"
+
+
+class SortOrder(str, PyEnum):
+    asc = "asc"
+    desc = "desc"
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from app import models
+
+# Em múltiplos workers, um POST em um processo não invalida os outros:
+# o TTL limita por quanto tempo um worker pode servir um catálogo antigo.
+CRYPTO_CATALOG_TTL_SECONDS: float = float(os.getenv("CRYPTO_CATALOG_TTL_SECONDS", "30"))
+# Perguntas só mudam com seed/migração: TTL maior. Ao expirar, só a versão do
+# catálogo (catalog_versions) é lida; perguntas e opções são recarregadas se ela mudou.
+QUESTION_CATALOG_TTL_SECONDS: float = float(os.getenv("QUESTION_CATALOG_TTL_SECONDS", "300"))
+QUESTION_CATALOG_NAME = "questions"
+# Pontuação máxima por pergunta (mesma regra de max_score das submissões)
+MAX_SCORE_PER_QUESTION = 3
+
+
+@dataclass(frozen=True)
+class CryptoCatalogSnapshot:
+	symbols: frozenset[str]
+	version: str
+	loaded_at: float
+	# Linhas (id, name, symbol) por id, servidas em GET /cryptos/
+	rows: tuple[tuple[int, str, str], ...] = ()
+	# Hash das linhas: muda também quando só o nome muda (ETag da listagem)
+	listing_version: str = ""
+	# symbol -> id, para gravar itens de recomendação sem consultar o banco
+	symbol_ids: dict[str, int] = field(default_factory=dict)
+
+
+class CryptoCatalog:
+	"""Cache por processo do conjunto de `Cryptos.symbol` cadastrados.
+
+	A versão é um hash dos símbolos, então dois workers com o mesmo catálogo
+	produzem a mesma versão (e a mesma chave de cache de recomendações).
+	"""
+
+	def __init__(self, ttl_seconds: float = CRYPTO_CATALOG_TTL_SECONDS):
+		self.ttl_seconds = ttl_seconds
+		self._snapshot: CryptoCatalogSnapshot | None = None
+		self._lock = threading.Lock()
+
+	def current(self) -> CryptoCatalogSnapshot | None:
+		"""Catálogo em cache ainda válido, sem tocar no banco (None se precisar recarregar)."""
+		current = self._snapshot
+		if current is not None and time.monotonic() - current.loaded_at < self.ttl_seconds:
+			return current
+		return None
+
+	def get(self, db: Session) -> CryptoCatalogSnapshot:
+		current = self.current()
+		if current is not None:
+			return current
+		with self._lock:
+			current = self._snapshot
+			if current is not None and time.monotonic() - current.loaded_at < self.ttl_seconds:
+				return current
+			rows = tuple(
+				(id_, name, symbol)
+				for id_, name, symbol in db.execute(
+					select(models.Cryptos.id, models.Cryptos.name, models.Cryptos.symbol).order_by(models.Cryptos.id)
+				)
+			)
+			symbols = frozenset(symbol for _, _, symbol in rows)
+			snapshot = CryptoCatalogSnapshot(
+				symbols=symbols,
+				version=_symbols_version(symbols),
+				loaded_at=time.monotonic(),
+				rows=rows,
+				listing_version=_content_version(rows),
+				symbol_ids={symbol: id_ for id_, _, symbol in rows},
+			)
+			self._snapshot = snapshot
+			return snapshot
+
+	def invalidate(self) -> None:
+		with self._lock:
+			self._snapshot = None
+
+
+@dataclass(frozen=True)
+class QuestionCatalogSnapshot:
+	# Perguntas já no formato de schemas.Question (com opções)
+	questions: tuple[dict, ...]
+	version: str
+	loaded_at: float
+	# Valor de catalog_versions quando as perguntas foram lidas
+	revision: int = 0
+	# option_id -> opção e question_id -> {value -> opção}, para pontuar sem consultar o banco
+	options_by_id: dict[int, dict] = field(default_factory=dict)
+	options_by_value: dict[int, dict[str, dict]] = field(default_factory=dict)
+	max_score: int = 0
+
+	def resolve_option(self, question_id: int | None, option_id: int | None = None, value: str | None = None) -> dict | None:
+		"""Opção escolhida numa resposta: pelo id quando informado, senão pelo value da pergunta."""
+		if option_id is not None:
+			return self.options_by_id.get(option_id)
+		if value is not None:
+			return self.options_by_value.get(question_id, {}).get(value)
+		return None
+
+
+class QuestionCatalog:
+	"""Cache por processo das perguntas do questionário e suas opções.
+
+	Mesmo esquema do CryptoCatalog: `current()` não toca no banco e a versão é
+	um hash do conteúdo. Quando o TTL expira, `get(db)` lê apenas a revisão em
+	catalog_versions e só recarrega perguntas e opções (uma consulta com
+	selectinload) se ela mudou desde a última carga.
+	"""
+
+	def __init__(self, ttl_seconds: float = QUESTION_CATALOG_TTL_SECONDS):
+		self.ttl_seconds = ttl_seconds
+		self._snapshot: QuestionCatalogSnapshot | None = None
+		self._lock = threading.Lock()
+
+	def current(self) -> QuestionCatalogSnapshot | None:
+		current = self._snapshot
+		if current is not None and time.monotonic() - current.loaded_at < self.ttl_seconds:
+			return current
+		return None
+
+	def get(self, db: Session) -> QuestionCatalogSnapshot:
+		current = self.current()
+		if current is not None:
+			return current
+		with self._lock:
+			current = self._snapshot
+			if current is not None and time.monotonic() - current.loaded_at < self.ttl_seconds:
+				return current
+			revision = catalog_revision(db, QUESTION_CATALOG_NAME)
+			if current is not None and current.revision == revision:
+				self._snapshot = replace(current, loaded_at=time.monotonic())
+				return self._snapshot
+			questions = db.scalars(
+				select(models.Questions).options(selectinload(models.Questions.options)).order_by(models.Questions.id)
+			).all()
+			payload = tuple(
+				{
+					"id": q.id,
+					"question_text": q.question_text,
+					"options": [
+						{"id": o.id, "value": o.value, "label": o.label, "score": o.score}
+						for o in sorted(q.options, key=lambda o: o.id)
+					],
+				}
+				for q in questions
+			)
+			options_by_value = {}
+			for q in payload:
+				by_value = options_by_value.setdefault(q["id"], {})
+				for o in q["options"]:
+					by_value[o["value"]] = o
+			snapshot = QuestionCatalogSnapshot(
+				questions=payload,
+				version=_content_version(payload),
+				loaded_at=time.monotonic(),
+				revision=revision,
+				options_by_id={o["id"]: o for q in payload for o in q["options"]},
+				options_by_value=options_by_value,
+				max_score=len(payload) * MAX_SCORE_PER_QUESTION,
+			)
+			self._snapshot = snapshot
+			return snapshot
+
+	def invalidate(self) -> None:
+		with self._lock:
+			self._snapshot = None
+
+
+def catalog_revision(db: Session, name: str) -> int:
+	return db.scalar(select(models.CatalogVersion.version).where(models.CatalogVersion.name == name)) or 0
+
+
+def bump_catalog_version(db: Session, name: str) -> int:
+	"""Incrementa a versão do catálogo (na transação do chamador): os workers recarregam ao fim do TTL."""
+	row = db.get(models.CatalogVersion, name)
+	if row is None:
+		row = models.CatalogVersion(name=name, version=0)
+		db.add(row)
+	row.version += 1
+	row.updated_at = datetime.utcnow()
+	db.flush()
+	return row.version
+
+
+def _symbols_version(symbols: frozenset[str]) -> str:
+	return hashlib.sha256("\n".join(sorted(symbols)).encode("utf-8")).hexdigest()[:16]
+
+
+def _content_version(content) -> str:
+	return hashlib.sha256(repr(content).encode("utf-8")).hexdigest()[:16]
+
+
+crypto_catalog = CryptoCatalog()
+question_catalog = QuestionCatalog()
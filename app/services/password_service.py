@@ -0,0 +1,173 @@
+"""Executor dedicado e limitado para hash/verificação de senha (bcrypt).
+
+bcrypt é caro de propósito: no threadpool do Starlette, uma rajada de logins
+ocupa todos os threads e atrasa as rotas baratas. Aqui o trabalho vai para um
+pool próprio de `PASSWORD_HASH_WORKERS` (threads, ou processos com
+`PASSWORD_HASH_EXECUTOR=process`) e no máximo `PASSWORD_HASH_MAX_PENDING`
+operações podem estar em execução ou na fila; acima disso a chamada falha na
+hora com `PasswordHasherBusyError` (a rota responde 503).
+
+O custo vem de `BCRYPT_ROUNDS`. No login, `verify_password` também diz se o
+hash gravado usa outro custo e já devolve o novo hash para ser salvo.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from app.utils import metrics
+
+BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(WORKERS * 8)))
+# Amostras recentes por operação usadas nos percentis
+TIMING_WINDOW: int = int(os.getenv("PASSWORD_HASH_TIMING_WINDOW", "1000"))
+
+# Mudar BCRYPT_ROUNDS faz needs_update() marcar os hashes antigos: eles são refeitos no próximo login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasherBusyError(RuntimeError):
+	"""Fila do executor de senha cheia (o chamador deve responder 503)."""
+
+
+def _hash(password: str) -> tuple[str, float]:
+	started = time.perf_counter()
+	return pwd_context.hash(password), time.perf_counter() - started
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[tuple[bool, str | None], float]:
+	started = time.perf_counter()
+	return pwd_context.verify_and_update(password, hashed), time.perf_counter() - started
+
+
+class HashTimings:
+	"""Tempos por operação: execução no worker e espera na fila (lidos por get_stats)."""
+
+	def __init__(self, window: int = TIMING_WINDOW):
+		self._lock = threading.Lock()
+		self._ops: dict[str, dict] = {}
+		self.window = window
+		self.rejected = 0
+		self.rehashed = 0
+
+	def record(self, op: str, run_seconds: float, wait_seconds: float) -> None:
+		with self._lock:
+			stats = self._ops.setdefault(op, {"count": 0, "run_sum": 0.0, "run_max": 0.0, "wait_sum": 0.0, "wait_max": 0.0, "recent": deque(maxlen=self.window)})
+			stats["count"] += 1
+			stats["run_sum"] += run_seconds
+			stats["run_max"] = max(stats["run_max"], run_seconds)
+			stats["wait_sum"] += wait_seconds
+			stats["wait_max"] = max(stats["wait_max"], wait_seconds)
+			stats["recent"].append(run_seconds)
+
+	def record_rejected(self) -> None:
+		with self._lock:
+			self.rejected += 1
+
+	def record_rehash(self) -> None:
+		with self._lock:
+			self.rehashed += 1
+
+	def snapshot(self) -> dict:
+		with self._lock:
+			ops = {}
+			for op, stats in self._ops.items():
+				recent = sorted(stats["recent"])
+				count = stats["count"]
+				ops[op] = {
+					"count": count,
+					"avg_ms": stats["run_sum"] / count * 1000,
+					"p50_ms": recent[len(recent) // 2] * 1000,
+					"p95_ms": recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000,
+					"max_ms": stats["run_max"] * 1000,
+					"avg_queue_wait_ms": stats["wait_sum"] / count * 1000,
+					"max_queue_wait_ms": stats["wait_max"] * 1000,
+				}
+			return {"rejected": self.rejected, "rehashed": self.rehashed, "operations": ops}
+
+
+class PasswordHasher:
+	def __init__(self, executor: str = EXECUTOR, workers: int = WORKERS, max_pending: int = MAX_PENDING):
+		self.executor_kind = executor
+		self.workers = workers
+		self.max_pending = max_pending
+		self.timings = HashTimings()
+		self._pending = 0
+		self._lock = threading.Lock()
+		self._executor: Executor = (
+			ProcessPoolExecutor(max_workers=workers)
+			if executor == "process"
+			else ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+		)
+
+	def pending(self) -> int:
+		return self._pending
+
+	async def run(self, op: str, fn, *args):
+		with self._lock:
+			if self._pending >= self.max_pending:
+				self.timings.record_rejected()
+				raise PasswordHasherBusyError("Fila de hash de senha cheia")
+			self._pending += 1
+		submitted = time.perf_counter()
+		try:
+			result, run_seconds = await asyncio.wrap_future(self._executor.submit(fn, *args))
+		finally:
+			with self._lock:
+				self._pending -= 1
+		self.timings.record(op, run_seconds, max(0.0, time.perf_counter() - submitted - run_seconds))
+		metrics.observe_operation(f"bcrypt_{op}", run_seconds)
+		return result
+
+	def shutdown(self) -> None:
+		self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: PasswordHasher | None = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher() -> PasswordHasher:
+	global _hasher
+	if _hasher is None:
+		with _hasher_lock:
+			if _hasher is None:
+				_hasher = PasswordHasher()
+	return _hasher
+
+
+def shutdown() -> None:
+	global _hasher
+	with _hasher_lock:
+		if _hasher is not None:
+			_hasher.shutdown()
+			_hasher = None
+
+
+async def hash_password(password: str) -> str:
+	return await get_hasher().run("hash", _hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+	"""(senha confere, novo hash) — o novo hash vem quando o gravado usa outro custo."""
+	hasher = get_hasher()
+	valid, new_hash = await hasher.run("verify", _verify_and_update, password, hashed)
+	if new_hash is not None:
+		hasher.timings.record_rehash()
+	return valid, new_hash
+
+
+def get_stats() -> dict:
+	hasher = _hasher
+	config = {"executor": EXECUTOR, "workers": WORKERS, "max_pending": MAX_PENDING, "bcrypt_rounds": BCRYPT_ROUNDS}
+	if hasher is None:
+		return config
+	return {**config, "pending": hasher.pending(), **hasher.timings.snapshot()}
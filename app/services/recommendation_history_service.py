@@ -0,0 +1,187 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app import models
+from app.utils.pagination import ListPage, keyset_paginate, page_rows
+
+# RECOMMENDATION_HISTORY=false desliga a gravação das execuções (leituras continuam)
+RECOMMENDATION_HISTORY_ENABLED: bool = os.getenv("RECOMMENDATION_HISTORY", "true").lower() in ("1", "true", "yes")
+# Quantos usuários o processo lembra (última execução gravada) para evitar ir ao banco
+RECENT_RUNS_MAX_USERS: int = int(os.getenv("RECOMMENDATION_HISTORY_MEMO_USERS", "10000"))
+
+
+class _RecentRuns:
+	"""Última execução gravada por usuário neste processo: (fingerprint, run_id)."""
+
+	def __init__(self, max_users: int = RECENT_RUNS_MAX_USERS):
+		self.max_users = max_users
+		self._runs: OrderedDict[int, tuple[tuple, int]] = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, user_id: int, fingerprint: tuple) -> int | None:
+		entry = self._runs.get(user_id)
+		if entry is not None and entry[0] == fingerprint:
+			return entry[1]
+		return None
+
+	def remember(self, user_id: int, fingerprint: tuple, run_id: int) -> None:
+		with self._lock:
+			self._runs[user_id] = (fingerprint, run_id)
+			self._runs.move_to_end(user_id)
+			while len(self._runs) > self.max_users:
+				self._runs.popitem(last=False)
+
+	def forget(self, user_id: int) -> None:
+		with self._lock:
+			self._runs.pop(user_id, None)
+
+
+_recent_runs = _RecentRuns()
+
+
+def forget_user(user_id: int) -> None:
+	"""Esquece a última execução do usuário (ex.: usuário excluído; o id não pode apontar para execuções apagadas)."""
+	_recent_runs.forget(user_id)
+
+
+def _item_rows(run_id: int, records: list[dict], crypto_ids: dict[str, int]) -> list[dict]:
+	rows = []
+	for r in records:
+		proba = r.get("predicted_proba_up")
+		network = r.get("network")
+		rows.append({
+			"run_id": run_id,
+			"crypto_id": crypto_ids.get(r.get("symbol")),
+			"symbol": r.get("symbol"),
+			"network": network if isinstance(network, str) else None,
+			"risk_level": models.RiskLevel(r["Risk_Level"]),
+			"predicted_movement": r.get("predicted_movement"),
+			"predicted_proba_up": None if proba is None or math.isnan(proba) else proba,
+			"eligible": bool(r.get("eligible_for_profile")),
+		})
+	return rows
+
+
+def record_run(
+	db: Session,
+	user_id: int,
+	risk_profile: str,
+	snapshot_version: str,
+	catalog_version: str,
+	records: list[dict],
+	crypto_ids: dict[str, int],
+	source: str,
+	submission_id: int | None = None,
+) -> int:
+	"""Grava uma execução e todos os seus itens (um único INSERT em lote) e retorna o id."""
+	run = models.RecommendationRun(
+		user_id=user_id,
+		risk_profile=models.RiskLevel(risk_profile),
+		snapshot_version=snapshot_version,
+		catalog_version=catalog_version,
+		source=source,
+		submission_id=submission_id,
+		item_count=len(records),
+	)
+	db.add(run)
+	db.flush()
+	if records:
+		# executemany: o SQLAlchemy agrupa as linhas em INSERTs de múltiplos VALUES
+		db.execute(insert(models.RecommendationRunItem), _item_rows(run.id, records, crypto_ids))
+	db.commit()
+	_recent_runs.remember(user_id, (risk_profile, snapshot_version, catalog_version), run.id)
+	return run.id
+
+
+def get_or_record_run(
+	db: Session,
+	user_id: int,
+	risk_profile: str,
+	snapshot_version: str,
+	catalog_version: str,
+	records: list[dict],
+	crypto_ids: dict[str, int],
+	source: str = "recommender",
+) -> int:
+	"""Id da execução para este resultado, gravando só se for diferente da última do usuário.
+
+	O conteúdo depende apenas de (perfil, snapshot, catálogo): chamadas repetidas
+	do recomendador reaproveitam a execução já gravada em vez de duplicá-la.
+	"""
+	fingerprint = (risk_profile, snapshot_version, catalog_version)
+	run_id = _recent_runs.get(user_id, fingerprint)
+	if run_id is not None:
+		return run_id
+	last = db.execute(
+		select(
+			models.RecommendationRun.id,
+			models.RecommendationRun.risk_profile,
+			models.RecommendationRun.snapshot_version,
+			models.RecommendationRun.catalog_version,
+		)
+		.where(models.RecommendationRun.user_id == user_id)
+		.order_by(models.RecommendationRun.created_at.desc(), models.RecommendationRun.id.desc())
+		.limit(1)
+	).first()
+	if last is not None and (last.risk_profile.value, last.snapshot_version, last.catalog_version) == fingerprint:
+		_recent_runs.remember(user_id, fingerprint, last.id)
+		return last.id
+	return record_run(db, user_id, risk_profile, snapshot_version, catalog_version, records, crypto_ids, source)
+
+
+def list_runs(db: Session, user_id: int, page: ListPage) -> tuple[list[models.RecommendationRun], str | None]:
+	"""Página de execuções do usuário e o cursor da próxima."""
+	rows = db.scalars(keyset_paginate(
+		select(models.RecommendationRun).where(models.RecommendationRun.user_id == user_id),
+		models.RecommendationRun.created_at, models.RecommendationRun.id, page,
+	)).all()
+	return page_rows(rows, page, "created_at")
+
+
+def get_run_items(db: Session, run_id: int) -> list[models.RecommendationRunItem]:
+	return db.scalars(
+		select(models.RecommendationRunItem)
+		.where(models.RecommendationRunItem.run_id == run_id)
+		.order_by(models.RecommendationRunItem.id)
+	).all()
+
+
+def run_summary(run: models.RecommendationRun) -> dict:
+	return {
+		"run_id": run.id,
+		"risk_profile": run.risk_profile.value if run.risk_profile else None,
+		"snapshot_version": run.snapshot_version,
+		"source": run.source,
+		"submission_id": run.submission_id,
+		"item_count": run.item_count,
+		"created_at": run.created_at,
+	}
+
+
+def item_record(item: models.RecommendationRunItem) -> dict:
+	"""Item no mesmo formato dos registros do recomendador."""
+	return {
+		"symbol": item.symbol,
+		"network": item.network,
+		"Risk_Level": item.risk_level.value if item.risk_level else None,
+		"predicted_movement": item.predicted_movement,
+		"predicted_proba_up": item.predicted_proba_up,
+		"eligible_for_profile": item.eligible,
+	}
+
+
+# Versões para as rotas async (mesma convenção do risk_service)
+async def record_run_async(db, user_id: int, risk_profile: str, snapshot_version: str, catalog_version: str, records: list[dict], crypto_ids: dict[str, int], source: str, submission_id: int | None = None) -> int:
+	return await db.run_sync(record_run, user_id, risk_profile, snapshot_version, catalog_version, records, crypto_ids, source, submission_id)
+
+
+async def get_or_record_run_async(db, user_id: int, risk_profile: str, snapshot_version: str, catalog_version: str, records: list[dict], crypto_ids: dict[str, int]) -> int:
+	# Caso comum (mesmo resultado da última chamada deste usuário): nem sai do event loop
+	run_id = _recent_runs.get(user_id, (risk_profile, snapshot_version, catalog_version))
+	if run_id is not None:
+		return run_id
+	return await db.run_sync(get_or_record_run, user_id, risk_profile, snapshot_version, catalog_version, records, crypto_ids)
@@ -1,5 +1,10 @@
+from dataclasses import dataclass
+
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.orm import Session
 from app import models
+from app.services.catalog_service import question_catalog
+from app.utils import metrics
 
 def classify_risk(total_score: int, max_score: int) -> models.RiskLevel:
 	pct = total_score / max_score if max_score else 0
@@ -10,107 +15,134 @@ def classify_risk(total_score: int, max_score: int) -> models.RiskLevel:
 	return models.RiskLevel.alto
 
 
-def submit_questionnaire(db: Session, user_id: int, answers: list[dict]) -> models.QuestionnaireSubmission:
+class UserNotFoundError(Exception):
+	"""Usuário da submissão não existe (UPDATE do perfil não afetou nenhuma linha)."""
 
-	questions = db.query(models.Questions).all()
-	opts_by_q = {q.id: {opt.value: opt for opt in q.options} for q in questions}
 
-	total_score = 0
-	max_score = len(questions) * 3 
+@dataclass(frozen=True)
+class SubmissionResult:
+	"""Resultado de uma submissão gravada (valores já conhecidos antes do commit, sem refresh)."""
+	id: int
+	total_score: int
+	max_score: int
+	risk_level: models.RiskLevel
 
-	submission = models.QuestionnaireSubmission(
-		user_id=user_id,
-		total_score=0,
-		max_score=max_score,
-		risk_level=models.RiskLevel.baixo,
-	)
-	db.add(submission)
-	db.flush()
 
+@metrics.timed("questionnaire_scoring")
+def _score_answers(catalog, answers: list[dict]) -> tuple[list[dict], int]:
+	"""Linhas de UserAnswer (sem submission/user) e pontuação total, resolvidas pelo catálogo em memória."""
+	rows = []
+	total_score = 0
 	for ans in answers:
-		qid = ans.get("question_id")
 		sel_val = ans.get("selected_value")
-		opt_id = ans.get("selected_option_id")
-		opt = None
-		if opt_id is not None:
-			opt = db.query(models.QuestionOption).get(opt_id)
-		elif sel_val is not None:
-			opt = opts_by_q.get(qid, {}).get(sel_val)
-		if not opt:
-			score = 0
-			final_value = sel_val or ""
-			final_opt_id = None
-		else:
-			score = opt.score
-			final_value = opt.value
-			final_opt_id = opt.id
+		opt = catalog.resolve_option(ans.get("question_id"), ans.get("selected_option_id"), sel_val)
+		score = opt["score"] if opt else 0
 		total_score += score
-		db.add(models.UserAnswer(
-			submission_id=submission.id,
-			user_id=user_id,
-			question_id=qid,
-			option_id=final_opt_id,
-			selected_value=final_value,
-			score=score,
-		))
-
-	risk = classify_risk(total_score, max_score)
-	submission.total_score = total_score
-	submission.risk_level = risk
-	db.add(submission)
+		rows.append({
+			"question_id": ans.get("question_id"),
+			"option_id": opt["id"] if opt else None,
+			"selected_value": opt["value"] if opt else (sel_val or ""),
+			"score": score,
+		})
+	return rows, total_score
 
-	user = db.query(models.User).get(user_id)
-	if user:
-		user.risk_profile = risk.value
-		db.add(user)
 
-	db.commit()
-	db.refresh(submission)
-	return submission
+def _set_user_risk_profile(db: Session, user_id: int, risk: models.RiskLevel) -> bool:
+	result = db.execute(update(models.User).where(models.User.id == user_id).values(risk_profile=risk.value))
+	return result.rowcount > 0
 
 
-def update_questionnaire_submission(db: Session, submission_id: int, user_id: int, answers: list[dict]) -> models.QuestionnaireSubmission:
-	submission = db.query(models.QuestionnaireSubmission).get(submission_id)
-	if not submission:
-		raise ValueError("Submission not found")
+def submit_questionnaire(db: Session, user_id: int, answers: list[dict]) -> SubmissionResult:
+	"""Grava submissão e respostas em três comandos: UPDATE do perfil, INSERT da submissão
+	e um INSERT em lote das respostas (opções resolvidas pelo catálogo em memória)."""
+	catalog = question_catalog.get(db)
+	rows, total_score = _score_answers(catalog, answers)
+	risk = classify_risk(total_score, catalog.max_score)
 
-	db.query(models.UserAnswer).filter(models.UserAnswer.submission_id == submission_id).delete()
-	db.flush()
+	if not _set_user_risk_profile(db, user_id, risk):
+		db.rollback()
+		raise UserNotFoundError(f"User {user_id} not found")
 
-	questions = db.query(models.Questions).all()
-	opts_by_q = {q.id: {opt.value: opt for opt in q.options} for q in questions}
-	total_score = 0
-	max_score = len(questions) * 3
+	submission = models.QuestionnaireSubmission(
+		user_id=user_id,
+		total_score=total_score,
+		max_score=catalog.max_score,
+		risk_level=risk,
+	)
+	db.add(submission)
+	db.flush()
+	if rows:
+		db.execute(insert(models.UserAnswer), [{**row, "submission_id": submission.id, "user_id": user_id} for row in rows])
+	result = SubmissionResult(submission.id, total_score, catalog.max_score, risk)
+	db.commit()
+	return result
+
+
+def _diff_answers(existing: list, rows: list[dict]) -> tuple[list[dict], list[dict], list[int]]:
+	"""(inserts, updates, deletes) que levam as respostas existentes às novas.
+
+	Pareia por question_id (na ordem de id das existentes e na ordem enviada
+	das novas); respostas iguais não geram comando.
+	"""
+	by_question: dict[int, list] = {}
+	for answer in existing:
+		by_question.setdefault(answer.question_id, []).append(answer)
+	inserts, updates = [], []
+	for row in rows:
+		current = by_question.get(row["question_id"])
+		if not current:
+			inserts.append(row)
+			continue
+		answer = current.pop(0)
+		if (answer.option_id, answer.selected_value, answer.score) != (row["option_id"], row["selected_value"], row["score"]):
+			updates.append({"id": answer.id, "option_id": row["option_id"], "selected_value": row["selected_value"], "score": row["score"]})
+	deletes = [answer.id for remaining in by_question.values() for answer in remaining]
+	return inserts, updates, deletes
+
+
+def update_questionnaire_submission(db: Session, submission_id: int, user_id: int, answers: list[dict]) -> SubmissionResult:
+	"""Atualiza a submissão aplicando só a diferença entre as respostas gravadas e as novas."""
+	submission = db.get(models.QuestionnaireSubmission, submission_id)
+	if not submission:
+		raise ValueError("Submission not found")
 
-	for ans in answers:
-		qid = ans.get("question_id")
-		sel_val = ans.get("selected_value")
-		opt_id = ans.get("selected_option_id")
-		opt = None
-		if opt_id is not None:
-			opt = db.query(models.QuestionOption).get(opt_id)
-		elif sel_val is not None:
-			opt = opts_by_q.get(qid, {}).get(sel_val)
-		score = opt.score if opt else 0
-		total_score += score
-		db.add(models.UserAnswer(
-			submission_id=submission_id,
-			user_id=user_id,
-			question_id=qid,
-			option_id=(opt.id if opt else None),
-			selected_value=(opt.value if opt else (sel_val or "")),
-			score=score,
-		))
-
-	risk = classify_risk(total_score, max_score)
+	catalog = question_catalog.get(db)
+	rows, total_score = _score_answers(catalog, answers)
+	existing = db.execute(
+		select(
+			models.UserAnswer.id,
+			models.UserAnswer.question_id,
+			models.UserAnswer.option_id,
+			models.UserAnswer.selected_value,
+			models.UserAnswer.score,
+		)
+		.where(models.UserAnswer.submission_id == submission_id)
+		.order_by(models.UserAnswer.id)
+	).all()
+	inserts, updates, deletes = _diff_answers(existing, rows)
+	if deletes:
+		db.execute(delete(models.UserAnswer).where(models.UserAnswer.id.in_(deletes)))
+	if updates:
+		# UPDATE em lote por chave primária (executemany)
+		db.execute(update(models.UserAnswer), updates)
+	if inserts:
+		db.execute(insert(models.UserAnswer), [{**row, "submission_id": submission_id, "user_id": user_id} for row in inserts])
+
+	risk = classify_risk(total_score, catalog.max_score)
 	submission.total_score = total_score
-	submission.max_score = max_score
+	submission.max_score = catalog.max_score
 	submission.risk_level = risk
-	db.add(submission)
-	user = db.query(models.User).get(user_id)
-	if user:
-		user.risk_profile = risk.value
-		db.add(user)
+	_set_user_risk_profile(db, user_id, risk)
+	result = SubmissionResult(submission.id, total_score, catalog.max_score, risk)
 	db.commit()
-	db.refresh(submission)
-	return submission
+	return result
+
+
+# Versões para as rotas async: recebem a sessão de `get_session` (AsyncSession ou
+# SyncSessionAdapter) e executam a lógica acima com a Session síncrona subjacente.
+async def submit_questionnaire_async(db, user_id: int, answers: list[dict]) -> SubmissionResult:
+	return await db.run_sync(submit_questionnaire, user_id, answers)
+
+
+async def update_questionnaire_submission_async(db, submission_id: int, user_id: int, answers: list[dict]) -> SubmissionResult:
+	return await db.run_sync(update_questionnaire_submission, submission_id, user_id, answers)
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app import models
+
+# Mesmo raciocínio dos catálogos: a invalidação é local ao processo, então o
+# TTL limita por quanto tempo outro worker pode servir um perfil antigo.
+USER_CONTEXT_TTL_SECONDS: float = float(os.getenv("USER_CONTEXT_TTL_SECONDS", "60"))
+USER_CONTEXT_MAX_ENTRIES: int = int(os.getenv("USER_CONTEXT_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class UserContext:
+	"""Dados do usuário lidos a cada request autenticado (/auth/me, perfil do recomendador)."""
+	id: int
+	email: str
+	name: str
+	risk_profile: str | None
+	loaded_at: float
+
+	@classmethod
+	def from_user(cls, user: models.User) -> "UserContext":
+		return cls(id=user.id, email=user.email, name=user.name, risk_profile=user.risk_profile, loaded_at=time.monotonic())
+
+
+class UserContextCache:
+	"""LRU por processo de UserContext, com TTL.
+
+	Invalidado (neste processo) quando o usuário é alterado/removido e quando
+	uma submissão do questionário muda o risk_profile.
+	"""
+
+	def __init__(self, ttl_seconds: float = USER_CONTEXT_TTL_SECONDS, max_entries: int = USER_CONTEXT_MAX_ENTRIES):
+		self.ttl_seconds = ttl_seconds
+		self.max_entries = max_entries
+		self._entries: OrderedDict[int, UserContext] = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, user_id: int) -> UserContext | None:
+		with self._lock:
+			context = self._entries.get(user_id)
+			if context is None:
+				return None
+			if time.monotonic() - context.loaded_at >= self.ttl_seconds:
+				del self._entries[user_id]
+				return None
+			self._entries.move_to_end(user_id)
+			return context
+
+	def put(self, context: UserContext) -> None:
+		if self.max_entries <= 0:
+			return
+		with self._lock:
+			self._entries[context.id] = context
+			self._entries.move_to_end(context.id)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def invalidate(self, user_id: int) -> None:
+		with self._lock:
+			self._entries.pop(user_id, None)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+
+user_context_cache = UserContextCache()
+
+
+async def get_user_context(db, user_id: int) -> UserContext | None:
+	"""UserContext do cache ou do banco (None se o usuário não existe; ausência não é cacheada)."""
+	context = user_context_cache.get(user_id)
+	if context is not None:
+		return context
+	user = await db.get(models.User, user_id)
+	if user is None:
+		return None
+	context = UserContext.from_user(user)
+	user_context_cache.put(context)
+	return context
@@ -0,0 +1,36 @@
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.services import recommendation_history_service
+
+
+def delete_user(db: Session, user_id: int) -> bool:
+	"""Remove o usuário e os dados dele em seis comandos, qualquer que seja o volume.
+
+	O cascade do ORM carregava as respostas de cada submissão e os itens de cada
+	execução do histórico (um SELECT por pai). Aqui cada tabela sai num DELETE em
+	lote; recomendações avulsas ficam sem usuário, como o ORM já fazia.
+	Retorna False (sem alterar nada) se o usuário não existir.
+	"""
+	user_runs = select(models.RecommendationRun.id).where(models.RecommendationRun.user_id == user_id)
+	user_submissions = select(models.QuestionnaireSubmission.id).where(models.QuestionnaireSubmission.user_id == user_id)
+
+	db.execute(delete(models.RecommendationRunItem).where(models.RecommendationRunItem.run_id.in_(user_runs)))
+	db.execute(delete(models.RecommendationRun).where(models.RecommendationRun.user_id == user_id))
+	db.execute(delete(models.UserAnswer).where(or_(
+		models.UserAnswer.user_id == user_id,
+		models.UserAnswer.submission_id.in_(user_submissions),
+	)))
+	db.execute(delete(models.QuestionnaireSubmission).where(models.QuestionnaireSubmission.user_id == user_id))
+	db.execute(update(models.Recommendation).where(models.Recommendation.user_id == user_id).values(user_id=None))
+	if db.execute(delete(models.User).where(models.User.id == user_id)).rowcount == 0:
+		db.rollback()
+		return False
+	db.commit()
+	recommendation_history_service.forget_user(user_id)
+	return True
+
+
+# Versão para as rotas async (AsyncSession ou SyncSessionAdapter de `get_session`)
+async def delete_user_async(db, user_id: int) -> bool:
+	return await db.run_sync(delete_user, user_id)
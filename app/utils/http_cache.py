@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from starlette.responses import Response
+
+# Cache-Control por rota (sobrescrevíveis por variável de ambiente).
+# - /cryptos/ é público e muda raramente: pode ficar em caches compartilhados
+#   pelo mesmo tempo do TTL do catálogo no servidor.
+# - /questionnaire/questions exige login: só o navegador guarda, por mais tempo.
+# - /recommendations/recommender depende do usuário e do snapshot: o navegador
+#   guarda, mas revalida sempre (If-None-Match -> 304 é barato).
+CACHE_CONTROL_CRYPTOS: str = os.getenv("CACHE_CONTROL_CRYPTOS", "public, max-age=30")
+CACHE_CONTROL_QUESTIONS: str = os.getenv("CACHE_CONTROL_QUESTIONS", "private, max-age=300")
+CACHE_CONTROL_RECOMMENDER: str = os.getenv("CACHE_CONTROL_RECOMMENDER", "private, no-cache")
+
+
+def make_etag(*parts: object) -> str:
+	"""ETag forte derivado das versões dos dados que compõem a resposta."""
+	digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:32]
+	return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+	"""Comparação fraca do If-None-Match (RFC 9110): aceita lista, `*` e prefixo W/."""
+	if not if_none_match:
+		return False
+	for candidate in if_none_match.split(","):
+		candidate = candidate.strip()
+		if candidate == "*":
+			return True
+		if candidate.startswith("W/"):
+			candidate = candidate[2:]
+		if candidate == etag:
+			return True
+	return False
+
+
+def cache_headers(etag: str, cache_control: str, *, private: bool = False) -> dict[str, str]:
+	headers = {"ETag": etag, "Cache-Control": cache_control}
+	if private:
+		# A mesma URL tem corpos diferentes por usuário
+		headers["Vary"] = "Authorization"
+	return headers
+
+
+def not_modified(etag: str, cache_control: str, *, private: bool = False) -> Response:
+	return Response(status_code=304, headers=cache_headers(etag, cache_control, private=private))
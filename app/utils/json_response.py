@@ -0,0 +1,31 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.responses import Response
+
+# Escalares/arrays NumPy viram números JSON e NaN/inf viram null (o json da
+# stdlib escreveria NaN, que não é JSON válido)
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+	"""Serializa para JSON (bytes) com as mesmas regras da resposta padrão da API."""
+	return orjson.dumps(content, option=_ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+	"""Resposta JSON padrão da aplicação, serializada com orjson."""
+
+	def render(self, content: Any) -> bytes:
+		return dumps(content)
+
+
+class EncodedJSONResponse(Response):
+	"""Resposta com um corpo JSON já serializado (ex.: vindo de cache).
+
+	Retornar uma instância de Response faz o FastAPI pular o jsonable_encoder
+	e a serialização: os bytes vão direto para o cliente.
+	"""
+
+	media_type = "application/json"
@@ -0,0 +1,221 @@
+"""Métricas no formato Prometheus (`GET /metrics`, desligado por padrão).
+
+- Latência por rota (histograma pelo template da rota, ex.: `/cryptos/{crypto_id}`),
+  contagem por status e requests em andamento por rota.
+- Pools de conexão: conexões em uso, espera no checkout e timeouts.
+- Operações caras: carga do snapshot/CSV de features, predições do modelo,
+  bcrypt e pontuação do questionário (`app_operation_duration_seconds`).
+
+Com vários workers do gunicorn, defina `PROMETHEUS_MULTIPROC_DIR` (diretório
+vazio e gravável, limpo a cada deploy): cada processo grava seus valores em
+arquivos mmap e `/metrics` agrega todos, não só o worker que atendeu o scrape.
+O `gunicorn.conf.py` da raiz limpa o diretório no boot e marca workers mortos.
+Sem a variável, os valores ficam na memória do processo.
+
+Os filhos de cada métrica são resolvidos uma vez e guardados em dicts, então o
+caminho quente não passa pelo lock de `labels()`.
+"""
+from __future__ import annotations
+
+import hmac
+import os
+import time
+
+from prometheus_client import (
+	CONTENT_TYPE_LATEST,
+	REGISTRY,
+	CollectorRegistry,
+	Counter,
+	Gauge,
+	Histogram,
+	generate_latest,
+)
+from prometheus_client import multiprocess
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Com METRICS_TOKEN, o scrape precisa de `Authorization: Bearer <METRICS_TOKEN>` e
+# `/metrics` já fica ligado; sem token, só com METRICS_ENABLED=true explícito (rede privada)
+METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true" if METRICS_TOKEN else "false").lower() in ("1", "true", "yes")
+MULTIPROC_DIR: str = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+# Rotas sem match (404 de scanners etc.) dividem um único label
+UNMATCHED_ROUTE = "unmatched"
+
+# Operações internas vão de microssegundos (pontuação) a segundos (CSV grande)
+OPERATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+	"http_request_duration_seconds",
+	"Latência das requisições HTTP por rota",
+	["method", "route"],
+)
+HTTP_REQUESTS = Counter(
+	"http_requests",
+	"Requisições HTTP por rota e status",
+	["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+	"http_requests_in_progress",
+	"Requisições HTTP em andamento por rota",
+	["method", "route"],
+	multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+	"db_pool_checked_out_connections",
+	"Conexões do pool em uso",
+	["pool"],
+	multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+	"db_pool_checkout_wait_seconds",
+	"Espera para obter uma conexão do pool (inclui abrir conexão nova)",
+	["pool"],
+	buckets=OPERATION_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+	"db_pool_checkout_timeouts",
+	"Checkouts que estouraram DB_POOL_TIMEOUT",
+	["pool"],
+)
+OPERATION_DURATION = Histogram(
+	"app_operation_duration_seconds",
+	"Duração de operações internas caras (snapshot, modelo, bcrypt, questionário)",
+	["operation"],
+	buckets=OPERATION_BUCKETS,
+)
+
+_operation_children: dict[str, Histogram] = {}
+
+
+def operation_timer(operation: str) -> Histogram:
+	"""Histograma de uma operação (filho já resolvido do `app_operation_duration_seconds`)."""
+	child = _operation_children.get(operation)
+	if child is None:
+		child = _operation_children.setdefault(operation, OPERATION_DURATION.labels(operation))
+	return child
+
+
+def timed(operation: str):
+	"""Decorator/context manager que mede a duração de `operation`."""
+	return operation_timer(operation).time()
+
+
+def observe_operation(operation: str, seconds: float) -> None:
+	"""Registra uma duração já medida (ex.: tempo de bcrypt medido no worker)."""
+	operation_timer(operation).observe(seconds)
+
+
+class PoolMetrics:
+	"""Métricas de um pool de conexões (`pool` = primary/replica)."""
+
+	def __init__(self, pool: str):
+		self.checked_out = DB_POOL_CHECKED_OUT.labels(pool)
+		self.checkout_wait = DB_POOL_CHECKOUT_WAIT.labels(pool)
+		self.timeouts = DB_POOL_TIMEOUTS.labels(pool)
+
+
+def _route_template(router, scope) -> str:
+	"""Template da rota que vai atender `scope`, na mesma ordem de match do Starlette.
+
+	Só testa o regex já compilado de cada rota e o método: bem mais barato que
+	`route.matches`, que monta o scope filho e converte os parâmetros.
+	"""
+	path = scope["path"]
+	root_path = scope.get("root_path", "")
+	if root_path and path.startswith(root_path):
+		path = path[len(root_path):]
+	method = scope["method"]
+	partial = None
+	for route in router.routes:
+		path_regex = getattr(route, "path_regex", None)
+		if path_regex is None or not path_regex.match(path):
+			continue
+		methods = getattr(route, "methods", None)
+		if methods is None or method in methods:
+			return route.path
+		if partial is None:
+			partial = route.path
+	# Path existe só com outro método (405)
+	return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+	"""Middleware ASGI que mede latência, status e concorrência por rota."""
+
+	def __init__(self, app, router):
+		self.app = app
+		self.router = router
+		self._route_children: dict[tuple[str, str], tuple] = {}
+		self._status_children: dict[tuple[str, str, int], Counter] = {}
+
+	def _children(self, method: str, route: str) -> tuple:
+		key = (method, route)
+		children = self._route_children.get(key)
+		if children is None:
+			children = self._route_children.setdefault(key, (
+				HTTP_REQUEST_DURATION.labels(method, route),
+				HTTP_REQUESTS_IN_PROGRESS.labels(method, route),
+			))
+		return children
+
+	def _status_counter(self, method: str, route: str, status: int) -> Counter:
+		key = (method, route, status)
+		child = self._status_children.get(key)
+		if child is None:
+			child = self._status_children.setdefault(key, HTTP_REQUESTS.labels(method, route, str(status)))
+		return child
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		method = scope["method"]
+		route = _route_template(self.router, scope)
+		duration, in_progress = self._children(method, route)
+		status_code = 500
+
+		async def send_wrapper(message):
+			nonlocal status_code
+			if message["type"] == "http.response.start":
+				status_code = message["status"]
+			await send(message)
+
+		in_progress.inc()
+		started = time.perf_counter()
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			duration.observe(time.perf_counter() - started)
+			in_progress.dec()
+			self._status_counter(method, route, status_code).inc()
+
+
+def _registry():
+	if not MULTIPROC_DIR:
+		return REGISTRY
+	# Agrega os arquivos de todos os processos a cada scrape
+	registry = CollectorRegistry()
+	multiprocess.MultiProcessCollector(registry)
+	return registry
+
+
+def _authorized(request: Request) -> bool:
+	if not METRICS_TOKEN:
+		return True
+	scheme, _, token = request.headers.get("authorization", "").partition(" ")
+	return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode("utf-8"), METRICS_TOKEN.encode("utf-8"))
+
+
+def metrics_endpoint(request: Request) -> Response:
+	if not _authorized(request):
+		return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+	return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid: int) -> None:
+	"""Descarta os gauges `livesum` de um worker encerrado (hook `child_exit` do gunicorn)."""
+	if MULTIPROC_DIR:
+		multiprocess.mark_process_dead(pid)
@@ -0,0 +1,87 @@
+import base64
+import binascii
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+# Tamanho de página das listagens por usuário (submissões, respostas, recomendações, histórico)
+LIST_PAGE_SIZE_DEFAULT: int = int(os.getenv("LIST_PAGE_SIZE_DEFAULT", "50"))
+LIST_PAGE_SIZE_MAX: int = int(os.getenv("LIST_PAGE_SIZE_MAX", "200"))
+
+# Cabeçalho com o cursor da próxima página (ausente na última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(data: dict) -> str:
+	raw = json.dumps(data, separators=(",", ":")).encode()
+	return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+	try:
+		data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+	except (binascii.Error, ValueError):
+		raise HTTPException(status_code=400, detail="cursor inválido")
+	if not isinstance(data, dict):
+		raise HTTPException(status_code=400, detail="cursor inválido")
+	return data
+
+
+@dataclass(frozen=True)
+class ListPage:
+	limit: int
+	cursor: str | None = None
+
+
+def list_page(
+	limit: int = Query(default=LIST_PAGE_SIZE_DEFAULT, ge=1, le=LIST_PAGE_SIZE_MAX, description="Itens por página"),
+	cursor: str | None = Query(default=None, description="Valor de X-Next-Cursor da página anterior"),
+) -> ListPage:
+	return ListPage(limit=limit, cursor=cursor)
+
+
+def keyset_paginate(stmt, time_col, id_col, page: ListPage):
+	"""Mais recentes primeiro, ordenado por (time_col, id_col) e continuando após o cursor.
+
+	A condição de keyset usa o índice (user_id, time_col, id) e o custo por página não
+	depende de quantas linhas o usuário já acumulou (ao contrário de OFFSET). Busca
+	uma linha a mais para saber se existe próxima página.
+
+	Linhas sem data (time_col NULL, registros antigos) vêm primeiro em qualquer banco
+	(NULLS FIRST é a ordem do próprio índice lido de trás para frente no Postgres);
+	o cursor de uma delas tem só o id.
+	"""
+	if page.cursor:
+		data = decode_cursor(page.cursor)
+		try:
+			after_time = None if data.get("t") is None else datetime.fromisoformat(data["t"])
+			after_id = int(data["i"])
+		except (KeyError, TypeError, ValueError):
+			raise HTTPException(status_code=400, detail="cursor inválido")
+		if after_time is None:
+			stmt = stmt.where(or_(and_(time_col.is_(None), id_col < after_id), time_col.is_not(None)))
+		else:
+			stmt = stmt.where(or_(time_col < after_time, and_(time_col == after_time, id_col < after_id)))
+	return stmt.order_by(time_col.desc().nulls_first(), id_col.desc()).limit(page.limit + 1)
+
+
+def page_rows(rows, page: ListPage, time_attr: str) -> tuple[list, str | None]:
+	"""Corta a linha extra buscada por keyset_paginate e monta o cursor da próxima página."""
+	rows = list(rows)
+	if len(rows) <= page.limit:
+		return rows, None
+	rows = rows[:page.limit]
+	last = rows[-1]
+	last_time = getattr(last, time_attr)
+	if last_time is None:
+		return rows, encode_cursor({"i": last.id})
+	return rows, encode_cursor({"t": last_time.isoformat(), "i": last.id})
+
+
+def set_next_cursor(response: Response, next_cursor: str | None) -> None:
+	if next_cursor:
+		response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,220 @@
+"""Profiling sob demanda de requests (cProfile), gravado num buffer circular em disco.
+
+Liga quando `PROFILE_TOKEN` está definido:
+- request com `X-Profile-Token: <PROFILE_TOKEN>` é sempre perfilado;
+- com `PROFILE_SAMPLE_RATE` (0..1), essa fração dos requests também é. A
+  amostragem sem token impede o boot: os perfis não teriam como ser baixados.
+
+Cada perfil vira um arquivo pstats (`.prof`) em `PROFILE_DIR`; só os
+`PROFILE_MAX_FILES` mais recentes são mantidos. A resposta perfilada traz
+`X-Profile-Id` com o nome do arquivo, baixado em `GET /system/profiles/{nome}`.
+O `.prof` abre no snakeviz/tuna (flamegraph/icicle) ou em `python -m pstats`.
+
+O cProfile mede o thread do event loop e as chamadas feitas pelo
+`run_in_threadpool` deste módulo (sessão síncrona do banco, recomendador);
+o que roda em outros executores (inferência, bcrypt) aparece como espera.
+Um request perfilado por vez em cada processo: os demais seguem sem perfil.
+
+Atenção: o cProfile do event loop mede o thread inteiro enquanto o request
+está em andamento, inclusive as corrotinas de outros requests que rodam nos
+`await` dele. Com tráfego concorrente, o `.prof` não é só deste request: para
+atribuir uma regressão, compare com o perfil do mesmo request isolado (worker
+sem tráfego, ex.: réplica de staging) ou confirme pelas funções da própria rota.
+
+Desligado, nem o middleware é instalado e `run_in_threadpool` é o do Starlette.
+"""
+from __future__ import annotations
+
+import cProfile
+import contextvars
+import hmac
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from fastapi import Header, HTTPException
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR: str = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "cryptolens-profiles"))
+PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+if PROFILE_SAMPLE_RATE > 0 and not PROFILE_TOKEN:
+	# Os perfis amostrados só podem ser listados/baixados com o token
+	raise RuntimeError("PROFILE_SAMPLE_RATE exige PROFILE_TOKEN (sem ele, os perfis gravados ficam inacessíveis)")
+PROFILING_ENABLED: bool = bool(PROFILE_TOKEN)
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# A partir do 3.12 o cProfile usa sys.monitoring, que já vê todos os threads
+# (e não aceita dois perfis ativos): só até o 3.11 é preciso um perfil por chamada no threadpool
+_PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+_PROFILE_NAME = re.compile(r"^\d{13}-\d+-\d+-[A-Z]+-[\w]*\.prof$")
+
+
+class RequestProfile:
+	"""Perfis de um request: o do event loop e os das chamadas no threadpool."""
+
+	def __init__(self):
+		self.main = cProfile.Profile()
+		self.threads: list[cProfile.Profile] = []
+
+	def run_in_thread(self, func, *args, **kwargs):
+		profile = cProfile.Profile()
+		profile.enable()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			profile.disable()
+			self.threads.append(profile)
+
+	def stats(self) -> pstats.Stats:
+		stats = pstats.Stats(self.main)
+		for profile in self.threads:
+			profile.create_stats()
+			if profile.stats:
+				stats.add(profile)
+		return stats
+
+
+_active_profile: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar("active_profile", default=None)
+
+if PROFILING_ENABLED and _PER_THREAD_PROFILES:
+	async def run_in_threadpool(func, *args, **kwargs):
+		"""`run_in_threadpool` do Starlette; dentro de um request perfilado, perfila também a chamada."""
+		profile = _active_profile.get()
+		if profile is None:
+			return await _run_in_threadpool(func, *args, **kwargs)
+		return await _run_in_threadpool(profile.run_in_thread, func, *args, **kwargs)
+else:
+	run_in_threadpool = _run_in_threadpool
+
+
+class ProfileStore:
+	"""Buffer circular de arquivos `.prof` (nome começa pelo timestamp em ms)."""
+
+	def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+		self.directory = directory
+		self.max_files = max(1, max_files)
+		self._seq = itertools.count(1)
+
+	def new_name(self, method: str, path: str) -> str:
+		slug = re.sub(r"\W+", "_", path).strip("_")[:60]
+		return f"{int(time.time() * 1000):013d}-{os.getpid()}-{next(self._seq)}-{method}-{slug}.prof"
+
+	def _names(self) -> list[str]:
+		try:
+			return sorted(n for n in os.listdir(self.directory) if _PROFILE_NAME.match(n))
+		except FileNotFoundError:
+			return []
+
+	def save(self, name: str, profile: RequestProfile) -> None:
+		os.makedirs(self.directory, exist_ok=True)
+		tmp_path = os.path.join(self.directory, f".{name}.tmp")
+		profile.stats().dump_stats(tmp_path)
+		os.replace(tmp_path, os.path.join(self.directory, name))
+		# Vários workers podem podar ao mesmo tempo
+		for old in self._names()[:-self.max_files]:
+			try:
+				os.remove(os.path.join(self.directory, old))
+			except FileNotFoundError:
+				pass
+
+	def list(self) -> list[dict]:
+		entries = []
+		for name in reversed(self._names()):
+			timestamp, pid, _, method, slug = name[:-len(".prof")].split("-", 4)
+			try:
+				size = os.path.getsize(os.path.join(self.directory, name))
+			except FileNotFoundError:
+				continue
+			entries.append({
+				"id": name,
+				"created_at": datetime.fromtimestamp(int(timestamp) / 1000, timezone.utc).isoformat(),
+				"pid": int(pid),
+				"method": method,
+				"path_slug": slug,
+				"size_bytes": size,
+			})
+		return entries
+
+	def path(self, name: str) -> str | None:
+		if not _PROFILE_NAME.match(name):
+			return None
+		path = os.path.join(self.directory, name)
+		return path if os.path.isfile(path) else None
+
+	@staticmethod
+	def text(path: str, limit: int = 60) -> str:
+		stream = io.StringIO()
+		pstats.Stats(path, stream=stream).sort_stats("cumulative").print_stats(limit)
+		return stream.getvalue()
+
+
+profile_store = ProfileStore()
+_busy = threading.Lock()
+
+
+def _has_profile_token(scope) -> bool:
+	if not PROFILE_TOKEN:
+		return False
+	header = PROFILE_TOKEN_HEADER.lower().encode("latin-1")
+	for key, value in scope["headers"]:
+		if key == header:
+			return hmac.compare_digest(value, PROFILE_TOKEN.encode("utf-8"))
+	return False
+
+
+class ProfilingMiddleware:
+	"""Middleware ASGI que perfila o request quando pedido pelo header ou pela amostragem."""
+
+	def __init__(self, app, store: ProfileStore = profile_store, sample_rate: float = PROFILE_SAMPLE_RATE):
+		self.app = app
+		self.store = store
+		self.sample_rate = sample_rate
+
+	def _should_profile(self, scope) -> bool:
+		return _has_profile_token(scope) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http" or not self._should_profile(scope) or not _busy.acquire(blocking=False):
+			await self.app(scope, receive, send)
+			return
+
+		name = self.store.new_name(scope["method"], scope["path"])
+		profile = RequestProfile()
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				headers = [*message.get("headers", []), (PROFILE_ID_HEADER.lower().encode("latin-1"), name.encode("latin-1"))]
+				message = {**message, "headers": headers}
+			await send(message)
+
+		token = _active_profile.set(profile)
+		profile.main.enable()
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			profile.main.disable()
+			_active_profile.reset(token)
+			_busy.release()
+		# Resposta já enviada: gravar o arquivo não atrasa o cliente
+		await _run_in_threadpool(self.store.save, name, profile)
+
+
+def require_profile_token(x_profile_token: str = Header(default="")) -> None:
+	"""Endpoints de operação (perfis, pools, executores): exige `X-Profile-Token` igual a PROFILE_TOKEN."""
+	if not PROFILE_TOKEN:
+		raise HTTPException(status_code=404, detail="Endpoint de operação desabilitado (defina PROFILE_TOKEN)")
+	if not hmac.compare_digest(x_profile_token.encode("utf-8"), PROFILE_TOKEN.encode("utf-8")):
+		raise HTTPException(status_code=403, detail="Token de operação inválido")
@@ -0,0 +1,188 @@
+"""Contagem de comandos SQL por request e detector de N+1.
+
+Os eventos `before/after_cursor_execute` de todos os engines somam, para o
+request em andamento, o número de comandos, o tempo no banco e quantas vezes
+cada comando (normalizado, sem literais) se repetiu. Ao fim do request:
+- acima de `SQL_QUERY_BUDGET` comandos (ou do limite da rota em
+  `SQL_QUERY_BUDGETS`, ex.: "POST /questionnaire/submit=6,GET /cryptos/=1"),
+  registra um warning;
+- um mesmo comando repetido `SQL_REPEATED_QUERY_THRESHOLD` vezes ou mais
+  (lazy load num loop, cascade do ORM) também gera warning.
+
+O contexto do request passa para o threadpool (sessão síncrona) e para o
+greenlet da AsyncSession, então os dois modos contam igual.
+
+Para scripts/CI, `capture_queries()` e `assert_max_queries(n)` contam tudo o que
+for executado durante o bloco, em qualquer thread (ex.: rotas via TestClient).
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_QUERY_STATS_ENABLED: bool = os.getenv("SQL_QUERY_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+SQL_QUERY_BUDGET: int = int(os.getenv("SQL_QUERY_BUDGET", "20"))
+SQL_REPEATED_QUERY_THRESHOLD: int = int(os.getenv("SQL_REPEATED_QUERY_THRESHOLD", "5"))
+# Comandos guardados por QueryStats para mensagens de erro/diagnóstico
+MAX_RECORDED_STATEMENTS = 200
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_budgets(raw: str) -> dict[str, int]:
+	budgets = {}
+	for item in raw.split(","):
+		route, sep, limit = item.rpartition("=")
+		if sep and route.strip():
+			budgets[" ".join(route.split())] = int(limit)
+	return budgets
+
+
+SQL_QUERY_BUDGETS: dict[str, int] = _parse_budgets(os.getenv("SQL_QUERY_BUDGETS", ""))
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LISTS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+))+\s*\)")
+
+
+# O SQLAlchemy reaproveita o texto compilado: o mesmo comando volta como a mesma string
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+	"""Comando sem literais e com listas de parâmetros colapsadas (`IN (?, ?, ?)` -> `IN (...)`)."""
+	normalized = _LITERALS.sub("?", _WHITESPACE.sub(" ", statement).strip())
+	return _PARAM_LISTS.sub("(...)", normalized)
+
+
+class QueryStats:
+	"""Comandos SQL de um request (ou de um bloco `capture_queries`)."""
+
+	def __init__(self):
+		self.count = 0
+		self.seconds = 0.0
+		self.fingerprints: Counter[str] = Counter()
+		self.statements: list[str] = []
+		self._lock = threading.Lock()
+
+	def record(self, statement: str, seconds: float) -> None:
+		key = fingerprint(statement)
+		with self._lock:
+			self.count += 1
+			self.seconds += seconds
+			self.fingerprints[key] += 1
+			if len(self.statements) < MAX_RECORDED_STATEMENTS:
+				self.statements.append(key)
+
+	def repeated(self, threshold: int = SQL_REPEATED_QUERY_THRESHOLD) -> list[tuple[str, int]]:
+		"""Comandos executados `threshold` vezes ou mais (suspeitos de N+1)."""
+		with self._lock:
+			return [(key, n) for key, n in self.fingerprints.most_common() if n >= threshold]
+
+	def snapshot(self) -> dict:
+		return {"count": self.count, "db_ms": self.seconds * 1000, "repeated": self.repeated()}
+
+
+_current_stats: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar("query_stats", default=None)
+_captures: tuple[QueryStats, ...] = ()
+_captures_lock = threading.Lock()
+
+
+def current_stats() -> QueryStats | None:
+	"""Estatísticas do request em andamento (None fora de um request)."""
+	return _current_stats.get()
+
+
+# O início fica no contexto de execução do comando (se o comando falhar,
+# after_cursor_execute não roda e nada sobra para o próximo)
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	if context is not None and (_current_stats.get() is not None or _captures):
+		context._query_stats_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+	started = getattr(context, "_query_stats_started", None)
+	if started is None:
+		return
+	seconds = time.perf_counter() - started
+	stats = _current_stats.get()
+	if stats is not None:
+		stats.record(statement, seconds)
+	for capture in _captures:
+		capture.record(statement, seconds)
+
+
+@contextmanager
+def capture_queries():
+	"""Conta os comandos SQL executados durante o bloco, em qualquer thread.
+
+	Pensado para testes/scripts: com tráfego concorrente, conta os comandos de todos.
+	"""
+	global _captures
+	stats = QueryStats()
+	with _captures_lock:
+		_captures = (*_captures, stats)
+	try:
+		yield stats
+	finally:
+		with _captures_lock:
+			_captures = tuple(c for c in _captures if c is not stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "bloco"):
+	"""Falha com AssertionError (listando os comandos) se o bloco executar mais de `limit` comandos SQL."""
+	with capture_queries() as stats:
+		yield stats
+	if stats.count > limit:
+		statements = "\n".join(f"  {s[:200]}" for s in stats.statements)
+		raise AssertionError(f"{label}: {stats.count} comandos SQL (limite {limit})\n{statements}")
+
+
+def route_budget(method: str, route: str) -> int:
+	return SQL_QUERY_BUDGETS.get(f"{method} {route}", SQL_QUERY_BUDGET)
+
+
+class QueryStatsMiddleware:
+	"""Middleware ASGI que conta os comandos SQL de cada request e avisa excessos e repetições."""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		stats = QueryStats()
+		token = _current_stats.set(stats)
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			_current_stats.reset(token)
+			if stats.count:
+				self._report(scope, stats)
+
+	@staticmethod
+	def _report(scope, stats: QueryStats) -> None:
+		method = scope["method"]
+		# O Router do Starlette grava a rota encontrada no próprio scope
+		route = getattr(scope.get("route"), "path", scope["path"])
+		budget = route_budget(method, route)
+		if stats.count > budget:
+			logger.warning(
+				"%s %s: %d comandos SQL (limite %d), %.1f ms no banco",
+				method, route, stats.count, budget, stats.seconds * 1000,
+			)
+		for statement, times in stats.repeated():
+			logger.warning("%s %s: possível N+1, comando repetido %dx: %s", method, route, times, statement[:300])
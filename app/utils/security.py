@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+import hashlib
 import os
+import threading
+import time
 from typing import Any, Dict, Optional
 
 import jwt
@@ -16,6 +20,59 @@ SECRET_KEY: str = os.getenv("JWT_SECRET", "5bf4bae37304e632c10e8ad6c2436c5f")
 ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
 JWT_LEEWAY_SECONDS: int = int(os.getenv("JWT_LEEWAY_SECONDS", "60"))
+# Payloads de tokens já verificados por processo (0 desliga)
+TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+
+class VerifiedTokenCache:
+	"""LRU de payloads de tokens válidos, por digest do token, até o `exp` do token.
+
+	Evita refazer parse do header e verificação da assinatura a cada request
+	autenticado. Só tokens que passaram pela verificação completa entram; depois
+	do `exp` o token volta a ser verificado (e então a folga JWT_LEEWAY_SECONDS vale).
+	"""
+
+	def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+		self.max_entries = max_entries
+		self._entries: OrderedDict[bytes, tuple[Dict[str, Any], float]] = OrderedDict()
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _key(token: str) -> bytes:
+		return hashlib.sha256(token.encode("utf-8")).digest()
+
+	def get(self, token: str) -> Optional[Dict[str, Any]]:
+		if self.max_entries <= 0:
+			return None
+		key = self._key(token)
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+			payload, exp = entry
+			if time.time() >= exp:
+				del self._entries[key]
+				return None
+			self._entries.move_to_end(key)
+		return dict(payload)
+
+	def put(self, token: str, payload: Dict[str, Any]) -> None:
+		exp = payload.get("exp")
+		if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+			return
+		key = self._key(token)
+		with self._lock:
+			self._entries[key] = (dict(payload), float(exp))
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+
+token_cache = VerifiedTokenCache()
 
 
 def create_access_token(
@@ -64,6 +121,10 @@ def verify_token(token: str) -> Dict[str, Any]:
 	if not token:
 		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token ausente")
 
+	cached = token_cache.get(token)
+	if cached is not None:
+		return cached
+
 	try:
 		header = jwt.get_unverified_header(token)
 		alg = header.get("alg")
@@ -79,6 +140,7 @@ def verify_token(token: str) -> Dict[str, Any]:
 			algorithms=[ALGORITHM],
 			leeway=JWT_LEEWAY_SECONDS,
 		)
+		token_cache.put(token, payload)
 		return payload
 	except jwt.ExpiredSignatureError:
 		raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expirado")
@@ -0,0 +1,20 @@
+"""Hooks do gunicorn para as métricas multiprocesso (PROMETHEUS_MULTIPROC_DIR).
+
+O gunicorn carrega este arquivo automaticamente quando iniciado na raiz do projeto.
+"""
+import os
+import shutil
+
+
+def on_starting(server):
+    # Arquivos de um boot anterior somariam valores de processos que não existem mais
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from app.utils.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
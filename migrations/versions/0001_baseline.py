@@ -0,0 +1,131 @@
+"""baseline: schema criado até então pelo create_all do startup
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+RISK_LEVELS = ("baixo", "moderado", "alto")
+
+
+def risk_level_type():
+    # O tipo ENUM do Postgres é criado uma vez só (em upgrade); as colunas apenas o referenciam
+    return sa.Enum(*RISK_LEVELS, name="risklevel").with_variant(
+        postgresql.ENUM(*RISK_LEVELS, name="risklevel", create_type=False), "postgresql"
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(*RISK_LEVELS, name="risklevel").create(bind, checkfirst=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=True),
+        sa.Column("email", sa.String(length=150), nullable=True),
+        sa.Column("password", sa.String(length=255), nullable=True),
+        sa.Column("risk_profile", sa.String(length=20), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_users_id"), "users", ["id"], unique=False)
+    op.create_index(op.f("ix_users_email"), "users", ["email"], unique=True)
+
+    op.create_table(
+        "cryptos",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=True),
+        sa.Column("symbol", sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_cryptos_id"), "cryptos", ["id"], unique=False)
+    op.create_index(op.f("ix_cryptos_symbol"), "cryptos", ["symbol"], unique=True)
+
+    op.create_table(
+        "questions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("question_text", sa.String(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_questions_id"), "questions", ["id"], unique=False)
+
+    op.create_table(
+        "recommendations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("crypto_id", sa.Integer(), nullable=True),
+        sa.Column("risk_level", risk_level_type(), nullable=True),
+        sa.Column("recommended_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["crypto_id"], ["cryptos.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_recommendations_id"), "recommendations", ["id"], unique=False)
+
+    op.create_table(
+        "question_options",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("question_id", sa.Integer(), nullable=True),
+        sa.Column("value", sa.String(length=50), nullable=True),
+        sa.Column("label", sa.String(length=255), nullable=True),
+        sa.Column("score", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["question_id"], ["questions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_question_options_id"), "question_options", ["id"], unique=False)
+    op.create_index(op.f("ix_question_options_value"), "question_options", ["value"], unique=False)
+
+    op.create_table(
+        "questionnaire_submissions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("total_score", sa.Integer(), nullable=True),
+        sa.Column("max_score", sa.Integer(), nullable=True),
+        sa.Column("risk_level", risk_level_type(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_questionnaire_submissions_id"), "questionnaire_submissions", ["id"], unique=False)
+
+    op.create_table(
+        "user_answers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("submission_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("question_id", sa.Integer(), nullable=True),
+        sa.Column("option_id", sa.Integer(), nullable=True),
+        sa.Column("selected_value", sa.String(length=50), nullable=True),
+        sa.Column("score", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["option_id"], ["question_options.id"], ondelete="SET NULL"),
+        sa.ForeignKeyConstraint(["question_id"], ["questions.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["submission_id"], ["questionnaire_submissions.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_user_answers_id"), "user_answers", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table("user_answers")
+    op.drop_table("questionnaire_submissions")
+    op.drop_table("question_options")
+    op.drop_table("recommendations")
+    op.drop_table("questions")
+    op.drop_table("cryptos")
+    op.drop_table("users")
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(name="risklevel").drop(bind, checkfirst=True)
@@ -0,0 +1,66 @@
+"""histórico de execuções do recomendador
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+RISK_LEVELS = ("baixo", "moderado", "alto")
+
+
+def risk_level_type():
+    # Tipo ENUM já criado na 0001
+    return sa.Enum(*RISK_LEVELS, name="risklevel").with_variant(
+        postgresql.ENUM(*RISK_LEVELS, name="risklevel", create_type=False), "postgresql"
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recommendation_runs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("risk_profile", risk_level_type(), nullable=True),
+        sa.Column("snapshot_version", sa.String(length=64), nullable=True),
+        sa.Column("catalog_version", sa.String(length=64), nullable=True),
+        sa.Column("source", sa.String(length=20), nullable=True),
+        sa.Column("submission_id", sa.Integer(), nullable=True),
+        sa.Column("item_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["submission_id"], ["questionnaire_submissions.id"], ondelete="SET NULL"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_recommendation_runs_id"), "recommendation_runs", ["id"], unique=False)
+    op.create_index(op.f("ix_recommendation_runs_user_id"), "recommendation_runs", ["user_id"], unique=False)
+
+    op.create_table(
+        "recommendation_run_items",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("run_id", sa.Integer(), nullable=True),
+        sa.Column("crypto_id", sa.Integer(), nullable=True),
+        sa.Column("symbol", sa.String(length=20), nullable=True),
+        sa.Column("network", sa.String(length=100), nullable=True),
+        sa.Column("risk_level", risk_level_type(), nullable=True),
+        sa.Column("predicted_movement", sa.Integer(), nullable=True),
+        sa.Column("predicted_proba_up", sa.Float(), nullable=True),
+        sa.Column("eligible", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["crypto_id"], ["cryptos.id"], ondelete="SET NULL"),
+        sa.ForeignKeyConstraint(["run_id"], ["recommendation_runs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_recommendation_run_items_id"), "recommendation_run_items", ["id"], unique=False)
+    op.create_index(op.f("ix_recommendation_run_items_run_id"), "recommendation_run_items", ["run_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table("recommendation_run_items")
+    op.drop_table("recommendation_runs")
@@ -0,0 +1,39 @@
+"""índices das consultas por usuário e por submissão
+
+Listagens paginadas por keyset filtram por user_id e ordenam por
+(created_at/recommended_at, id): o índice composto atende filtro e ordem sem
+ordenação em memória. user_answers.submission_id é usado ao reescrever as
+respostas de uma submissão e question_options.question_id no carregamento
+das opções do catálogo de perguntas.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_recommendations_user_id_recommended_at", "recommendations", ["user_id", "recommended_at", "id"], unique=False)
+    op.create_index("ix_questionnaire_submissions_user_id_created_at", "questionnaire_submissions", ["user_id", "created_at", "id"], unique=False)
+    op.create_index("ix_user_answers_user_id_created_at", "user_answers", ["user_id", "created_at", "id"], unique=False)
+    op.create_index(op.f("ix_user_answers_submission_id"), "user_answers", ["submission_id"], unique=False)
+    op.create_index(op.f("ix_question_options_question_id"), "question_options", ["question_id"], unique=False)
+    op.create_index("ix_recommendation_runs_user_id_created_at", "recommendation_runs", ["user_id", "created_at", "id"], unique=False)
+    # Prefixo do índice composto acima: redundante
+    op.drop_index(op.f("ix_recommendation_runs_user_id"), table_name="recommendation_runs")
+
+
+def downgrade() -> None:
+    op.create_index(op.f("ix_recommendation_runs_user_id"), "recommendation_runs", ["user_id"], unique=False)
+    op.drop_index("ix_recommendation_runs_user_id_created_at", table_name="recommendation_runs")
+    op.drop_index(op.f("ix_question_options_question_id"), table_name="question_options")
+    op.drop_index(op.f("ix_user_answers_submission_id"), table_name="user_answers")
+    op.drop_index("ix_user_answers_user_id_created_at", table_name="user_answers")
+    op.drop_index("ix_questionnaire_submissions_user_id_created_at", table_name="questionnaire_submissions")
+    op.drop_index("ix_recommendations_user_id_recommended_at", table_name="recommendations")
@@ -0,0 +1,343 @@
+"""Benchmark HTTP ponta a ponta da API (RPS e latência p50/p95/p99 por rota).
+
+Sobe a aplicação com uvicorn contra um banco local (SQLite por padrão, ou a URL
+informada em --database-url, ex.: um Postgres de teste), semeia perguntas e
+cryptos, cria usuários, e dispara uma mistura configurável de requests com
+concorrência fixa. O resultado vai para um JSON que pode ser comparado entre
+commits com --compare.
+
+Requer httpx (já em requirements.txt).
+
+Exemplos:
+    python scripts/bench_api.py --duration 30 --concurrency 32 --out bench.json
+    python scripts/bench_api.py --mix login=1,recommender=8,cryptos=1 --env DATABASE_ASYNC=true
+    python scripts/bench_api.py --compare bench.json --out bench_novo.json
+    python scripts/bench_api.py --synthetic 1000x365    # histórico sintético, moedas cadastradas no catálogo
+    python scripts/bench_api.py --url http://localhost:8000 --no-server   # servidor já rodando
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+DEFAULT_MIX = "login=2,submit=1,recommender=5,cryptos=2"
+PASSWORD = "bench-password"
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Rota desconhecida no mix: {name} (use: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+# --- Cenários ----------------------------------------------------------------
+
+class BenchUser:
+    def __init__(self, email: str, token: str):
+        self.email = email
+        self.token = token
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def scenario_login(client: httpx.AsyncClient, user: BenchUser, ctx: dict) -> httpx.Response:
+    return await client.post("/auth/login", json={"email": user.email, "password": PASSWORD})
+
+
+async def scenario_submit(client: httpx.AsyncClient, user: BenchUser, ctx: dict) -> httpx.Response:
+    answers = [
+        {"question_id": q["id"], "selected_value": random.choice(q["options"])["value"]}
+        for q in ctx["questions"]
+    ]
+    return await client.post("/questionnaire/submit", json={"answers": answers}, headers=user.headers)
+
+
+async def scenario_recommender(client: httpx.AsyncClient, user: BenchUser, ctx: dict) -> httpx.Response:
+    return await client.get("/recommendations/recommender", headers=user.headers)
+
+
+async def scenario_cryptos(client: httpx.AsyncClient, user: BenchUser, ctx: dict) -> httpx.Response:
+    return await client.get("/cryptos/")
+
+
+SCENARIOS = {
+    "login": ("POST /auth/login", scenario_login),
+    "submit": ("POST /questionnaire/submit", scenario_submit),
+    "recommender": ("GET /recommendations/recommender", scenario_recommender),
+    "cryptos": ("GET /cryptos/", scenario_cryptos),
+}
+
+
+# --- Servidor ------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, workdir: str) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{Path(workdir) / 'bench.db'}"
+    env["SEED_QUESTIONS_ON_STARTUP"] = "true"
+    env["SEED_CRYPTOS_ON_STARTUP"] = "true"
+    if args.synthetic:
+        env["RECOMMENDER_CSV_PATH"] = write_synthetic(args.synthetic, workdir)
+    elif args.features:
+        env["RECOMMENDER_CSV_PATH"] = args.features
+    if args.model:
+        env["RECOMMENDER_MODEL_PATH"] = args.model
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    if args.workers > 1:
+        cmd += ["--workers", str(args.workers)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def write_synthetic(spec: str, workdir: str) -> str:
+    from scripts.generate_feature_history import generate_feature_history, write_feature_history
+
+    n_symbols, n_days = parse_synthetic(spec)
+    frame = generate_feature_history(n_symbols, n_days)
+    return write_feature_history(frame, str(Path(workdir) / "features.csv"))
+
+
+def parse_synthetic(spec: str) -> tuple[int, int]:
+    n_symbols, _, n_days = spec.lower().partition("x")
+    return int(n_symbols), int(n_days)
+
+
+async def register_synthetic_symbols(client: httpx.AsyncClient, spec: str) -> None:
+    """Cadastra as moedas sintéticas para que entrem no cálculo do recomendador."""
+    from scripts.generate_feature_history import symbol_names
+
+    existing = {c["symbol"] for c in (await client.get("/cryptos/")).json()}
+    for symbol in symbol_names(parse_synthetic(spec)[0]):
+        if symbol not in existing:
+            (await client.post("/cryptos/", json={"name": symbol, "symbol": symbol})).raise_for_status()
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/cryptos/")).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit("Servidor não respondeu a tempo")
+
+
+async def prepare_users(client: httpx.AsyncClient, n_users: int, run_id: str) -> tuple[list[BenchUser], dict]:
+    users = []
+    for i in range(n_users):
+        email = f"bench-{run_id}-{i}@example.com"
+        r = await client.post("/auth/register", json={"name": f"Bench {i}", "email": email, "password": PASSWORD})
+        r.raise_for_status()
+        users.append(BenchUser(email, r.json()["access_token"]))
+
+    r = await client.get("/questionnaire/questions", headers=users[0].headers)
+    r.raise_for_status()
+    ctx = {"questions": r.json()}
+    # Cada usuário responde uma vez para ter risk_profile definido (usado pelo recomendador)
+    for user in users:
+        await scenario_submit(client, user, ctx)
+    return users, ctx
+
+
+# --- Execução ------------------------------------------------------------------
+
+async def run_load(client, users, ctx, mix, concurrency, duration, max_requests, warmup):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples: dict[str, list[float]] = {n: [] for n in names}
+    errors: dict[str, dict[str, int]] = {n: {} for n in names}
+    issued = 0
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    async def worker(worker_id: int):
+        nonlocal issued
+        rng = random.Random(worker_id)
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at or (max_requests and issued >= max_requests):
+                return
+            name = rng.choices(names, weights)[0]
+            user = users[rng.randrange(len(users))]
+            t0 = time.perf_counter()
+            try:
+                r = await SCENARIOS[name][1](client, user, ctx)
+                status = str(r.status_code) if r.status_code >= 400 else None
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - t0
+            if t0 < measure_from:
+                continue
+            issued += 1
+            samples[name].append(elapsed)
+            if status:
+                errors[name][status] = errors[name].get(status, 0) + 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - measure_from
+    return samples, errors, wall
+
+
+def summarize(samples, errors, wall) -> dict:
+    routes = {}
+    total = 0
+    for name, values in samples.items():
+        values = sorted(values)
+        total += len(values)
+        routes[SCENARIOS[name][0]] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": len(values) / wall if wall > 0 else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": (values[-1] * 1000) if values else 0.0,
+        }
+    return {"total_requests": total, "wall_seconds": wall, "rps": total / wall if wall > 0 else 0.0, "routes": routes}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(result: dict, baseline: dict | None) -> None:
+    print(f"\nTotal: {result['total_requests']} requests em {result['wall_seconds']:.1f}s -> {result['rps']:.1f} req/s")
+    header = f"{'rota':36} {'req':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  erros"
+    print(header)
+    print("-" * len(header))
+    base_routes = (baseline or {}).get("summary", {}).get("routes", {})
+    for route, r in result["routes"].items():
+        line = f"{route:36} {r['requests']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {r['errors'] or ''}"
+        print(line)
+        b = base_routes.get(route)
+        if b:
+            def delta(key):
+                return (r[key] - b[key]) / b[key] * 100 if b[key] else 0.0
+            print(f"{'  vs baseline':36} {'':>7} {delta('rps'):>+7.1f}% {delta('p50_ms'):>+7.1f}% {delta('p95_ms'):>+7.1f}% {delta('p99_ms'):>+7.1f}%")
+
+
+async def main_async(args) -> dict:
+    mix = parse_mix(args.mix)
+    proc = None
+    tmp = tempfile.TemporaryDirectory(prefix="cryptolens-bench-")
+    try:
+        base_url = args.url
+        if not args.no_server:
+            proc, base_url = start_server(args, tmp.name)
+        await wait_ready(base_url)
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            if args.synthetic:
+                await register_synthetic_symbols(client, args.synthetic)
+            run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+            users, ctx = await prepare_users(client, args.users, run_id)
+            samples, errors, wall = await run_load(
+                client, users, ctx, mix, args.concurrency, args.duration, args.requests, args.warmup,
+            )
+        return summarize(samples, errors, wall)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        tmp.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base (com --no-server)")
+    parser.add_argument("--no-server", action="store_true", help="Não sobe o uvicorn; usa --url")
+    parser.add_argument("--database-url", help="Banco do servidor (padrão: SQLite temporário)")
+    parser.add_argument("--features", help="RECOMMENDER_CSV_PATH do servidor")
+    parser.add_argument("--synthetic", help="Gera um histórico sintético MOEDASxDIAS (ex.: 1000x365) no lugar de --features")
+    parser.add_argument("--model", help="RECOMMENDER_MODEL_PATH do servidor")
+    parser.add_argument("--env", action="append", default=[], help="Variável extra para o servidor (KEY=VALUE)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos por rota (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos medidos (após o warm-up)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Segundos iniciais descartados")
+    parser.add_argument("--requests", type=int, default=0, help="Para após N requests medidos (0 = só duração)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Arquivo JSON de saída")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    summary = asyncio.run(main_async(args))
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "mix": parse_mix(args.mix),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "workers": args.workers,
+            "users": args.users,
+            "database": "custom" if args.database_url else "sqlite",
+            "synthetic": args.synthetic,
+            "env": args.env,
+        },
+        "summary": summary,
+    }
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(summary, baseline)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2))
+        print(f"\nResultado salvo em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
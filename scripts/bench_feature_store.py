@@ -0,0 +1,73 @@
+"""Compara o carregamento a frio do histórico de features em CSV e no feature store.
+
+Cada medição roda em um processo novo (cold load): mede o tempo de
+`load_feature_frame` com a projeção de colunas do recomendador e o aumento de
+RSS máximo (ru_maxrss) causado pela carga.
+
+Uso:
+    python scripts/bench_feature_store.py app/docs/dataframe_com_features.csv app/docs/feature_store --repeat 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import numpy as np, pandas as pd
+from app.ml.feature_store import load_feature_frame
+from app.ml.snapshot import RECOMMENDER_COLUMNS
+import joblib
+cols = list(dict.fromkeys([*RECOMMENDER_COLUMNS, *joblib.load({features!r})])) if {project!r} else None
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+df = load_feature_frame({path!r}, cols)
+# Toca as colunas como o recomendador faria (força a leitura das páginas mmap)
+touched = float(df.select_dtypes("number").sum().sum())
+elapsed = time.perf_counter() - t0
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_delta_kb": rss_after - rss_before, "rows": len(df), "cols": df.shape[1]}}))
+"""
+
+
+def measure(path: str, project: bool, features: str) -> dict:
+    code = _CHILD.format(root=str(ROOT), path=path, project=project, features=features)
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="CSV, parquet e/ou diretórios de feature store")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-projection", action="store_true", help="Carrega todas as colunas")
+    parser.add_argument("--features", default="app/ml/model_features.joblib")
+    parser.add_argument("--json", dest="json_out", help="Salva o resultado em JSON")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.paths:
+        runs = [measure(path, not args.no_projection, args.features) for _ in range(args.repeat)]
+        row = {
+            "path": path,
+            "rows": runs[0]["rows"],
+            "cols": runs[0]["cols"],
+            "median_seconds": statistics.median(r["seconds"] for r in runs),
+            "min_seconds": min(r["seconds"] for r in runs),
+            "median_rss_delta_kb": statistics.median(r["rss_delta_kb"] for r in runs),
+        }
+        results.append(row)
+        print(f"{path}: {row['median_seconds'] * 1000:.1f} ms (min {row['min_seconds'] * 1000:.1f} ms), "
+              f"RSS +{row['median_rss_delta_kb'] / 1024:.1f} MiB, {row['rows']}x{row['cols']}")
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Microbenchmark por etapa do recomendador em função do tamanho dos dados.
+
+Para cada tamanho (moedas x dias) gera um histórico sintético
+(`generate_feature_history.py`), grava em disco e mede, separadamente, as
+etapas do caminho de `recommend_cryptos`:
+
+    load           leitura do arquivo com a projeção de colunas do recomendador
+    normalize      symbol -> symbol_base e conversão de date
+    latest_rows    seleção da última linha por moeda (LatestRowIndex)
+    risk_tiers     métrica de risco + tercis + classificação
+    inference      previsão e probabilidade de alta (modelo configurado)
+    serialize      registros dos três perfis + json.dumps
+    score_all      recommend_all_profiles com o índice pronto (o que a API executa)
+
+Cada etapa roda --repeat vezes e reporta a mediana. No fim, estima o expoente
+de crescimento de cada etapa (inclinação log-log do tempo contra linhas e
+contra moedas), para acompanhar a complexidade conforme o universo cresce.
+
+Uso:
+    python scripts/bench_recommender.py --sizes 10x365,100x365,1000x365,1000x1825 --out bench_rec.json
+    python scripts/bench_recommender.py --sizes 100x365,1000x365 --store   # feature store em vez de CSV
+"""
+import argparse
+import dataclasses
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.ml import recommender
+from app.ml.feature_store import load_feature_frame
+from app.ml.latest_index import LatestRowIndex, normalize_symbols
+from app.ml.snapshot import projected_columns
+from scripts.generate_feature_history import generate_feature_history, write_feature_history
+
+STAGES = ("load", "normalize", "latest_rows", "risk_tiers", "inference", "serialize", "score_all")
+
+
+def parse_sizes(spec: str) -> list[tuple[int, int]]:
+    sizes = []
+    for part in spec.split(","):
+        n_symbols, _, n_days = part.lower().partition("x")
+        sizes.append((int(n_symbols), int(n_days)))
+    return sizes
+
+
+def timed(fn, repeat: int):
+    """Mediana (s) de `repeat` execuções e o resultado da última."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), result
+
+
+def bench_size(n_symbols: int, n_days: int, repeat: int, store: bool, workdir: str) -> dict:
+    frame = generate_feature_history(n_symbols, n_days, features=recommender.get_model_features())
+    target = Path(workdir) / (f"store_{n_symbols}x{n_days}" if store else f"features_{n_symbols}x{n_days}.csv")
+    path = write_feature_history(frame, str(target), store=store)
+    columns = projected_columns()
+    seconds = {}
+
+    seconds["load"], loaded = timed(lambda: load_feature_frame(path, columns), repeat)
+    seconds["normalize"], _ = timed(
+        lambda: (normalize_symbols(loaded["symbol"]), pd.to_datetime(loaded["date"], errors="coerce")), repeat,
+    )
+    seconds["latest_rows"], index = timed(lambda: LatestRowIndex(loaded), repeat)
+
+    df_last = index.latest_frame(copy=False)
+
+    def risk_tiers():
+        return recommender.classify_risk_levels(recommender.compute_risk_metric(df_last))
+
+    seconds["risk_tiers"], _ = timed(risk_tiers, repeat)
+    seconds["inference"], _ = timed(lambda: recommender.predict_with_proba_up(df_last), repeat)
+
+    scored = recommender.score_cryptos(index)
+
+    def serialize():
+        # Sem a memória de registros do ScoredCryptos, para medir a montagem toda vez
+        fresh = dataclasses.replace(scored, _memo={})
+        return json.dumps({p: fresh.records(p) for p in recommender.RISK_PROFILES})
+
+    seconds["serialize"], _ = timed(serialize, repeat)
+    seconds["score_all"], _ = timed(lambda: recommender.recommend_all_profiles(index), repeat)
+
+    return {
+        "symbols": n_symbols,
+        "days": n_days,
+        "rows": len(loaded),
+        "format": "store" if store else "csv",
+        "ms": {stage: seconds[stage] * 1000 for stage in STAGES},
+    }
+
+
+def growth_exponents(results: list[dict], key: str) -> dict[str, float | None]:
+    """Inclinação log-log do tempo de cada etapa contra `key` (linhas ou moedas)."""
+    xs = np.array([r[key] for r in results], dtype=float)
+    if len(set(xs)) < 2:
+        return {stage: None for stage in STAGES}
+    out = {}
+    for stage in STAGES:
+        ys = np.array([max(r["ms"][stage], 1e-6) for r in results])
+        out[stage] = float(np.polyfit(np.log(xs), np.log(ys), 1)[0])
+    return out
+
+
+def print_report(results: list[dict], exponents: dict) -> None:
+    header = f"{'moedas x dias':>15} {'linhas':>9} " + " ".join(f"{s:>11}" for s in STAGES)
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        size = f"{r['symbols']}x{r['days']}"
+        print(f"{size:>15} {r['rows']:>9} " + " ".join(f"{r['ms'][s]:>9.2f}ms" for s in STAGES))
+    for key, label in (("rows", "expoente/linhas"), ("symbols", "expoente/moedas")):
+        exps = exponents[key]
+        print(f"{label:>25} " + " ".join(f"{exps[s]:>11.2f}" if exps[s] is not None else f"{'-':>11}" for s in STAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10x365,100x365,1000x365,100x1825", help="Lista moedas x dias")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--store", action="store_true", help="Mede a carga a partir do feature store colunar")
+    parser.add_argument("--out", help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    recommender.warm_up()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="cryptolens-bench-rec-") as workdir:
+        for n_symbols, n_days in parse_sizes(args.sizes):
+            results.append(bench_size(n_symbols, n_days, args.repeat, args.store, workdir))
+            print(f"... {n_symbols}x{n_days} ok", file=sys.stderr)
+
+    exponents = {"rows": growth_exponents(results, "rows"), "symbols": growth_exponents(results, "symbols")}
+    print_report(results, exponents)
+    if args.out:
+        Path(args.out).write_text(json.dumps({"results": results, "exponents": exponents}, indent=2))
+        print(f"\nResultado salvo em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
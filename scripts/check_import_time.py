@@ -0,0 +1,69 @@
+"""Mede o tempo de import da aplicação com `python -X importtime` e aplica um orçamento.
+
+Falha (exit 1) se:
+- algum módulo pesado de ML (pandas, numpy, sklearn, scipy, joblib) for importado
+  junto com o módulo alvo;
+- o tempo cumulativo de import do módulo alvo passar do orçamento.
+
+Uso:
+    python scripts/check_import_time.py                       # app.main, 1500 ms
+    python scripts/check_import_time.py --budget-ms 800 --module app.auth
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+FORBIDDEN = ("pandas", "numpy", "sklearn", "scipy", "joblib")
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str) -> list[tuple[int, int, int, str]]:
+    env = dict(os.environ)
+    # Importar app.database exige uma URL; o engine não conecta no import
+    env.setdefault("DATABASE_URL", "sqlite://")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"Falha ao importar {module}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            rows.append((int(m.group(1)), int(m.group(2)), len(m.group(3)), m.group(4)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=10, help="Quantos módulos mais lentos listar")
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total_us = next((cum for _, cum, _, name in reversed(rows) if name == args.module), 0)
+    heavy = sorted({name for _, _, _, name in rows if name.split(".")[0] in FORBIDDEN and "." not in name})
+
+    print(f"{args.module}: {total_us / 1000:.1f} ms (orçamento {args.budget_ms:.0f} ms)")
+    for self_us, cum_us, _, name in sorted(rows, key=lambda r: r[1], reverse=True)[1:args.top + 1]:
+        print(f"  {cum_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"ERRO: módulos de ML importados no boot: {', '.join(heavy)}")
+        failed = True
+    if total_us / 1000 > args.budget_ms:
+        print("ERRO: orçamento de import excedido")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Fixa o número de comandos SQL do questionário e de cada rota da API.
+
+Cria um SQLite temporário (migrações + seed) e conta os comandos com
+`app.utils.query_stats.capture_queries` / `assert_max_queries`.
+
+1. Serviço do questionário, com o catálogo de perguntas já em memória:
+
+    envio                  UPDATE do perfil + INSERT da submissão + INSERT em lote das respostas
+    atualização sem mudança SELECT da submissão + SELECT das respostas + UPDATE do perfil
+    atualização com diff    + no máximo um DELETE, um UPDATE em lote, um INSERT em lote
+                            e o UPDATE da submissão
+
+(Na rota, o SELECT da submissão já foi feito pela checagem de dono e sai do
+identity map; aqui o serviço é chamado direto, então ele conta.)
+
+O número não pode crescer com a quantidade de respostas. Também confere que,
+após cada atualização, as respostas gravadas são exatamente as enviadas.
+
+2. Rotas (TestClient, com um histórico de features sintético e, sem o
+`model.joblib`, um modelo sintético): cada request roda
+com os caches em memória vazios (pior caso) depois de o usuário já ter várias
+submissões e execuções do recomendador, então um N+1 aparece como estouro do
+limite ou como comando repetido (`SQL_REPEATED_QUERY_THRESHOLD`), que também falha.
+
+Uso:
+    python scripts/check_query_counts.py
+Sai com código 1 se algum caso passar do limite, repetir comandos ou gravar respostas erradas.
+"""
+import os
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+SUBMIT_MAX_STATEMENTS = 3
+UPDATE_UNCHANGED_MAX_STATEMENTS = 3
+UPDATE_MAX_STATEMENTS = 7
+
+# Rotas: (rótulo, método, path, corpo, limite), na ordem em que são chamadas.
+# `{sid}`, `{rec_id}`, `{run_id}` e `{crypto_id}` vêm dos dados criados antes.
+ENDPOINTS = [
+    ("cadastro", "POST", "/auth/register", {"name": "e", "email": "e2@example.com", "password": "pw-e2"}, 3),
+    ("login", "POST", "/auth/login", {"email": "e@example.com", "password": "pw-e"}, 1),
+    ("perfil", "GET", "/auth/me", None, 1),
+    ("atualizar perfil", "PUT", "/auth/user/me", {"name": "e"}, 2),
+    ("perguntas", "GET", "/questionnaire/questions", None, 3),
+    ("envio do questionário", "POST", "/questionnaire/submit", "answers", 10),
+    ("atualização do questionário", "PUT", "/questionnaire/submission/{sid}", "answers", 10),
+    ("submissões", "GET", "/questionnaire/submission/", None, 1),
+    ("respostas", "GET", "/questionnaire/answers/", None, 1),
+    ("cryptos", "GET", "/cryptos/", None, 1),
+    ("crypto", "GET", "/cryptos/{crypto_id}", None, 1),
+    ("nova crypto", "POST", "/cryptos/", {"name": "Query", "symbol": "QRY"}, 2),
+    ("recomendações salvas", "GET", "/recommendations/", None, 1),
+    ("nova recomendação", "POST", "/recommendations/", {"user_id": 0, "crypto_id": 1, "risk_level": "baixo"}, 2),
+    ("recomendação", "GET", "/recommendations/id/{rec_id}", None, 1),
+    ("atualizar recomendação", "PATCH", "/recommendations/id/{rec_id}", {"risk_level": "alto"}, 3),
+    ("recomendador (GET)", "GET", "/recommendations/recommender", None, 6),
+    ("recomendador (POST)", "POST", "/recommendations/recommender?risk_profile=baixo", None, 6),
+    ("histórico", "GET", "/recommendations/history", None, 1),
+    ("execução do histórico", "GET", "/recommendations/history/{run_id}", None, 2),
+    ("excluir usuário", "DELETE", "/auth/user/me", None, 6),
+]
+# Submissões/execuções criadas antes de medir as rotas (um N+1 cresceria com elas)
+ENDPOINT_HISTORY_SIZE = 5
+
+
+def check_services(failures: list[str]) -> None:
+    from sqlalchemy import select
+    from app import models
+    from app.database import SessionLocal
+    from app.services import risk_service
+    from app.services.catalog_service import question_catalog
+    from app.utils.query_stats import capture_queries
+
+    db = SessionLocal()
+    user = models.User(name="q", email="q@example.com", password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    catalog = question_catalog.get(db)
+    db.close()
+
+    questions = catalog.questions
+
+    def answers(pick, repeat=1):
+        return [
+            {"question_id": q["id"], "selected_option_id": q["options"][pick(i) % len(q["options"])]["id"]}
+            for _ in range(repeat)
+            for i, q in enumerate(questions)
+        ]
+
+    def stored(db, submission_id):
+        rows = db.execute(
+            select(models.UserAnswer.question_id, models.UserAnswer.option_id)
+            .where(models.UserAnswer.submission_id == submission_id)
+        ).all()
+        return Counter(tuple(r) for r in rows)
+
+    def expected(sent):
+        return Counter((a["question_id"], a["selected_option_id"]) for a in sent)
+
+    def check(name, limit, fn, sent):
+        db = SessionLocal()
+        try:
+            with capture_queries() as stats:
+                result = fn(db)
+            content_ok = stored(db, result.id) == expected(sent)
+        finally:
+            db.close()
+        ok = stats.count <= limit and content_ok
+        if not ok:
+            failures.append(name)
+        print(f"[{'ok' if ok else 'FALHA'}] {name}: {stats.count} comando(s) (limite {limit}){'' if content_ok else ', respostas gravadas diferentes das enviadas'}")
+        if not ok:
+            for statement in stats.statements:
+                print(f"        {statement[:100]}")
+        return result
+
+    first = answers(lambda i: 0)
+    submission = check(
+        "envio (5 respostas)", SUBMIT_MAX_STATEMENTS,
+        lambda db: risk_service.submit_questionnaire(db, user_id, first), first,
+    )
+    many = answers(lambda i: 1, repeat=20)
+    check(
+        "envio (100 respostas)", SUBMIT_MAX_STATEMENTS,
+        lambda db: risk_service.submit_questionnaire(db, user_id, many), many,
+    )
+    sid = submission.id
+    cases = [
+        ("atualização sem mudança", UPDATE_UNCHANGED_MAX_STATEMENTS, first),
+        ("atualização de uma resposta", UPDATE_MAX_STATEMENTS, answers(lambda i: 2 if i == 0 else 0)),
+        ("atualização de todas as respostas", UPDATE_MAX_STATEMENTS, answers(lambda i: i + 1)),
+        ("atualização removendo respostas", UPDATE_MAX_STATEMENTS, answers(lambda i: 1)[:2]),
+        ("atualização acrescentando respostas", UPDATE_MAX_STATEMENTS, answers(lambda i: 2, repeat=4)),
+    ]
+    for name, limit, sent in cases:
+        check(name, limit, lambda db, sent=sent: risk_service.update_questionnaire_submission(db, sid, user_id, sent), sent)
+
+
+def clear_caches() -> None:
+    from app.ml.result_cache import result_cache
+    from app.services.catalog_service import crypto_catalog, question_catalog
+    from app.services.user_context_service import user_context_cache
+
+    crypto_catalog.invalidate()
+    question_catalog.invalidate()
+    user_context_cache.clear()
+    result_cache.invalidate()
+
+
+def check_endpoints(failures: list[str]) -> None:
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.utils.query_stats import SQL_REPEATED_QUERY_THRESHOLD, assert_max_queries
+
+    with TestClient(app) as client:
+        token = client.post("/auth/register", json={"name": "e", "email": "e@example.com", "password": "pw-e"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        questions = client.get("/questionnaire/questions", headers=headers).json()
+        answers = [{"question_id": q["id"], "selected_option_id": q["options"][-1]["id"]} for q in questions]
+        for _ in range(ENDPOINT_HISTORY_SIZE):
+            submitted = client.post("/questionnaire/submit", json={"answers": answers}, headers=headers)
+            submitted.raise_for_status()
+            client.post("/recommendations/", json={"user_id": 0, "crypto_id": 1, "risk_level": "baixo"}, headers=headers).raise_for_status()
+            client.post("/recommendations/recommender?risk_profile=alto", headers=headers).raise_for_status()
+        ids = {
+            "sid": submitted.json()["questionnaire"]["submission_id"],
+            "run_id": submitted.json()["run_id"],
+            "rec_id": client.get("/recommendations/", headers=headers).json()[0]["id"],
+            "crypto_id": client.get("/cryptos/").json()[0]["id"],
+        }
+
+        for label, method, path, body, limit in ENDPOINTS:
+            clear_caches()
+            json_body = {"answers": answers} if body == "answers" else body
+            name = f"{method} {path}"
+            within_budget = True
+            try:
+                with assert_max_queries(limit, name) as stats:
+                    response = client.request(method, path.format(**ids), json=json_body, headers=headers)
+            except AssertionError:
+                within_budget = False
+            repeated = stats.repeated(SQL_REPEATED_QUERY_THRESHOLD)
+            ok = within_budget and response.status_code < 400 and not repeated
+            if not ok:
+                failures.append(name)
+            status = f", HTTP {response.status_code}" if response.status_code >= 400 else ""
+            print(f"[{'ok' if ok else 'FALHA'}] {label} ({name}): {stats.count} comando(s) (limite {limit}){status}")
+            for statement, times in repeated:
+                print(f"        repetido {times}x: {statement[:100]}")
+            if not within_budget:
+                for statement in stats.statements:
+                    print(f"        {statement[:100]}")
+
+
+def main():
+    tmpdir = tempfile.TemporaryDirectory(prefix="cryptolens-queries-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmpdir.name}/queries.db"
+    os.environ["RECOMMENDER_CSV_PATH"] = f"{tmpdir.name}/features.csv"
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+    from scripts.generate_feature_history import ensure_model, generate_feature_history, write_feature_history
+
+    # As rotas do recomendador carregam o modelo, que não é versionado (CI: modelo sintético)
+    ensure_model()
+
+    from app.database import SessionLocal, engine, upgrade_database
+    from scripts.seed_db import seed_cryptos, seed_questions
+
+    upgrade_database()
+    db = SessionLocal()
+    seed_questions(db)
+    seed_cryptos(db)
+    db.close()
+    write_feature_history(generate_feature_history(10, 60), os.environ["RECOMMENDER_CSV_PATH"])
+
+    failures: list[str] = []
+    print("Serviço do questionário")
+    check_services(failures)
+    print("\nRotas (caches vazios)")
+    check_endpoints(failures)
+
+    engine.dispose()
+    tmpdir.cleanup()
+    if failures:
+        print(f"\n{len(failures)} caso(s) fora do esperado")
+        sys.exit(1)
+    print("\nContagem de comandos dentro dos limites")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Converte o CSV de features do recomendador para o feature store colunar.
+
+Uso:
+    python scripts/convert_feature_store.py app/docs/dataframe_com_features.csv app/docs/feature_store
+
+Depois aponte RECOMMENDER_CSV_PATH para o diretório gerado.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.ml.feature_store import convert_csv_to_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_path", help="CSV de origem")
+    parser.add_argument("out_dir", help="Diretório do feature store (criado se não existir)")
+    parser.add_argument("--keep-versions", type=int, default=2, help="Quantas versões antigas manter no diretório")
+    args = parser.parse_args()
+
+    Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+    manifest = convert_csv_to_store(args.csv_path, args.out_dir, keep_versions=args.keep_versions)
+    print(f"Feature store gerado em {args.out_dir}/{manifest['data_dir']} ({manifest['rows']} linhas, {len(manifest['columns'])} colunas)")
+
+
+if __name__ == "__main__":
+    main()
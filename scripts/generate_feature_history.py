@@ -0,0 +1,200 @@
+"""Gera um histórico sintético de features com N moedas x M dias.
+
+O esquema segue o CSV que o recomendador consome: `symbol` (ex.: BTCUSDT),
+`date`, `network` e as features do modelo (`model_features.joblib`). Os preços
+vêm de um passeio aleatório log-normal por moeda, e as features derivadas
+(médias móveis, RSI, volatilidade, retornos, lags) são calculadas sobre ele,
+então as distribuições ficam próximas das reais. Features do modelo que o
+gerador não conhece são preenchidas com ruído normal (com aviso).
+
+As primeiras moedas são as cadastradas em `scripts/seed_db.py`, de modo que o
+arquivo também serve para a API com o catálogo padrão.
+
+Uso:
+    python scripts/generate_feature_history.py 1000 365 /tmp/features.csv
+    python scripts/generate_feature_history.py 1000 365 /tmp/feature_store --store
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+DEFAULT_FEATURES_PATH = ROOT / "app" / "ml" / "model_features.joblib"
+# Mesmo padrão de app/ml/recommender.py (relativo ao diretório atual)
+DEFAULT_MODEL_PATH = "app/ml/model.joblib"
+# Mesmos símbolos de scripts/seed_db.py (importá-lo exigiria DATABASE_URL)
+SEED_SYMBOLS = ("BTC", "ETH", "DOGE", "ADA", "BNB", "XRP", "SOL", "DOT", "LTC", "TRX")
+NETWORKS = ("bitcoin", "ethereum", "bsc", "solana", "tron", "polkadot", "cardano")
+
+
+def symbol_names(n_symbols: int) -> list[str]:
+    """Símbolos base: os do seed primeiro, depois SYN00001, SYN00002, ..."""
+    base = list(SEED_SYMBOLS[:n_symbols])
+    base += [f"SYN{i:05d}" for i in range(1, n_symbols - len(base) + 1)]
+    return base
+
+
+def _rsi(close: pd.DataFrame, window: int = 14) -> pd.DataFrame:
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / window, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / window, adjust=False).mean()
+    rsi = 100 - 100 / (1 + gain / loss.replace(0, np.nan))
+    return rsi.fillna(50.0)
+
+
+def generate_feature_history(
+    n_symbols: int,
+    n_days: int,
+    *,
+    seed: int = 0,
+    end_date: str = "2025-01-01",
+    features: list[str] | None = None,
+    shuffle: bool = False,
+) -> pd.DataFrame:
+    """Histórico longo (uma linha por moeda/dia), ordenado por moeda e data.
+
+    As séries são calculadas em matrizes dias x moedas (vetorizado por coluna),
+    então gerar 1000 x 365 leva poucos segundos.
+    """
+    if features is None:
+        features = list(joblib.load(DEFAULT_FEATURES_PATH))
+    rng = np.random.default_rng(seed)
+    symbols = symbol_names(n_symbols)
+    dates = pd.date_range(end=end_date, periods=n_days, freq="D")
+
+    # Passeio aleatório log-normal com volatilidade diária própria por moeda
+    daily_vol = rng.uniform(0.01, 0.08, n_symbols)
+    start_price = np.exp(rng.uniform(np.log(0.01), np.log(50_000), n_symbols))
+    log_ret = rng.normal(0.0, 1.0, (n_days, n_symbols)) * daily_vol
+    close = pd.DataFrame(start_price * np.exp(np.cumsum(log_ret, axis=0)), index=dates)
+
+    prev_close = close.shift(1).fillna(pd.Series(start_price, index=close.columns))
+    open_ = prev_close * np.exp(rng.normal(0.0, 0.25, close.shape) * daily_vol)
+    wick = np.abs(rng.normal(0.0, 0.5, close.shape)) * daily_vol
+    high = np.maximum(open_, close) * (1 + wick)
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, 0.5, close.shape)) * daily_vol)
+
+    columns = {
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "MA7": close.rolling(7, min_periods=1).mean(),
+        "MA21": close.rolling(21, min_periods=1).mean(),
+        "RSI14": _rsi(close),
+        "volatility_7": close.rolling(7, min_periods=2).std().fillna(0.0),
+        "return_1d": close.pct_change().fillna(0.0),
+        "return_7d": close.pct_change(7).fillna(0.0),
+        "close_lag1": close.shift(1).fillna(close),
+        "close_lag2": close.shift(2).fillna(close),
+    }
+    unknown = [f for f in features if f not in columns]
+    if unknown:
+        print(f"Aviso: features sem gerador dedicado (ruído normal): {', '.join(unknown)}", file=sys.stderr)
+
+    # Matriz dias x moedas -> formato longo, moeda a moeda (mesma ordem do CSV original)
+    out = {
+        "symbol": np.repeat([f"{s}USDT" for s in symbols], n_days),
+        "date": np.tile(dates.strftime("%Y-%m-%d").to_numpy(), n_symbols),
+        "network": np.repeat(rng.choice(NETWORKS, n_symbols), n_days),
+    }
+    for name in features:
+        if name in columns:
+            out[name] = np.asarray(columns[name], dtype=float).T.ravel()
+        else:
+            out[name] = rng.normal(0.0, 1.0, n_symbols * n_days)
+    frame = pd.DataFrame(out)
+    if shuffle:
+        frame = frame.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    return frame
+
+
+def write_feature_history(frame: pd.DataFrame, out_path: str, *, store: bool = False) -> str:
+    """Grava em CSV, parquet (pela extensão) ou feature store colunar (`store=True`)."""
+    out = Path(out_path)
+    if store:
+        from app.ml.feature_store import convert_csv_to_store
+
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "features.csv"
+            frame.to_csv(csv_path, index=False)
+            convert_csv_to_store(str(csv_path), str(out))
+    elif out.suffix == ".parquet":
+        frame.to_parquet(out, index=False)
+    else:
+        frame.to_csv(out, index=False)
+    return str(out)
+
+
+def fit_synthetic_model(features: list[str] | None = None, *, seed: int = 0):
+    """RandomForest pequeno (mesmo tipo do modelo de produção) treinado num histórico sintético.
+
+    O alvo é o fechamento do dia seguinte subir. Não prevê nada de útil: serve
+    para scripts de verificação/CI rodarem sem o `model.joblib`, que não está no repositório.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    if features is None:
+        features = list(joblib.load(DEFAULT_FEATURES_PATH))
+    frame = generate_feature_history(30, 90, seed=seed, features=features)
+    next_close = frame.groupby("symbol")["close"].shift(-1)
+    train = frame[next_close.notna()]
+    target = (next_close[next_close.notna()] > train["close"]).astype(int)
+    model = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=seed)
+    model.fit(train[features], target)
+    return model
+
+
+_synthetic_model_dir = None
+
+
+def ensure_model() -> str:
+    """Caminho do modelo do recomendador; sem o arquivo, treina um sintético e aponta
+    RECOMMENDER_MODEL_PATH para ele (chame antes de importar app.ml.recommender)."""
+    global _synthetic_model_dir
+    path = os.getenv("RECOMMENDER_MODEL_PATH", DEFAULT_MODEL_PATH)
+    if os.path.exists(path):
+        return path
+    _synthetic_model_dir = tempfile.TemporaryDirectory(prefix="cryptolens-model-")
+    path = os.path.join(_synthetic_model_dir.name, "model.joblib")
+    joblib.dump(fit_synthetic_model(), path)
+    os.environ["RECOMMENDER_MODEL_PATH"] = path
+    print(f"Sem model.joblib: usando um modelo sintético ({path})", file=sys.stderr)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("n_symbols", type=int)
+    parser.add_argument("n_days", type=int)
+    parser.add_argument("out_path", help="CSV/parquet de saída, ou diretório com --store")
+    parser.add_argument("--store", action="store_true", help="Gera um feature store colunar em vez de CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end-date", default="2025-01-01")
+    parser.add_argument("--features-path", default=str(DEFAULT_FEATURES_PATH), help="model_features.joblib de referência")
+    parser.add_argument("--shuffle", action="store_true", help="Embaralha as linhas (testa a seleção da última linha)")
+    args = parser.parse_args()
+
+    frame = generate_feature_history(
+        args.n_symbols,
+        args.n_days,
+        seed=args.seed,
+        end_date=args.end_date,
+        features=list(joblib.load(args.features_path)),
+        shuffle=args.shuffle,
+    )
+    path = write_feature_history(frame, args.out_path, store=args.store)
+    print(f"{len(frame)} linhas ({args.n_symbols} moedas x {args.n_days} dias) -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,9 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from app.database import SessionLocal, Base, engine
+from app.database import SessionLocal, upgrade_database
 from app import models
+from app.services.catalog_service import QUESTION_CATALOG_NAME, bump_catalog_version, question_catalog
 
 load_dotenv()
 
@@ -87,7 +88,10 @@ def seed_questions(db: Session):
                 label=opt["label"],
                 score=opt["score"],
             ))
+    # workers em execução recarregam o catálogo de perguntas ao fim do TTL
+    bump_catalog_version(db, QUESTION_CATALOG_NAME)
     db.commit()
+    question_catalog.invalidate()
     print("Seeded questions and options.")
 
 
@@ -105,9 +109,8 @@ def seed_cryptos(db: Session):
 
 
 def main():
-    # cria tabelas se não existirem (dev convenience)
-    from app import models as _models  # noqa: F401
-    Base.metadata.create_all(bind=engine)
+    # aplica as migrações pendentes antes de semear
+    upgrade_database()
     db = SessionLocal()
     try:
         seed_questions(db)
@@ -0,0 +1,192 @@
+"""Confere que o recomendador atual produz exatamente a saída da implementação original.
+
+A implementação original de `recommend_cryptos` (cópia + sort/groupby sobre o
+histórico inteiro, `.apply` por moeda, `to_dict(orient="records")`) está
+congelada abaixo em `reference_recommend_cryptos`. O script gera históricos
+sintéticos de vários tamanhos e variações (linhas embaralhadas, NaN na métrica
+de risco, datas inválidas, colunas ausentes, filtro de catálogo) e compara,
+registro a registro e com os mesmos tipos Python, os três perfis de risco.
+Sem `app/ml/model.joblib` (ou RECOMMENDER_MODEL_PATH), usa um modelo sintético
+pequeno: a comparação vale para qualquer modelo.
+
+Uso:
+    python scripts/verify_recommender.py
+    RECOMMENDER_INFERENCE_ENGINE=sklearn python scripts/verify_recommender.py
+"""
+import argparse
+import math
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.generate_feature_history import SEED_SYMBOLS, ensure_model, generate_feature_history
+
+# O model.joblib não é versionado: no CI o script treina um modelo sintético
+ensure_model()
+
+from app.ml.recommender import get_model, get_model_features, recommend_all_profiles, recommend_cryptos  # noqa: E402
+
+PROFILES = ("baixo", "moderado", "alto", "desconhecido")
+
+
+def reference_recommend_cryptos(user_risk: str, crypto_data: pd.DataFrame, allowed_symbols: set[str] | None = None):
+    """Implementação original, sem alterações de lógica (só o acesso ao modelo é via get_model)."""
+    model = get_model()
+    features = get_model_features()
+
+    df = crypto_data.copy()
+    if "symbol" in df.columns:
+        df["symbol_base"] = df["symbol"].astype(str).str.replace(r"USDT$", "", regex=True)
+    else:
+        df["symbol_base"] = None
+
+    if allowed_symbols:
+        df = df[df["symbol_base"].isin(allowed_symbols)]
+
+    if df.empty:
+        return []
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    else:
+        df["date"] = pd.NaT
+
+    df_last = df.sort_values(["symbol_base", "date"]).groupby("symbol_base", as_index=False).tail(1)
+
+    if "volatility_7" in df_last.columns:
+        if "close" in df_last.columns:
+            risk_metric = df_last["volatility_7"].astype(float) / (df_last["close"].abs().astype(float) + 1e-9)
+        else:
+            v = df_last["volatility_7"].astype(float)
+            rng = float((v.max() - v.min()) or 1.0)
+            risk_metric = (v - v.min()) / (rng + 1e-12)
+    else:
+        risk_metric = pd.Series([0.0] * len(df_last), index=df_last.index)
+
+    q1 = risk_metric.quantile(0.33)
+    q2 = risk_metric.quantile(0.66)
+
+    def classify_from_value(val: float) -> str:
+        if val <= q1:
+            return "baixo"
+        if val <= q2:
+            return "moderado"
+        return "alto"
+
+    df_last["predicted_movement"] = model.predict(df_last[features])
+    try:
+        probs = model.predict_proba(df_last[features])
+        classes = list(getattr(model, "classes_", []))
+        df_last["predicted_proba_up"] = probs[:, classes.index(1) if 1 in classes else probs.shape[1] - 1]
+    except Exception:
+        df_last["predicted_proba_up"] = np.nan
+
+    df_last["_risk_metric_7d"] = risk_metric
+    df_last["Risk_Level"] = df_last["_risk_metric_7d"].apply(classify_from_value)
+
+    if user_risk == "baixo":
+        eligible_mask = df_last["Risk_Level"] == "baixo"
+    elif user_risk == "moderado":
+        eligible_mask = df_last["Risk_Level"].isin(["baixo", "moderado"])
+    else:
+        eligible_mask = pd.Series([True] * len(df_last), index=df_last.index)
+
+    df_last["eligible_for_profile"] = eligible_mask
+
+    out_cols = []
+    if "symbol_base" in df_last.columns:
+        df_last["symbol"] = df_last["symbol_base"]
+
+    for c in ["symbol", "network", "Risk_Level", "predicted_movement", "predicted_proba_up", "eligible_for_profile"]:
+        if c in df_last.columns:
+            out_cols.append(c)
+
+    return df_last[out_cols].to_dict(orient="records")
+
+
+def same_value(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+def same_records(expected: list[dict], actual: list[dict]) -> str | None:
+    """None se iguais; senão, descrição da primeira diferença."""
+    if len(expected) != len(actual):
+        return f"{len(expected)} registros esperados, {len(actual)} obtidos"
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if list(e) != list(a):
+            return f"registro {i}: chaves {list(e)} != {list(a)}"
+        for key in e:
+            if not same_value(e[key], a[key]):
+                return f"registro {i}, '{key}': {e[key]!r} ({type(e[key]).__name__}) != {a[key]!r} ({type(a[key]).__name__})"
+    return None
+
+
+def cases(seed: int):
+    rng = np.random.default_rng(seed)
+    base = generate_feature_history(40, 30, seed=seed, features=get_model_features())
+    yield "ordenado", base, None
+    yield "catálogo padrão", base, set(SEED_SYMBOLS)
+    yield "catálogo sem interseção", base, {"NAOEXISTE"}
+    yield "embaralhado", base.sample(frac=1.0, random_state=seed).reset_index(drop=True), set(SEED_SYMBOLS) | {"SYN00001"}
+
+    nan_metric = base.copy()
+    nan_metric.loc[rng.random(len(base)) < 0.2, "volatility_7"] = np.nan
+    nan_metric.loc[rng.random(len(base)) < 0.1, "close"] = np.nan
+    yield "NaN na métrica", nan_metric, None
+
+    bad_dates = base.copy()
+    bad_dates.loc[rng.random(len(base)) < 0.1, "date"] = "data-invalida"
+    yield "datas inválidas", bad_dates, None
+
+    dup_dates = pd.concat([base, base.iloc[::7]], ignore_index=True)
+    yield "datas repetidas", dup_dates, None
+
+    yield "sem network", base.drop(columns=["network"]), None
+
+    no_vol = base.copy()
+    no_vol["volatility_7"] = np.nan
+    yield "volatility_7 toda NaN", no_vol, None
+
+    yield "uma moeda", base[base["symbol"] == "BTCUSDT"], None
+    yield "maior", generate_feature_history(300, 120, seed=seed + 1, features=get_model_features()), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, default=3, help="Quantas sementes de dados sintéticos testar")
+    args = parser.parse_args()
+    # Datas inválidas de propósito: o aviso de parsing do pandas não interessa aqui
+    warnings.filterwarnings("ignore", message="Could not infer format")
+
+    failures = 0
+    total = 0
+    for seed in range(args.seeds):
+        for name, frame, allowed in cases(seed):
+            all_profiles = recommend_all_profiles(frame, allowed)
+            for profile in PROFILES:
+                total += 1
+                expected = reference_recommend_cryptos(profile, frame, allowed)
+                problems = [
+                    ("recommend_cryptos", same_records(expected, recommend_cryptos(profile, frame, allowed))),
+                ]
+                if profile in all_profiles:
+                    problems.append(("recommend_all_profiles", same_records(expected, all_profiles[profile])))
+                for func, problem in problems:
+                    if problem:
+                        failures += 1
+                        print(f"FALHA seed={seed} caso='{name}' perfil={profile} {func}: {problem}")
+
+    print(f"{total - failures}/{total} comparações idênticas à implementação original")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()